@@ -1,14 +1,31 @@
+import asyncio
+import json
 import os
-from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException
+import time
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session, select
-from database import create_db_and_tables, get_session
-from models import Project, Document, ExtractedRecord, ExtractionSchema
-from parsers import parse_document
-from extraction import extract_data_from_text
-from pydantic import BaseModel
-from vector_store import process_and_store_document
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlmodel import Session, select, delete, and_, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import create_db_and_tables, get_session, engine, async_engine
+from models import Project, Document, ExtractedRecord, ExtractionSchema, EvaluationReport
+from records import (RecordWriter, replace_records, insert_records, record_values, bump_table_version, table_version_statements,
+                     upsert_record, finish_streamed_records)
+from cache import parse_document_cached, get_cache
+from content_store import get_content_store, document_text, set_document_text, move_inline_content
+from extraction import (extract_data_from_text, stream_extraction, TokenRateLimiter, get_default_rate_limiter, schema_to_fields, diff_fields,
+                        get_groq_breaker, is_transient_error, GROQ_MODEL, PROMPT_VERSION)
+from resilience import SingleFlight, CircuitOpenError
+from pydantic import BaseModel, Field
+from vector_store import process_and_store_document, bulk_store_documents, delete_project_vectors
+from embeddings import warm_up as warm_up_embeddings, get_embedding_function
+import jobs
+import metrics
+import table
+from diffing import FieldDiff, diff_table
+from evaluation import GoldLabel, load_labels, evaluate
 
 app = FastAPI(title="Legal Tabular Review API")
 
@@ -18,42 +35,175 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Times every request by route. With "X-Profile: 1", also answers with its per-stage Server-Timing."""
+    profile = metrics.start_profile() if request.headers.get("x-profile") == "1" else None
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.observe("http_request_duration_seconds", elapsed, method=request.method, route=getattr(route, "path", "unmatched"))
+    if profile is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(profile, elapsed)
+    return response
+
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 
+# Concurrent LLM calls per batch extraction job; tune against the provider's rate limits
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "4"))
+# Files parsed/embedded at once by a background ingestion job
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "2"))
+# Polling interval (seconds) behind the job SSE stream
+JOB_EVENTS_INTERVAL = 0.5
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") == "1"
+# List endpoints return pages of this many rows; the next page starts after the X-Next-Cursor id
+PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 1000
+# Largest slice of document text served by one content range request
+MAX_CONTENT_RANGE = 200_000
+
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    moved = move_inline_content(engine)
+    if moved:
+        print(f"Moved the text of {moved} documents from the database into the content store")
+    if EMBEDDING_WARMUP:
+        # Load the embedding model now instead of stalling the first ingest or query
+        try:
+            warm_up_embeddings()
+        except Exception as e:
+            print(f"Embedding warm-up failed: {e}")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await async_engine.dispose()
 
 @app.get("/health")
 def health_check() -> dict:
-    return {"status": "ok"}
+    return {"status": "ok", "llm_circuit": get_groq_breaker().state}
+
+@app.get("/cache/stats")
+def cache_stats() -> dict:
+    """Hit/miss counters and disk usage of the parse/embedding cache."""
+    return get_cache().stats()
+
+@app.get("/embeddings/stats")
+def embedding_stats() -> dict:
+    """Active embedding backend and query-embedding cache counters."""
+    return get_embedding_function().stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Pipeline stage latencies, LLM token counts and request latencies, in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def _paginate(session: AsyncSession, statement, id_column, response: Response, limit: int, after_id: Optional[int]) -> list:
+    """
+    Keyset pagination on an id column: rows after `after_id`, in id order. When more rows follow,
+    the last returned id is sent in the X-Next-Cursor header, to be passed back as `after_id`.
+    """
+    if after_id is not None:
+        statement = statement.where(id_column > after_id)
+    # One extra row tells whether another page exists without a COUNT
+    rows = (await session.exec(statement.order_by(id_column).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return rows
 
 # Projects
 @app.post("/projects", response_model=Project)
-def create_project(project: Project, session: Session = Depends(get_session)):
+async def create_project(project: Project, session: AsyncSession = Depends(get_session)):
     session.add(project)
-    session.commit()
-    session.refresh(project)
+    await session.commit()
+    await session.refresh(project)
     return project
 
 @app.get("/projects", response_model=List[Project])
-def list_projects(session: Session = Depends(get_session)):
-    projects = session.exec(select(Project)).all()
-    return projects
+async def list_projects(
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    return await _paginate(session, select(Project), Project.id, response, limit, after_id)
 
 @app.get("/projects/{project_id}", response_model=Project)
-def get_project(project_id: int, session: Session = Depends(get_session)):
-    project = session.get(Project, project_id)
+async def get_project(project_id: int, session: AsyncSession = Depends(get_session)):
+    project = await session.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+@app.delete("/projects/{project_id}")
+async def delete_project(project_id: int, session: AsyncSession = Depends(get_session)):
+    """Deletes a project with its documents, records, field template, evaluation reports and vectors."""
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    document_ids = (await session.exec(select(Document.id).where(Document.project_id == project_id))).all()
+    # One DELETE per table, however large the project
+    project_documents = select(Document.id).where(Document.project_id == project_id)
+    for statement in (
+        delete(ExtractedRecord).where(ExtractedRecord.document_id.in_(project_documents)),
+        delete(ExtractionSchema).where(ExtractionSchema.project_id == project_id),
+        delete(EvaluationReport).where(EvaluationReport.project_id == project_id),
+        delete(Document).where(Document.project_id == project_id),
+    ):
+        await session.exec(statement.execution_options(synchronize_session=False))
+    await session.delete(project)
+    await session.commit()
+    table.forget(project_id)
+
+    try:
+        await asyncio.to_thread(delete_project_vectors, project_id)
+    except Exception as e:
+        print(f"Vector store cleanup failed for project {project_id}: {e}")
+    return {"deleted": project_id, "documents": len(document_ids)}
+
 # Ingestion
 class IngestRequest(BaseModel):
     filename: str
 
+class DocumentSummary(BaseModel):
+    """A document without its parsed text, for listings."""
+    id: int
+    project_id: int
+    filename: str
+    file_path: str
+    file_hash: Optional[str] = None
+    content_length: Optional[int] = None
+    page_count: Optional[int] = None
+    status: str
+    error: Optional[str] = None
+    created_at: datetime
+
+class DocumentDetail(DocumentSummary):
+    content: str
+
+# Only the summary columns are read, so listings never load document text
+DOCUMENT_SUMMARY_COLUMNS = [getattr(Document, name) for name in DocumentSummary.model_fields]
+
+# Documents whose text has been parsed (into the content store, or inline in older rows)
+HAS_TEXT = or_(Document.content_hash.is_not(None), Document.content != "")
+# Parsed and embedded: queued, parsing, embedding and failed ingests have nothing to extract from yet
+EXTRACTABLE_STATUSES = ("ingested", "extracted")
+EXTRACTABLE = and_(HAS_TEXT, Document.status.in_(EXTRACTABLE_STATUSES))
+
+def _require_extractable(doc: Document):
+    """409 unless the document's text has been parsed, so extraction never prompts with empty text."""
+    if doc.status not in EXTRACTABLE_STATUSES or (doc.content_hash is None and not doc.content):
+        raise HTTPException(status_code=409, detail=f"Document has no parsed text to extract from (status: {doc.status})")
+
+def _document_detail(doc: Document, content: str) -> DocumentDetail:
+    return DocumentDetail(**doc.model_dump(exclude={"content"}), content=content)
+
 @app.get("/files")
 def list_files():
     """List available files in the data directory."""
@@ -61,9 +211,9 @@ def list_files():
         return []
     return [f for f in os.listdir(DATA_DIR) if os.path.isfile(os.path.join(DATA_DIR, f))]
 
-@app.post("/projects/{project_id}/ingest", response_model=Document)
-def ingest_document(project_id: int, request: IngestRequest, session: Session = Depends(get_session)):
-    project = session.get(Project, project_id)
+@app.post("/projects/{project_id}/ingest", response_model=DocumentDetail)
+async def ingest_document(project_id: int, request: IngestRequest, session: AsyncSession = Depends(get_session)):
+    project = await session.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -72,87 +222,595 @@ def ingest_document(project_id: int, request: IngestRequest, session: Session =
         raise HTTPException(status_code=404, detail=f"File {request.filename} not found in data directory")
 
     try:
-        content = parse_document(file_path)
+        # Parsing and embedding are CPU-bound; keep them off the event loop
+        content, content_hash = await asyncio.to_thread(parse_document_cached, file_path)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
     doc = Document(
         project_id=project_id,
         filename=request.filename,
-        content=content,
         file_path=file_path,
+        file_hash=content_hash,
         status="ingested"
     )
+    await asyncio.to_thread(set_document_text, doc, content)
     session.add(doc)
-    session.commit()
-    session.refresh(doc)
+    await session.commit()
+    await session.refresh(doc)
 
     # Ingest into Vector Store
     try:
-        process_and_store_document(doc.id, doc.content)
+        await asyncio.to_thread(process_and_store_document, doc.id, content, cache_key=doc.file_hash, project_id=doc.project_id)
     except Exception as e:
         print(f"Vector store ingestion failed: {e}")
 
-    return doc
+    return _document_detail(doc, content)
+
+class BatchIngestRequest(BaseModel):
+    filenames: List[str]
+
+def _run_ingestion(job_id: str, document_ids: List[int]):
+    """Background pipeline: parse -> persist -> chunk/embed, moving Document.status through each stage."""
+    def set_stage(session: Session, doc: Document, status: str, error: Optional[str] = None):
+        doc.status = status
+        doc.error = error
+        session.add(doc)
+        session.commit()
+        jobs.update_item(job_id, doc.id, "running", detail=status)
+
+    def work(document_id: int):
+        with Session(engine) as session:
+            doc = session.get(Document, document_id)
+            try:
+                set_stage(session, doc, "parsing")
+                content, doc.file_hash = parse_document_cached(doc.file_path)
+                set_document_text(doc, content)
+
+                set_stage(session, doc, "embedding")
+                process_and_store_document(doc.id, content, cache_key=doc.file_hash, project_id=doc.project_id)
+            except Exception as e:
+                set_stage(session, doc, "error", error=str(e))
+                raise
+
+            set_stage(session, doc, "ingested")
+            return {"status": doc.status, "content_length": doc.content_length}
+
+    jobs.run_items(job_id, document_ids, work, INGEST_MAX_WORKERS)
 
-@app.get("/projects/{project_id}/documents", response_model=List[Document])
-def list_documents(project_id: int, session: Session = Depends(get_session)):
-    # Using strict SQLModel select
-    statement = select(Document).where(Document.project_id == project_id)
-    documents = session.exec(statement).all()
-    return documents
+@app.post("/projects/{project_id}/ingest/async", response_model=jobs.Job)
+async def ingest_documents_async(project_id: int, request: BatchIngestRequest, session: AsyncSession = Depends(get_session)):
+    """Queues files for background ingestion and returns immediately with a job to poll."""
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    missing = [f for f in request.filenames if not os.path.exists(os.path.join(DATA_DIR, f))]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Files not found in data directory: {', '.join(missing)}")
+
+    docs = [
+        Document(
+            project_id=project_id,
+            filename=filename,
+            file_path=os.path.join(DATA_DIR, filename),
+            status="queued"
+        )
+        for filename in request.filenames
+    ]
+    session.add_all(docs)
+    await session.commit()
+    document_ids = [doc.id for doc in docs]
+
+    job = jobs.create_job("ingest", document_ids)
+    jobs.submit(job.id, _run_ingestion, document_ids)
+    return job
+
+def _run_reindex(job_id: str, project_id: int):
+    def documents():
+        # Stream texts from the DB one document at a time so large projects stay memory-bounded
+        with Session(engine) as session:
+            document_ids = session.exec(select(Document.id).where(Document.project_id == project_id, HAS_TEXT)).all()
+            for document_id in document_ids:
+                doc = session.get(Document, document_id)
+                jobs.update_item(job_id, document_id, "running")
+                yield doc.id, document_text(doc), doc.file_hash
+                session.expunge(doc)
+
+    bulk_store_documents(documents(), project_id=project_id, on_document_stored=lambda document_id, count: jobs.update_item(
+        job_id, document_id, "completed", result={"chunks": count}))
 
-@app.get("/documents/{document_id}", response_model=Document)
-def get_document(document_id: int, session: Session = Depends(get_session)):
-    doc = session.get(Document, document_id)
+@app.post("/projects/{project_id}/reindex", response_model=jobs.Job)
+async def reindex_project(project_id: int, session: AsyncSession = Depends(get_session)):
+    """Re-chunks and re-embeds every parsed document of a project in batches. Safe to re-run."""
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    document_ids = (await session.exec(select(Document.id).where(Document.project_id == project_id, HAS_TEXT))).all()
+    job = jobs.create_job("reindex", document_ids)
+    jobs.submit(job.id, _run_reindex, project_id)
+    return job
+
+@app.get("/projects/{project_id}/documents", response_model=List[DocumentSummary])
+async def list_documents(
+    project_id: int,
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    statement = select(*DOCUMENT_SUMMARY_COLUMNS).where(Document.project_id == project_id)
+    rows = await _paginate(session, statement, Document.id, response, limit, after_id)
+    return [DocumentSummary.model_validate(row._mapping) for row in rows]
+
+@app.get("/documents/{document_id}", response_model=DocumentDetail)
+async def get_document(document_id: int, session: AsyncSession = Depends(get_session)):
+    """The document with its full text. Use /documents/{id}/content to fetch only a range or page."""
+    doc = await session.get(Document, document_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    return doc
+    return _document_detail(doc, await asyncio.to_thread(document_text, doc))
+
+class ContentRange(BaseModel):
+    document_id: int
+    start: int
+    end: int
+    page: int # Page containing `start`
+    total_chars: int
+    text: str
+
+@app.get("/documents/{document_id}/content", response_model=ContentRange)
+async def get_document_content(
+    document_id: int,
+    start: int = Query(0, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    page: Optional[int] = Query(None, ge=1),
+    block_at: Optional[int] = Query(None, ge=0),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    A slice of a document's text: characters [start, end), a whole 1-based `page`, or the whole text block
+    (paragraph, heading, list item or table) containing offset `block_at`, e.g. a cited chunk's start. Only the
+    compressed blocks covering the slice are read, so citation previews stay cheap on long contracts.
+    """
+    doc = await session.get(Document, document_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not doc.content_hash:
+        raise HTTPException(status_code=404, detail="Document has no parsed text yet")
+
+    store = get_content_store()
+    if page is not None:
+        try:
+            start, end = store.page_span(doc.content_hash, page)
+        except IndexError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    elif block_at is not None:
+        start, end = store.block_span(doc.content_hash, block_at)
+        end = min(end, start + MAX_CONTENT_RANGE) # A very long table is cut rather than refused
+    end = min(doc.content_length, start + MAX_CONTENT_RANGE if end is None else end)
+    if end - start > MAX_CONTENT_RANGE:
+        raise HTTPException(status_code=400, detail=f"Ranges are limited to {MAX_CONTENT_RANGE} characters")
+
+    text = await asyncio.to_thread(store.read, doc.content_hash, start, end)
+    return ContentRange(
+        document_id=doc.id,
+        start=start,
+        end=max(start, end),
+        page=store.page_of(doc.content_hash, start),
+        total_chars=doc.content_length,
+        text=text,
+    )
 
 # Extraction
+ExtractionMode = Literal["auto", "map_reduce"]
+
+# Records a reviewer has signed off on; re-extraction never overwrites these
+REVIEWED_STATUSES = ("approved", "manual_updated")
+
+def _schema_statement(project_id: int):
+    return select(ExtractionSchema).where(ExtractionSchema.project_id == project_id).order_by(ExtractionSchema.id)
+
+def _project_fields(session: Session, project_id: int):
+    schema_rows = session.exec(_schema_statement(project_id)).all()
+    return schema_to_fields(schema_rows)
+
+def _extract_and_save(session: Session, doc: Document, rate_limiter: Optional[TokenRateLimiter] = None, use_cache: bool = True, mode: str = "auto", writer: Optional[RecordWriter] = None) -> List[ExtractedRecord]:
+    """
+    Runs extraction for one document and replaces its records. Raises ValueError on extraction failure.
+    With a `writer`, the records are committed in a transaction shared with other workers of the batch.
+    """
+    fields = _project_fields(session, doc.project_id)
+    results = extract_data_from_text(document_text(doc), fields=fields, document_id=doc.id, rate_limiter=rate_limiter, use_cache=use_cache, mode=mode, project_id=doc.project_id)
+
+    if writer is not None:
+        return writer.write(doc.id, results)
+    saved = replace_records(session, {doc.id: results})
+    session.commit()
+    return saved[doc.id]
+
+# Concurrent extractions of the same document (/extract requests and batch jobs alike) join one run
+# instead of racing to replace its records
+_extraction_flights = SingleFlight("document_extraction")
+
+def _extract_document(document_id: int, rate_limiter: Optional[TokenRateLimiter] = None, use_cache: bool = True, mode: str = "auto", writer: Optional[RecordWriter] = None) -> List[ExtractedRecord]:
+    """Blocking extraction of one document on its own sync session, for worker threads."""
+    def run():
+        # expire_on_commit=False: the saved records are serialized after this session closes
+        with Session(engine, expire_on_commit=False) as session:
+            doc = session.get(Document, document_id)
+            if not doc:
+                raise ValueError("Document not found")
+            return _extract_and_save(session, doc, rate_limiter=rate_limiter, use_cache=use_cache, mode=mode, writer=writer)
+    return _extraction_flights.do((document_id, use_cache, mode), run)
+
 @app.post("/documents/{document_id}/extract", response_model=List[ExtractedRecord])
-def extract_document(document_id: int, session: Session = Depends(get_session)):
-    doc = session.get(Document, document_id)
+async def extract_document(document_id: int, refresh: bool = False, mode: ExtractionMode = "auto", session: AsyncSession = Depends(get_session)):
+    """
+    Extracts fields for a document. Cached field results are reused unless `refresh` is set.
+    `mode=map_reduce` extracts from the whole document in windows instead of retrieved chunks.
+    """
+    doc = await session.get(Document, document_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-
-    # Check if already extracted? Optionally clear old records.
-    # For now, let's clear old records to support "Update template" workflow sort of.
-    old_records = session.exec(select(ExtractedRecord).where(ExtractedRecord.document_id == document_id)).all()
-    for rec in old_records:
-        session.delete(rec)
+    _require_extractable(doc)
 
     try:
-        results = extract_data_from_text(doc.content, document_id=doc.id)
+        # The LLM call blocks for seconds; run it on a thread so other reviewers' requests keep flowing
+        return await asyncio.to_thread(_extract_document, document_id, use_cache=not refresh, mode=mode)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(round(e.retry_after))})
+    except Exception as e:
+        # Retries exhausted on a rate limit, timeout or provider outage
+        if not is_transient_error(e):
+            raise
+        raise HTTPException(status_code=503, detail=f"LLM provider unavailable: {e}")
 
-    saved_records = []
-    for res in results:
-        record = ExtractedRecord(
-            document_id=document_id,
-            field_name=res.get("field_name"),
-            value=res.get("value"),
-            confidence=res.get("confidence"),
-            citation=res.get("citation"),
-            normalization=res.get("normalization"),
-            status="pending"
-        )
-        session.add(record)
-        saved_records.append(record)
+def _stream_document_extraction(document_id: int, use_cache: bool, sse: bool):
+    """
+    Extracts a document, committing and emitting each record as soon as the LLM finishes its field.
+    Events: "record" (one per field), then "done" with timings, or "error".
+    """
+    def event(name: str, payload: dict) -> str:
+        if sse:
+            return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({"event": name, **payload}) + "\n"
 
-    doc.status = "extracted"
-    session.add(doc)
+    started = time.perf_counter()
+    first_record_ms = None
+    saved_ids = []
+    try:
+        # expire_on_commit=False: each record is serialized after its commit
+        with Session(engine, expire_on_commit=False) as session:
+            doc = session.get(Document, document_id)
+            fields = _project_fields(session, doc.project_id)
+            for res in stream_extraction(document_text(doc), fields=fields, document_id=doc.id, use_cache=use_cache, project_id=doc.project_id):
+                record = upsert_record(session, doc.id, res)
+                session.commit()
+                saved_ids.append(record.id)
+                if first_record_ms is None:
+                    first_record_ms = round((time.perf_counter() - started) * 1000, 1)
+                yield event("record", {"record": record.model_dump(mode="json")})
+            finish_streamed_records(session, doc.id, saved_ids)
+            session.commit()
+    except Exception as e:
+        print(f"Streaming extraction failed for document {document_id}: {e}")
+        yield event("error", {"detail": str(e)})
+        return
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    yield event("done", {"records": len(saved_ids), "first_record_ms": first_record_ms, "total_ms": total_ms})
+
+@app.post("/documents/{document_id}/extract/stream")
+async def extract_document_stream(document_id: int, request: Request, refresh: bool = False, session: AsyncSession = Depends(get_session)):
+    """
+    Streaming extract_document: records are saved and sent one by one as the LLM produces them, as
+    newline-delimited JSON, or as server-sent events when the client accepts text/event-stream.
+    """
+    doc = await session.get(Document, document_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    _require_extractable(doc)
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    # A sync generator: Starlette advances it on a worker thread, so the blocking LLM stream never stalls the event loop
+    return StreamingResponse(
+        _stream_document_extraction(document_id, use_cache=not refresh, sse=sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+    )
+
+class BatchExtractRequest(BaseModel):
+    document_ids: Optional[List[int]] = None # Defaults to every document in the project
+    max_workers: Optional[int] = Field(None, ge=1, le=EXTRACTION_MAX_WORKERS) # Concurrent LLM calls for this job
+    tokens_per_minute: Optional[int] = Field(None, ge=1) # Lowers this job's share of the GROQ_TOKENS_PER_MINUTE budget
+    refresh: bool = False # Ignore cached field results
+    mode: ExtractionMode = "auto"
+
+def _run_batch_extraction(job_id: str, document_ids: List[int], max_workers: int, rate_limiter: Optional[TokenRateLimiter], use_cache: bool = True, mode: str = "auto"):
+    # Workers finishing close together share one write transaction
+    writer = RecordWriter(engine)
+
+    def work(document_id: int):
+        # Each worker needs its own session; the request session is gone by now
+        records = _extract_document(document_id, rate_limiter=rate_limiter, use_cache=use_cache, mode=mode, writer=writer)
+        return {"records": len(records)}
+
+    jobs.run_items(job_id, document_ids, work, max_workers)
+
+@app.post("/projects/{project_id}/extract", response_model=jobs.Job)
+async def extract_project(project_id: int, request: Optional[BatchExtractRequest] = None, session: AsyncSession = Depends(get_session)):
+    """Queues extraction for every (or the selected) document of a project and returns the job to poll."""
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    request = request or BatchExtractRequest()
+
+    statement = select(Document.id).where(Document.project_id == project_id, EXTRACTABLE)
+    if request.document_ids is not None:
+        statement = statement.where(Document.id.in_(request.document_ids))
+    document_ids = list((await session.exec(statement)).all())
+
+    max_workers = request.max_workers or EXTRACTION_MAX_WORKERS
+    # The provider's token limit is per API key, so every job draws from the shared limiter; a job may only narrow it
+    rate_limiter = get_default_rate_limiter()
+    if request.tokens_per_minute and (rate_limiter is None or request.tokens_per_minute < rate_limiter.tokens_per_minute):
+        rate_limiter = TokenRateLimiter(request.tokens_per_minute, parent=rate_limiter)
+
+    job = jobs.create_job("extract_project", document_ids)
+    jobs.submit(job.id, _run_batch_extraction, document_ids, max_workers, rate_limiter, not request.refresh, request.mode)
+    return job
+
+@app.get("/jobs/{job_id}", response_model=jobs.Job)
+def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events: emits a job snapshot whenever it changes, ending once the job finishes."""
+    if not jobs.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last = None
+        while True:
+            job = jobs.get_job(job_id)
+            payload = job.model_dump_json()
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            if job.status in ("completed", "failed"):
+                break
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+# Field templates
+class SchemaField(BaseModel):
+    field_name: str
+    field_description: str
+    data_type: str = "string"
+
+class SchemaUpdateRequest(BaseModel):
+    fields: List[SchemaField]
+    reextract: bool = True # Re-run added/changed fields on already extracted documents
+
+class SchemaUpdateResult(BaseModel):
+    schema_version: int
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+    job: Optional[jobs.Job] = None
+
+@app.get("/projects/{project_id}/schema", response_model=List[ExtractionSchema])
+async def get_schema(project_id: int, session: AsyncSession = Depends(get_session)):
+    return (await session.exec(_schema_statement(project_id))).all()
+
+def _merge_records(session: Session, document_id: int, results: List[dict], requested: List[str]) -> int:
+    """
+    Replaces unreviewed records of the requested fields with the returned results; reviewed rows are left
+    untouched. A requested field missing from the results loses its old record, which came from the old template.
+    """
+    names = list(dict.fromkeys(requested + [res.get("field_name") for res in results]))
+    reviewed = set(session.exec(select(ExtractedRecord.field_name).where(
+        ExtractedRecord.document_id == document_id,
+        ExtractedRecord.field_name.in_(names),
+        ExtractedRecord.status.in_(REVIEWED_STATUSES)
+    )).all())
+    session.exec(delete(ExtractedRecord).where(
+        ExtractedRecord.document_id == document_id,
+        ExtractedRecord.field_name.in_(names),
+        ExtractedRecord.status.not_in(REVIEWED_STATUSES)
+    ))
+    rows = [record_values(document_id, res) for res in results if res.get("field_name") not in reviewed]
+    insert_records(session, rows)
+    bump_table_version(session, [document_id])
     session.commit()
+    return len(rows)
 
-    # Refresh to get IDs
-    for rec in saved_records:
-        session.refresh(rec)
+def _run_delta_extraction(job_id: str, document_ids: List[int], fields: List[dict]):
+    def work(document_id: int):
+        with Session(engine) as session:
+            doc = session.get(Document, document_id)
+            results = extract_data_from_text(document_text(doc), fields=fields, document_id=doc.id, project_id=doc.project_id)
+            return {"records": _merge_records(session, doc.id, results, [f["name"] for f in fields])}
 
-    return saved_records
+    jobs.run_items(job_id, document_ids, work, EXTRACTION_MAX_WORKERS)
+
+@app.put("/projects/{project_id}/schema", response_model=SchemaUpdateResult)
+async def update_schema(project_id: int, request: SchemaUpdateRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Replaces the project's field template. Only fields that were added or edited are re-extracted,
+    and only on documents that have been extracted before; records of removed fields are dropped
+    unless a reviewer already approved or edited them.
+    """
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    names = [f.field_name for f in request.fields]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Duplicate field names in schema")
+
+    rows = (await session.exec(select(ExtractionSchema).where(ExtractionSchema.project_id == project_id))).all()
+    new_fields = [{"name": f.field_name, "description": f.field_description, "data_type": f.data_type} for f in request.fields]
+    diff = diff_fields(schema_to_fields(rows), new_fields)
+    if not (diff["added"] or diff["changed"] or diff["removed"]):
+        return SchemaUpdateResult(schema_version=project.schema_version, **diff)
+
+    project.schema_version += 1
+    rows_by_name = {row.field_name: row for row in rows}
+    for row in rows:
+        if row.field_name not in names:
+            await session.delete(row)
+    for f in request.fields:
+        row = rows_by_name.get(f.field_name)
+        if row is None:
+            row = ExtractionSchema(project_id=project_id, field_name=f.field_name, field_description=f.field_description)
+        elif f.field_name not in diff["changed"]:
+            continue
+        row.field_description = f.field_description
+        row.data_type = f.data_type
+        row.version = project.schema_version
+        session.add(row)
+    session.add(project)
+
+    document_ids = list((await session.exec(select(Document.id).where(
+        Document.project_id == project_id,
+        Document.status == "extracted"
+    ))).all())
+    if diff["removed"] and document_ids:
+        stale = (await session.exec(select(ExtractedRecord).where(
+            ExtractedRecord.document_id.in_(document_ids),
+            ExtractedRecord.field_name.in_(diff["removed"]),
+            ExtractedRecord.status.not_in(REVIEWED_STATUSES)
+        ))).all()
+        for rec in stale:
+            await session.delete(rec)
+        if stale:
+            for statement in table_version_statements(list({rec.document_id for rec in stale})):
+                await session.exec(statement)
+    await session.commit()
+
+    job = None
+    delta = [f for f in new_fields if f["name"] in diff["added"] or f["name"] in diff["changed"]]
+    if request.reextract and delta and document_ids:
+        job = jobs.create_job("reextract_fields", document_ids)
+        jobs.submit(job.id, _run_delta_extraction, document_ids, delta)
+
+    return SchemaUpdateResult(schema_version=project.schema_version, job=job, **diff)
+
+@app.get("/projects/{project_id}/table", response_model=table.ProjectTable)
+async def get_project_table(project_id: int, request: Request, response: Response, session: AsyncSession = Depends(get_session)):
+    """
+    Field x document comparison matrix for the whole project. Send the returned ETag back in
+    If-None-Match to get a 304 while nothing in the table has changed.
+    """
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    version = await table.table_version(session, project)
+    tag = table.etag(project_id, version)
+    if tag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": tag})
+
+    response.headers["ETag"] = tag
+    return await table.get_table(session, project, version)
+
+@app.get("/projects/{project_id}/diff", response_model=List[FieldDiff])
+async def get_project_diff(project_id: int, field: Optional[str] = None, session: AsyncSession = Depends(get_session)):
+    """
+    Difference highlighting across the project's documents: per field (or just `field`), documents grouped
+    by normalized value, the consensus and outlier groups, and token diffs for clause-text fields.
+    """
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    matrix = await table.get_table(session, project, await table.table_version(session, project))
+    rows = [row for row in matrix.rows if field is None or row.field_name == field]
+    if field is not None and not rows:
+        raise HTTPException(status_code=404, detail=f"Field {field} not found")
+    return await asyncio.to_thread(diff_table, matrix.documents, rows)
 
 @app.get("/documents/{document_id}/records", response_model=List[ExtractedRecord])
-def get_records(document_id: int, session: Session = Depends(get_session)):
+async def get_records(
+    document_id: int,
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+):
     statement = select(ExtractedRecord).where(ExtractedRecord.document_id == document_id)
-    records = session.exec(statement).all()
-    return records
+    return await _paginate(session, statement, ExtractedRecord.id, response, limit, after_id)
+
+# Evaluation
+class EvaluationRequest(BaseModel):
+    labels: Optional[List[GoldLabel]] = None
+    labels_file: Optional[str] = None # JSON or CSV file of labels in the data directory, instead of `labels`
+    tag: Optional[str] = None
+
+@app.post("/projects/{project_id}/evaluations", response_model=EvaluationReport)
+async def evaluate_project(project_id: int, request: EvaluationRequest, session: AsyncSession = Depends(get_session)):
+    """Scores the project's current records against reference labels and stores the report."""
+    project = await session.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if request.labels_file:
+        path = os.path.realpath(os.path.join(DATA_DIR, request.labels_file))
+        if not path.startswith(os.path.realpath(DATA_DIR) + os.sep) or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=f"File {request.labels_file} not found in data directory")
+        try:
+            labels = load_labels(path)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid labels file: {e}")
+    elif request.labels:
+        labels = request.labels
+    else:
+        raise HTTPException(status_code=400, detail="Provide labels or labels_file")
+
+    documents = (await session.exec(select(Document.id, Document.filename).where(Document.project_id == project_id))).all()
+    filenames = {}
+    for doc in documents:
+        filenames.setdefault(doc.filename, []).append(doc.id)
+    records = (await session.exec(
+        select(ExtractedRecord.document_id, ExtractedRecord.field_name, ExtractedRecord.value, ExtractedRecord.normalization)
+        .join(Document).where(Document.project_id == project_id)
+    )).all()
+    predictions = {(rec.document_id, rec.field_name): (rec.value, rec.normalization) for rec in records}
+    data_types = {row.field_name: row.data_type for row in (await session.exec(_schema_statement(project_id))).all()}
+
+    scores = await asyncio.to_thread(evaluate, labels, predictions, filenames, data_types)
+    report = EvaluationReport(
+        project_id=project_id,
+        tag=request.tag,
+        model=GROQ_MODEL,
+        prompt_version=PROMPT_VERSION,
+        schema_version=project.schema_version,
+        labels=scores["overall"]["labels"],
+        accuracy=scores["overall"]["accuracy"],
+        coverage=scores["overall"]["coverage"],
+        normalization_validity=scores["overall"]["normalization_validity"],
+        metrics=scores,
+    )
+    session.add(report)
+    await session.commit()
+    await session.refresh(report)
+    return report
+
+@app.get("/projects/{project_id}/evaluations", response_model=List[EvaluationReport])
+async def list_evaluations(
+    project_id: int,
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """Stored reports, oldest first, to compare runs across prompt and model versions."""
+    statement = select(EvaluationReport).where(EvaluationReport.project_id == project_id)
+    return await _paginate(session, statement, EvaluationReport.id, response, limit, after_id)
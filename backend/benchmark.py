@@ -0,0 +1,295 @@
+"""
+Offline benchmark of the document pipeline: parse -> store -> chunk -> embed -> retrieve -> extract -> persist.
+
+Runs over the sample contracts in data/ (or --files), optionally scaled up with synthetic variants of
+each one, against a local mock Groq server (mock_groq.py) with configurable latency and rate limits.
+Everything is written to a scratch directory, so the app's database, cache and vector store are not touched.
+Reports per-stage latency percentiles, throughput and peak memory.
+
+Usage (from backend/):
+    python benchmark.py [--scale 10] [--workers 4] [--latency 0.5 --jitter 0.1] [--requests-per-minute 60]
+                        [--embedding-backend hash] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from mock_groq import MockGroqServer
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SAMPLE_EXTENSIONS = (".pdf", ".html", ".htm")
+NUMBER = re.compile(r"\d+")
+
+def sample_files(directory: str = SAMPLE_DIR) -> List[str]:
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(SAMPLE_EXTENSIONS)
+    )
+
+def synthetic_variant(text: str, rng: random.Random) -> str:
+    """A same-sized contract that chunks and embeds differently: numbers rewritten, paragraphs after the first shuffled."""
+    paragraphs = text.split("\n\n")
+    body = paragraphs[1:]
+    rng.shuffle(body)
+    text = "\n\n".join(paragraphs[:1] + body)
+    return NUMBER.sub(lambda m: "".join(rng.choice("0123456789") for _ in m.group()), text)
+
+def scaled_corpus(samples: List[Tuple[str, str]], scale: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """(filename, text) for `scale` copies of every sample: the original, then synthetic variants."""
+    rng = random.Random(seed)
+    corpus = []
+    for copy in range(scale):
+        for name, text in samples:
+            corpus.append((name if copy == 0 else f"synthetic-{copy}-{name}", text if copy == 0 else synthetic_variant(text, rng)))
+    return corpus
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class Stages:
+    """Per-item latencies and wall time of each pipeline stage."""
+
+    def __init__(self):
+        self.results: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def start(self, stage: str):
+        self.results[stage] = {"samples": [], "items": 0, "started": time.perf_counter()}
+
+    def record(self, stage: str, seconds: float, items: int = 1):
+        with self._lock:
+            self.results[stage]["samples"].append(seconds)
+            self.results[stage]["items"] += items
+
+    def finish(self, stage: str):
+        result = self.results[stage]
+        wall = time.perf_counter() - result.pop("started")
+        samples = np.array(result.pop("samples")) * 1000
+        result.update({
+            "count": len(samples),
+            "wall_seconds": round(wall, 3),
+            "throughput_per_second": round(result["items"] / wall, 2) if wall > 0 else None,
+            "latency_ms": {
+                "mean": round(float(samples.mean()), 2),
+                "p50": round(float(np.percentile(samples, 50)), 2),
+                "p95": round(float(np.percentile(samples, 95)), 2),
+                "p99": round(float(np.percentile(samples, 99)), 2),
+                "max": round(float(samples.max()), 2),
+            } if len(samples) else None,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+
+def run_benchmark(files: List[str], work_dir: str, scale: int = 1, workers: int = 4, seed: int = 0, stream: bool = False) -> dict:
+    """
+    Runs the pipeline over `files` (scaled `scale` times) with every store rooted in `work_dir`.
+    With `stream`, extraction uses the streaming API and the time to each document's first field is
+    reported as its own stage.
+    Expects DATABASE_URL, CHROMA_DB_DIR, GROQ_BASE_URL and GROQ_API_KEY to be set before this module's caller
+    imported anything from the app (see main()).
+    """
+    # Imported here so main() can point the environment at the scratch directory and mock server first
+    import cache
+    import content_store
+    import vector_store
+    from sqlmodel import Session
+    from cache import ContentCache, parse_document_cached
+    from chunking import split_text
+    from content_store import ContentStore, set_document_text
+    from database import engine, create_db_and_tables
+    from extraction import DEFAULT_FIELDS, CHUNKS_PER_FIELD, extract_data_from_text, stream_extraction
+    from models import Project, Document
+    from records import RecordWriter
+
+    cache.set_cache(ContentCache(root=os.path.join(work_dir, "cache")))
+    content_store.set_content_store(ContentStore(root=os.path.join(work_dir, "content")))
+    vector_store.reset_client()
+    create_db_and_tables()
+    stages = Stages()
+    fields = DEFAULT_FIELDS
+    try:
+        stages.start("parse")
+        samples = []
+        for path in files:
+            started = time.perf_counter()
+            text, _ = parse_document_cached(path)
+            stages.record("parse", time.perf_counter() - started)
+            samples.append((os.path.basename(path), text))
+        stages.finish("parse")
+        corpus = scaled_corpus(samples, scale, seed)
+
+        with Session(engine) as session:
+            project = Project(name="benchmark")
+            session.add(project)
+            session.commit()
+            project_id = project.id
+
+        # Ingest: text into the content store and a Document row, one commit per document as uploads do
+        stages.start("ingest")
+        documents = [] # (document_id, text)
+        for name, text in corpus:
+            started = time.perf_counter()
+            with Session(engine) as session:
+                doc = Document(project_id=project_id, filename=name, file_path="", status="ingested")
+                set_document_text(doc, text)
+                session.add(doc)
+                session.commit()
+                documents.append((doc.id, text))
+            stages.record("ingest", time.perf_counter() - started)
+        stages.finish("ingest")
+
+        stages.start("chunk")
+        chunk_count = 0
+        for _, text in documents:
+            started = time.perf_counter()
+            chunks = split_text(text)
+            stages.record("chunk", time.perf_counter() - started, items=len(chunks))
+            chunk_count += len(chunks)
+        stages.finish("chunk")
+
+        # Embedding is batched across documents, so per-document latency is the gap between completions
+        stages.start("embed")
+        last = [time.perf_counter()]
+        def stored(document_id: int, chunks: int):
+            now = time.perf_counter()
+            stages.record("embed", now - last[0], items=chunks)
+            last[0] = now
+        vector_store.bulk_store_documents(((doc_id, text, None) for doc_id, text in documents), on_document_stored=stored, project_id=project_id)
+        stages.finish("embed")
+
+        stages.start("retrieve")
+        queries = [f"{f['name']}: {f['description']}" for f in fields]
+        for doc_id, _ in documents:
+            started = time.perf_counter()
+            vector_store.query_document_fields(doc_id, queries, n_results=CHUNKS_PER_FIELD, project_id=project_id)
+            stages.record("retrieve", time.perf_counter() - started)
+        stages.finish("retrieve")
+
+        # Extract and persist as batch extraction does: a pool of workers sharing one group-commit writer
+        writer = RecordWriter(engine)
+        errors = []
+        def extract(document: Tuple[int, str]):
+            doc_id, text = document
+            started = time.perf_counter()
+            try:
+                if stream:
+                    results = []
+                    for res in stream_extraction(text, fields, document_id=doc_id, use_cache=False, project_id=project_id):
+                        if not results:
+                            stages.record("first_field", time.perf_counter() - started)
+                        results.append(res)
+                else:
+                    results = extract_data_from_text(text, fields, document_id=doc_id, use_cache=False, project_id=project_id)
+            except Exception as e:
+                errors.append(f"document {doc_id}: {e}")
+                return
+            extracted = time.perf_counter()
+            stages.record("extract", extracted - started)
+            writer.write(doc_id, results)
+            stages.record("persist", time.perf_counter() - extracted)
+
+        extract_stages = ["first_field", "extract", "persist"] if stream else ["extract", "persist"]
+        for stage in extract_stages:
+            stages.start(stage)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(extract, documents))
+        for stage in extract_stages:
+            stages.finish(stage)
+    finally:
+        cache.set_cache(None)
+        content_store.set_content_store(None)
+        vector_store.reset_client()
+
+    return {
+        "corpus": {
+            "files": len(files),
+            "documents": len(documents),
+            "characters": sum(len(text) for _, text in documents),
+            "chunks": chunk_count,
+            "fields": len(fields),
+        },
+        "stages": stages.results,
+        "extraction_errors": errors,
+        "commit_transactions": writer.transactions,
+    }
+
+def print_report(report: dict):
+    corpus = report["corpus"]
+    print(f"\n{corpus['documents']} documents ({corpus['files']} files), {corpus['characters']:,} characters, "
+          f"{corpus['chunks']} chunks, {corpus['fields']} fields")
+    print(f"{'stage':<10}{'count':>7}{'wall s':>9}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'rss MB':>9}")
+    for stage, result in report["stages"].items():
+        latency = result["latency_ms"] or {}
+        cells = [latency.get(k, "-") for k in ("p50", "p95", "p99", "max")]
+        print(f"{stage:<10}{result['count']:>7}{result['wall_seconds']:>9}{result['throughput_per_second'] or '-':>10}"
+              + "".join(f"{c:>10}" for c in cells) + f"{result['peak_rss_mb'] or '-':>9}")
+    llm = report["mock_llm"]
+    print(f"Mock LLM: {llm['completions']} completions, {llm['rate_limited']} rate limited (429), "
+          f"{llm['prompt_tokens']:,} prompt tokens. {report['commit_transactions']} record transactions.")
+    for error in report["extraction_errors"][:10]:
+        print(f"Extraction failed: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="+", help=f"Documents to run (default: every PDF/HTML in {SAMPLE_DIR})")
+    parser.add_argument("--scale", type=int, default=1, help="Copies of each file in the corpus; copies after the first are synthetic variants")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent extractions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Mock LLM extra seconds per completion, uniform")
+    parser.add_argument("--latency-per-1k-tokens", type=float, default=0.0, help="Mock LLM extra seconds per thousand prompt tokens")
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Mock LLM request limit (429 with Retry-After beyond it)")
+    parser.add_argument("--tokens-per-minute", type=int, default=None, help="Mock LLM prompt token limit")
+    parser.add_argument("--stream", action="store_true", help="Use streaming extraction and report time to first field")
+    parser.add_argument("--retrieval-mode", default="hybrid", help="RETRIEVAL_MODE to benchmark: hybrid, vector or lexical")
+    parser.add_argument("--embedding-backend", default="hash", help="EMBEDDING_BACKEND to benchmark (default hash: no model download)")
+    parser.add_argument("--database-url", default=None, help="Database to write to (default: SQLite in the scratch directory)")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a temporary one, deleted afterwards)")
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    files = args.files or sample_files()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ltr-benchmark-")
+    os.makedirs(work_dir, exist_ok=True)
+    server = MockGroqServer(latency=args.latency, jitter=args.jitter, latency_per_1k_tokens=args.latency_per_1k_tokens,
+                            requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute, seed=args.seed)
+    # Read by database.py, extraction.py, embeddings.py and vector_store.py at import, which run_benchmark() does next
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+    os.environ["GROQ_BASE_URL"] = server.url
+    os.environ["GROQ_API_KEY"] = "benchmark"
+    os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+    os.environ["RETRIEVAL_MODE"] = args.retrieval_mode
+    os.environ["CHROMA_DB_DIR"] = os.path.join(work_dir, "chroma_db")
+    try:
+        with server:
+            report = run_benchmark(files, work_dir, scale=args.scale, workers=args.workers, seed=args.seed, stream=args.stream)
+        report["mock_llm"] = dict(server.stats)
+        report["config"] = {k: v for k, v in vars(args).items() if k not in ("files", "output")}
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of the HTML parsers (parsers.parse_html): "soup" (BeautifulSoup get_text) against "fast"
+(streaming, whitespace-collapsing, table rows kept on one line) on the HTML samples in data/.
+
+For each file, and for copies concatenated --scale times to mimic large exhibits, reports the median parse
+time, peak Python memory while parsing, output size, the share of output that is whitespace, and the
+chunk count split_text produces from it.
+
+Usage (from backend/):
+    python benchmark_html.py [--scale 10] [--repeats 5] [--files ../data/EX-10.2.html] [--output results.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import List
+from benchmark import SAMPLE_DIR
+from chunking import split_text
+from parsers import parse_html
+
+PARSERS = ("soup", "fast")
+
+def html_samples(directory: str = SAMPLE_DIR) -> List[str]:
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith((".html", ".htm")))
+
+def scaled_copy(file_path: str, scale: int, work_dir: str) -> str:
+    """The file's markup repeated `scale` times, as one large document."""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        markup = f.read()
+    path = os.path.join(work_dir, f"x{scale}-{os.path.basename(file_path)}")
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(scale):
+            f.write(markup)
+    return path
+
+def measure(file_path: str, parser: str, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        text = parse_html(file_path, parser)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    parse_html(file_path, parser)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    whitespace = sum(1 for char in text if char.isspace())
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "peak_memory_mb": round(peak / (1024 * 1024), 1),
+        "chars": len(text),
+        "lines": text.count("\n") + 1,
+        "whitespace_share": round(whitespace / max(1, len(text)), 3),
+        "chunks": len(split_text(text)),
+    }
+
+def run_benchmark(files: List[str], scale: int = 10, repeats: int = 5) -> List[dict]:
+    work_dir = tempfile.mkdtemp(prefix="ltr-html-bench-")
+    try:
+        results = []
+        for file_path in files:
+            variants = [(os.path.basename(file_path), file_path)]
+            if scale > 1:
+                variants.append((f"{os.path.basename(file_path)} x{scale}", scaled_copy(file_path, scale, work_dir)))
+            for name, path in variants:
+                row = {"file": name, "bytes": os.path.getsize(path)}
+                for parser in PARSERS:
+                    row[parser] = measure(path, parser, repeats)
+                row["speedup"] = round(row["soup"]["median_ms"] / max(row["fast"]["median_ms"], 0.1), 1)
+                results.append(row)
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_report(results: List[dict]):
+    columns = ("median_ms", "peak_memory_mb", "chars", "lines", "whitespace_share", "chunks")
+    print(f"{'file':<28} {'parser':<6} " + " ".join(f"{c:>16}" for c in columns))
+    for row in results:
+        for parser in PARSERS:
+            print(f"{row['file']:<28} {parser:<6} " + " ".join(f"{row[parser][c]:>16}" for c in columns))
+        print(f"{'':<28} speedup x{row['speedup']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="+", help=f"HTML files to parse (default: every HTML file in {SAMPLE_DIR})")
+    parser.add_argument("--scale", type=int, default=10, help="Also parse each file concatenated this many times (1 = originals only)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed parses per file and parser; the median is reported")
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.files or html_samples(), scale=args.scale, repeats=args.repeats)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
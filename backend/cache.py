@@ -0,0 +1,188 @@
+import hashlib
+import io
+import os
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import metrics
+from parsers import iter_document_pages, PARSER_VERSION
+from storage import write_temp, TEMP_SUFFIX
+
+# Content-addressed cache for work derived from file bytes (parsed text, chunk embeddings) and for
+# per-field LLM extraction results. Entries live under data/cache/<namespace>/ and are evicted
+# least-recently-used once the cache grows past CACHE_MAX_BYTES. Extraction results cost an LLM call
+# each, so they are budgeted separately (EXTRACTION_CACHE_MAX_BYTES) and never evicted to make room
+# for parsed text or embeddings, which are cheap to recompute.
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, "cache")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 of the file bytes, read in blocks so large PDFs are not loaded at once."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ContentCache:
+    """
+    `max_bytes` is shared by every namespace except those given their own budget in `namespace_max_bytes`
+    (by default the "extractions" namespace, with EXTRACTION_CACHE_MAX_BYTES).
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, namespace_max_bytes: Optional[Dict[str, int]] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.namespace_max_bytes = {"extractions": EXTRACTION_CACHE_MAX_BYTES} if namespace_max_bytes is None else namespace_max_bytes
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        self._sizes: Dict[Optional[str], int] = {} # Bytes on disk per budget (None: the shared one), computed on first use
+        self._lock = threading.Lock()
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.root, namespace, key[:2], key)
+
+    def _budget_of(self, namespace: str) -> Optional[str]:
+        return namespace if namespace in self.namespace_max_bytes else None
+
+    def _max_bytes(self, budget: Optional[str]) -> int:
+        return self.max_bytes if budget is None else self.namespace_max_bytes[budget]
+
+    def _entries(self, budget: Optional[str] = None) -> List[Tuple[float, int, str]]:
+        if budget is not None:
+            namespaces = [budget]
+        elif os.path.isdir(self.root):
+            namespaces = [ns for ns in os.listdir(self.root) if ns not in self.namespace_max_bytes]
+        else:
+            namespaces = []
+        entries = []
+        for namespace in namespaces:
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, namespace)):
+                for name in filenames:
+                    if name.endswith(TEMP_SUFFIX): # Another thread's write in progress
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _current_size(self, budget: Optional[str] = None) -> int:
+        if budget not in self._sizes:
+            self._sizes[budget] = sum(size for _, size, _ in self._entries(budget))
+        return self._sizes[budget]
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses[namespace] += 1
+            return None
+        # Touch so eviction sees this entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError: # Evicted since the read; the data is still good
+            pass
+        with self._lock:
+            self.hits[namespace] += 1
+        return data
+
+    def put(self, namespace: str, key: str, data: bytes):
+        path = self._path(namespace, key)
+        budget = self._budget_of(namespace)
+        tmp_path = write_temp(path, data)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._sizes[budget] = self._current_size(budget) + len(data) - previous
+            if self._sizes[budget] > self._max_bytes(budget):
+                self._evict(budget)
+
+    def _evict(self, budget: Optional[str] = None):
+        """Drops least-recently-used entries of one budget until it is back under 90% of its limit."""
+        target = int(self._max_bytes(budget) * 0.9)
+        for _, size, path in sorted(self._entries(budget)):
+            if self._sizes[budget] <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._sizes[budget] -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            namespaces = set(self.hits) | set(self.misses)
+            return {
+                "bytes": self._current_size(),
+                "max_bytes": self.max_bytes,
+                "budgets": {
+                    ns: {"bytes": self._current_size(ns), "max_bytes": limit} for ns, limit in sorted(self.namespace_max_bytes.items())
+                },
+                "evictions": self.evictions,
+                "namespaces": {
+                    ns: {"hits": self.hits[ns], "misses": self.misses[ns]} for ns in sorted(namespaces)
+                },
+            }
+
+_cache = None
+
+def get_cache() -> ContentCache:
+    global _cache
+    if _cache is None:
+        _cache = ContentCache()
+    return _cache
+
+def set_cache(cache: Optional[ContentCache]):
+    """Swap the process-wide cache (tests point it at a temp directory)."""
+    global _cache
+    _cache = cache
+
+def parse_document_cached(file_path: str) -> Tuple[str, str]:
+    """
+    Parses a document, reusing the cached text when the same bytes were parsed by the same parser version.
+
+    Returns:
+        (text, file_hash) - the hash doubles as the cache key for the document's embeddings.
+    """
+    digest = file_hash(file_path)
+    key = f"{digest}-{PARSER_VERSION}"
+    cache = get_cache()
+
+    cached = cache.get("parsed", key)
+    if cached is not None:
+        return zlib.decompress(cached).decode("utf-8"), digest
+
+    # Pages are compressed as they arrive (overlapping pool workers still extracting later pages), so no
+    # encoded copy of the whole text is built. Chunking and the content store still need the joined text.
+    compressor = zlib.compressobj()
+    pages, compressed = [], []
+    with metrics.timed("parse"):
+        for page in iter_document_pages(file_path):
+            pages.append(page)
+            compressed.append(compressor.compress(page.encode("utf-8")))
+        compressed.append(compressor.flush())
+    cache.put("parsed", key, b"".join(compressed))
+    return "".join(pages), digest
+
+def get_embeddings(key: str) -> Optional[np.ndarray]:
+    data = get_cache().get("embeddings", key)
+    if data is None:
+        return None
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+def put_embeddings(key: str, embeddings) -> None:
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(embeddings, dtype=np.float32), allow_pickle=False)
+    get_cache().put("embeddings", key, buf.getvalue())
@@ -0,0 +1,126 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional
+from pydantic import BaseModel
+from parsers import PAGE_BREAK
+
+# Bump whenever split_text output changes so cached chunk embeddings are not reused
+CHUNKER_VERSION = "2"
+
+# Where a new block starts: blank lines, page breaks, and lines that open a heading or numbered clause
+# ("ARTICLE 5", "Section 2.1", "12.", "3.4.1", "(a)", "(iv)", all-caps headings).
+BLOCK_BOUNDARY = re.compile(
+    r"\n[ \t]*\n|" + re.escape(PAGE_BREAK) + r"|"
+    r"\n(?=[ \t]*(?:ARTICLE|Article|SECTION|Section|EXHIBIT|Exhibit|SCHEDULE|Schedule)\b)|"
+    r"\n(?=[ \t]*\d+(?:\.\d+)*[.)]?[ \t]+[A-Z])|"
+    r"\n(?=[ \t]*\([a-z0-9]{1,4}\)[ \t])|"
+    r"\n(?=[ \t]*[A-Z][A-Z0-9 ,;&'\-]{3,}[ \t]*\n)"
+)
+# Blocks that open a new section; a chunk that is already reasonably full ends before them
+HEADING = re.compile(r"[ \t]*(?:ARTICLE|Article|SECTION|Section|EXHIBIT|Exhibit|SCHEDULE|Schedule)\b|[ \t]*[A-Z][A-Z0-9 ,;&'\-]{3,}[ \t]*$", re.MULTILINE)
+
+class Chunk(BaseModel):
+    text: str
+    start: int # Offset of the first character in the source text
+    end: int # Offset one past the last character
+    page: Optional[int] = None # 1-based page of `start`, for texts with page breaks
+
+def _blocks(text: str) -> List[List[int]]:
+    """Splits text into [start, end) spans at structural boundaries, trimming surrounding whitespace."""
+    spans = []
+    start = 0
+    for match in BLOCK_BOUNDARY.finditer(text):
+        spans.append([start, match.start()])
+        start = match.end()
+    spans.append([start, len(text)])
+
+    blocks = []
+    for start, end in spans:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            blocks.append([start, end])
+    return blocks
+
+def _sentence_cut(text: str, start: int, limit: int) -> int:
+    """Offset of the last sentence (or clause) end in text[start:limit], or -1."""
+    cut = max(text.rfind(". ", start, limit), text.rfind("; ", start, limit))
+    return cut + 1 if cut > start else -1
+
+def _split_long_block(text: str, start: int, end: int, chunk_size: int) -> List[List[int]]:
+    """Cuts a block longer than chunk_size at sentence ends, falling back to the last space."""
+    pieces = []
+    while end - start > chunk_size:
+        limit = start + chunk_size
+        cut = _sentence_cut(text, start, limit)
+        if cut <= start + chunk_size // 2:
+            cut = text.rfind(" ", start + 1, limit)
+            if cut <= start:
+                cut = limit
+        pieces.append([start, cut])
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        pieces.append([start, end])
+    return pieces
+
+def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
+    """
+    Single-pass, structure-aware splitter.
+
+    Whole paragraphs, headings and numbered clauses are packed into chunks of at most `chunk_size`
+    characters; blocks are only cut (at sentence, then word, boundaries) when longer than that, or to
+    top up a chunk that is less than three-quarters full with the next paragraph's opening sentences. A chunk
+    ends early before a heading once it is three-quarters full, so sections start fresh chunks. Consecutive
+    chunks share trailing blocks totalling at most `chunk_overlap` characters, never partial words.
+    Offsets index into `text`, so `text[chunk.start:chunk.end] == chunk.text`.
+    """
+    blocks = []
+    for start, end in _blocks(text):
+        blocks.extend(_split_long_block(text, start, end, chunk_size))
+
+    page_breaks = [m.start() for m in re.finditer(re.escape(PAGE_BREAK), text)]
+
+    def make_chunk(first: int, last: int) -> Chunk:
+        start, end = blocks[first][0], blocks[last][1]
+        page = bisect_right(page_breaks, start) + 1 if page_breaks else None
+        return Chunk(text=text[start:end], start=start, end=end, page=page)
+
+    chunks = []
+    first = 0
+    min_last = 0 # Every chunk must reach past the previous one
+    while first < len(blocks):
+        last = max(first, min_last)
+        while last + 1 < len(blocks):
+            candidate_end = blocks[last + 1][1]
+            if candidate_end - blocks[first][0] > chunk_size:
+                # Fill an under-full chunk with the next paragraph's leading sentences rather than leave it sparse
+                used = blocks[last][1] - blocks[first][0]
+                if used < chunk_size * 3 // 4:
+                    cut = _sentence_cut(text, blocks[last + 1][0], blocks[first][0] + chunk_size)
+                    if cut != -1:
+                        rest = cut
+                        while rest < blocks[last + 1][1] and text[rest].isspace():
+                            rest += 1
+                        blocks[last + 1:last + 2] = [[blocks[last + 1][0], cut], [rest, blocks[last + 1][1]]]
+                        last += 1
+                break
+            if HEADING.match(text, blocks[last + 1][0]) and blocks[last][1] - blocks[first][0] >= chunk_size * 3 // 4:
+                break
+            last += 1
+        chunks.append(make_chunk(first, last))
+        if last + 1 >= len(blocks):
+            break
+
+        # Carry whole trailing blocks into the next chunk as overlap, as long as the next new block still fits
+        next_first = last + 1
+        while (next_first - 1 > first
+               and blocks[last][1] - blocks[next_first - 1][0] <= chunk_overlap
+               and blocks[last + 1][1] - blocks[next_first - 1][0] <= chunk_size):
+            next_first -= 1
+        first = next_first
+        min_last = last + 1
+    return chunks
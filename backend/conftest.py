@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+import time
+import pytest
+from sqlalchemy import event
+from embeddings import HashEmbeddingFunction, set_embedding_function
+from vector_store import reset_client
+
+@pytest.fixture
+def wait_for_job():
+    """Polls GET /jobs/{id} until the background job completes or fails, and returns it."""
+    def wait(client, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                return job
+            time.sleep(0.05)
+        raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+    return wait
+
+@pytest.fixture
+def hash_store():
+    """A temporary vector store directory with the offline hash embedding backend."""
+    set_embedding_function(HashEmbeddingFunction())
+    path = tempfile.mkdtemp()
+    yield path
+    reset_client()
+    set_embedding_function(None)
+    shutil.rmtree(path, ignore_errors=True)
+
+@pytest.fixture
+def count_statements():
+    """Runs fn() and returns how many SQL statements it sent through `engine`."""
+    def count(engine, fn):
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return len(statements)
+    return count
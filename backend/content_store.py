@@ -0,0 +1,221 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from sqlmodel import Session, select
+from cache import DATA_DIR
+from models import Document
+from parsers import PAGE_BREAK
+from storage import atomic_write
+
+# Parsed document text lives here rather than in the SQL row. Blobs are addressed by the SHA-256 of the
+# text, so identical parses are stored once, and are never evicted (unlike data/cache/).
+#
+# Blob layout: MAGIC, a little-endian u64 header length, a JSON header, then the text as independently
+# zlib-compressed blocks of CONTENT_BLOCK_CHARS characters. The header holds each block's byte offset and
+# the character offset at which every page starts, so a range read maps the file and inflates only the
+# blocks it touches. It also holds the span of every paragraph-level text block (paragraph, heading, list
+# item, table), so a citation's offset can be widened to the block it falls in.
+DEFAULT_CONTENT_DIR = os.path.join(DATA_DIR, "content")
+CONTENT_BLOCK_CHARS = int(os.getenv("CONTENT_BLOCK_CHARS", str(64 * 1024)))
+# Parsed headers of the most recently read blobs kept in memory
+CONTENT_HEADER_CACHE_SIZE = int(os.getenv("CONTENT_HEADER_CACHE_SIZE", "256"))
+MAGIC = b"LTRCONT1"
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def page_starts(text: str) -> List[int]:
+    """Character offset at which each page begins; page N (1-based) starts at page_starts[N - 1]."""
+    starts = [0]
+    position = text.find(PAGE_BREAK)
+    while position != -1:
+        if position + 1 < len(text):
+            starts.append(position + 1)
+        position = text.find(PAGE_BREAK, position + 1)
+    return starts
+
+# Text blocks are separated by blank lines (parsers emit one between paragraphs, headings and tables) or page breaks
+TEXT_BLOCK_SEPARATOR = re.compile(r"\n[ \t]*\n|" + re.escape(PAGE_BREAK))
+
+def text_block_spans(text: str) -> List[List[int]]:
+    """[start, end) of each text block, surrounding whitespace trimmed."""
+    spans = []
+    start = 0
+    for match in list(TEXT_BLOCK_SEPARATOR.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append([start, end])
+        if match:
+            start = match.end()
+    return spans
+
+class ContentStore:
+    def __init__(self, root: str = DEFAULT_CONTENT_DIR, block_chars: int = CONTENT_BLOCK_CHARS, header_cache_size: int = CONTENT_HEADER_CACHE_SIZE):
+        self.root = root
+        self.block_chars = block_chars
+        self.header_cache_size = header_cache_size
+        self._headers = OrderedDict() # key -> parsed header, LRU; blobs are immutable so these never go stale
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, text: str) -> str:
+        """Stores text and returns its key. Storing the same text again is a no-op."""
+        key = content_hash(text)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+
+        blocks = [zlib.compress(text[i:i + self.block_chars].encode("utf-8")) for i in range(0, len(text), self.block_chars)]
+        offsets = [0]
+        for block in blocks:
+            offsets.append(offsets[-1] + len(block))
+        header = json.dumps({
+            "chars": len(text),
+            "block_chars": self.block_chars,
+            "offsets": offsets,
+            "pages": page_starts(text),
+            "blocks": text_block_spans(text),
+        }).encode("utf-8")
+
+        atomic_write(path, MAGIC, struct.pack("<Q", len(header)), header, *blocks)
+        return key
+
+    def _header(self, key: str, mapped: mmap.mmap) -> dict:
+        with self._lock:
+            header = self._headers.get(key)
+            if header is not None:
+                self._headers.move_to_end(key)
+        if header is None:
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"Not a content blob: {key}")
+            (length,) = struct.unpack_from("<Q", mapped, len(MAGIC))
+            data_start = len(MAGIC) + 8 + length
+            header = json.loads(mapped[len(MAGIC) + 8:data_start])
+            header["data_start"] = data_start
+            header["block_starts"] = [start for start, _ in header.get("blocks", [])]
+            with self._lock:
+                self._headers[key] = header
+                while len(self._headers) > self.header_cache_size:
+                    self._headers.popitem(last=False)
+        return header
+
+    def _open(self, key: str):
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise KeyError(key)
+        with f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def info(self, key: str) -> dict:
+        """Total characters and page count of a stored text."""
+        with self._open(key) as mapped:
+            header = self._header(key, mapped)
+        return {"chars": header["chars"], "pages": len(header["pages"])}
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> str:
+        """Characters [start, end) of a stored text, inflating only the blocks that overlap the range."""
+        with self._open(key) as mapped:
+            header = self._header(key, mapped)
+            chars, block_chars, offsets = header["chars"], header["block_chars"], header["offsets"]
+            end = chars if end is None else min(end, chars)
+            start = max(0, start)
+            if start >= end:
+                return ""
+            first, last = start // block_chars, (end - 1) // block_chars
+            base = header["data_start"]
+            text = "".join(
+                zlib.decompress(mapped[base + offsets[i]:base + offsets[i + 1]]).decode("utf-8")
+                for i in range(first, last + 1)
+            )
+        skip = first * block_chars
+        return text[start - skip:end - skip]
+
+    def get(self, key: str) -> str:
+        return self.read(key)
+
+    def page_span(self, key: str, page: int) -> Tuple[int, int]:
+        """[start, end) character span of a 1-based page. Raises IndexError past the last page."""
+        with self._open(key) as mapped:
+            header = self._header(key, mapped)
+        pages = header["pages"]
+        if not 1 <= page <= len(pages):
+            raise IndexError(f"Page {page} out of range (1-{len(pages)})")
+        end = pages[page] if page < len(pages) else header["chars"]
+        return pages[page - 1], end
+
+    def page_of(self, key: str, offset: int) -> int:
+        """1-based page containing a character offset."""
+        with self._open(key) as mapped:
+            header = self._header(key, mapped)
+        return bisect_right(header["pages"], offset)
+
+    def block_span(self, key: str, offset: int) -> Tuple[int, int]:
+        """
+        [start, end) of the text block containing a character offset (or the nearest block before it).
+        Texts stored before blocks were recorded fall back to the offset's page.
+        """
+        with self._open(key) as mapped:
+            header = self._header(key, mapped)
+        blocks = header.get("blocks")
+        if not blocks:
+            return self.page_span(key, max(1, bisect_right(header["pages"], offset)))
+        index = max(0, bisect_right(header["block_starts"], offset) - 1)
+        return tuple(blocks[index])
+
+_store = None
+
+def get_content_store() -> ContentStore:
+    global _store
+    if _store is None:
+        _store = ContentStore()
+    return _store
+
+def set_content_store(store: Optional[ContentStore]):
+    """Swap the process-wide store (tests point it at a temp directory)."""
+    global _store
+    _store = store
+
+def document_text(doc: Document) -> str:
+    """A Document's parsed text: from the content store, or the legacy inline column for rows not yet moved."""
+    if doc.content_hash:
+        return get_content_store().get(doc.content_hash)
+    return doc.content
+
+def set_document_text(doc: Document, text: str):
+    """Stores a Document's parsed text in the content store and records its key and size on the row."""
+    doc.content_hash = get_content_store().put(text)
+    doc.content_length = len(text)
+    doc.page_count = len(page_starts(text))
+    doc.content = ""
+
+def move_inline_content(engine, batch_size: int = 100) -> int:
+    """Moves text still stored inline in Document.content (databases from before the content store) into the store."""
+    moved = 0
+    while True:
+        with Session(engine) as session:
+            docs = session.exec(select(Document).where(Document.content != "").limit(batch_size)).all()
+            if not docs:
+                return moved
+            for doc in docs:
+                set_document_text(doc, doc.content)
+                session.add(doc)
+            session.commit()
+            moved += len(docs)
@@ -0,0 +1,159 @@
+import difflib
+import hashlib
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from table import Cell, TableDocument, TableRow
+
+# Cross-document difference highlighting. For each field, documents are grouped by normalized value,
+# the largest group is the consensus, and small groups are flagged as outliers. Long (clause-text)
+# values get a token-level diff against the consensus. Work is proportional to the number of distinct
+# values, not document pairs, and is cached twice: whole field results keyed by the records they were
+# computed from, and individual token diffs keyed by the two texts compared.
+DIFF_CACHE_SIZE = int(os.getenv("DIFF_CACHE_SIZE", "4096"))
+# Values at least this long are treated as clause text and get token diffs
+CLAUSE_MIN_CHARS = 80
+# A group is an outlier when it is smaller than the consensus and holds at most this share of the values
+OUTLIER_SHARE = 0.1
+
+TOKEN = re.compile(r"\s+|\w+|[^\w\s]")
+TRIM = " \t\n.,;:'\"()[]"
+
+class DiffOp(BaseModel):
+    op: str # equal, insert, delete, replace
+    base: str # Consensus text of the span
+    other: str # This group's text of the span
+
+class ValueGroup(BaseModel):
+    key: str # Normalized value shared by the group
+    value: str # Most common display value in the group
+    document_ids: List[int]
+    record_ids: List[int]
+    consensus: bool = False
+    outlier: bool = False
+    diff: Optional[List[DiffOp]] = None # Token diff against the consensus, for clause text
+
+class FieldDiff(BaseModel):
+    field_name: str
+    clause: bool # Values are long enough to be compared token by token
+    missing_document_ids: List[int] # Documents with no value for the field
+    groups: List[ValueGroup] # Largest first
+
+def normalize_value(value: str) -> str:
+    """Comparison key: case-folded, whitespace collapsed, surrounding punctuation and quotes removed."""
+    return " ".join(value.casefold().split()).strip(TRIM)
+
+def token_diff(base: str, other: str) -> List[DiffOp]:
+    a, b = TOKEN.findall(base), TOKEN.findall(other)
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    return [
+        DiffOp(op=tag, base="".join(a[i1:i2]), other="".join(b[j1:j2]))
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+    ]
+
+class DiffCache:
+    def __init__(self, max_entries: int = DIFF_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+_cache = None
+
+def get_diff_cache() -> DiffCache:
+    global _cache
+    if _cache is None:
+        _cache = DiffCache()
+    return _cache
+
+def _cached_token_diff(cache: DiffCache, base: str, other: str) -> List[DiffOp]:
+    key = ("tokens", hashlib.sha256(f"{len(base)}:{base}{other}".encode("utf-8")).hexdigest())
+    ops = cache.get(key)
+    if ops is None:
+        ops = token_diff(base, other)
+        cache.put(key, ops)
+    return ops
+
+def _field_key(field_name: str, entries: List[Tuple[int, Optional[Cell]]]) -> Tuple[str, str]:
+    """Identifies a field's inputs: the records (and their text) behind every cell."""
+    digest = hashlib.sha256(field_name.encode("utf-8"))
+    for document_id, cell in entries:
+        if cell is None:
+            digest.update(f"|{document_id}:-".encode("utf-8"))
+        else:
+            digest.update(f"|{document_id}:{cell.record_id}:{len(cell.value or '')}:{cell.value}:{cell.normalization}".encode("utf-8"))
+    return ("field", digest.hexdigest())
+
+def diff_field(field_name: str, entries: List[Tuple[int, Optional[Cell]]], cache: Optional[DiffCache] = None) -> FieldDiff:
+    """Groups one field's values across documents; `entries` pairs each document id with its cell (or None)."""
+    cache = cache or get_diff_cache()
+    key = _field_key(field_name, entries)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    missing = []
+    members: Dict[str, List[Tuple[int, Cell, str]]] = {}
+    for document_id, cell in entries:
+        text = (cell.value or "").strip() if cell else ""
+        if not text:
+            missing.append(document_id)
+            continue
+        # The extractor's normalized form (e.g. ISO dates) groups better than the raw text when present
+        normalized = normalize_value(cell.normalization or text)
+        members.setdefault(normalized, []).append((document_id, cell, text))
+
+    groups = [
+        ValueGroup(
+            key=normalized,
+            value=Counter(text for _, _, text in group).most_common(1)[0][0],
+            document_ids=[document_id for document_id, _, _ in group],
+            record_ids=[cell.record_id for _, cell, _ in group],
+        )
+        for normalized, group in members.items()
+    ]
+    groups.sort(key=lambda g: -len(g.document_ids)) # Stable: ties keep document order
+
+    clause = any(len(g.value) >= CLAUSE_MIN_CHARS for g in groups)
+    total = sum(len(g.document_ids) for g in groups)
+    if groups:
+        consensus = groups[0]
+        # With a tie for largest there is no consensus to measure others against
+        consensus.consensus = len(groups) == 1 or len(groups[1].document_ids) < len(consensus.document_ids)
+        for group in groups[1:]:
+            group.outlier = consensus.consensus and len(group.document_ids) <= max(1, total * OUTLIER_SHARE)
+            if clause:
+                group.diff = _cached_token_diff(cache, consensus.value, group.value)
+
+    result = FieldDiff(field_name=field_name, clause=clause, missing_document_ids=missing, groups=groups)
+    cache.put(key, result)
+    return result
+
+def diff_table(documents: List[TableDocument], rows: List[TableRow], cache: Optional[DiffCache] = None) -> List[FieldDiff]:
+    """Diffs every row of a project comparison table (see table.py)."""
+    document_ids = [doc.id for doc in documents]
+    return [diff_field(row.field_name, list(zip(document_ids, row.cells)), cache) for row in rows]
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+# Which embedder backs the vector store:
+#   default               - Chroma's ONNX all-MiniLM-L6-v2 (downloaded on first use)
+#   sentence-transformers - a local sentence-transformers model; EMBEDDING_MODEL is a model name or path
+#   hash                  - deterministic hashing-trick vectors; no model, no network (tests, offline benchmarks)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "default")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Chunks per embedder call, and how many distinct query embeddings are memoized
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+HASH_DIMENSIONS = 384
+
+class ResidentDefaultEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma's default model kept loaded between calls. DefaultEmbeddingFunction builds a fresh
+    ONNXMiniLM_L6_V2 (and so reloads the model) on every call. Reports itself as "default" so
+    collections created with Chroma's default embedder still validate.
+    """
+
+    def __init__(self):
+        self._model = ONNXMiniLM_L6_V2()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self._model(input)
+
+    @staticmethod
+    def name() -> str:
+        return "default"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "ResidentDefaultEmbeddingFunction":
+        return ResidentDefaultEmbeddingFunction()
+
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Bag-of-words vectors via the hashing trick. Stable across processes, unlike hash()."""
+
+    def __init__(self, dimensions: int = HASH_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for token in re.findall(r"\w+", text.lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "hash"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashEmbeddingFunction":
+        return HashEmbeddingFunction(config.get("dimensions", HASH_DIMENSIONS))
+
+class CachedEmbeddingFunction:
+    """
+    Wraps an embedder: document embedding is split into EMBEDDING_BATCH_SIZE calls, and query embeddings
+    are memoized in an LRU so repeated retrieval queries (the same field template on every document) are free.
+    Not handed to Chroma: collections are opened with the wrapped backend (see chroma_embedding_function),
+    so Chroma records its name and config and refuses to reopen a collection with a different embedder.
+    """
+
+    def __init__(self, base: EmbeddingFunction, batch_size: int = EMBEDDING_BATCH_SIZE, query_cache_size: int = EMBEDDING_QUERY_CACHE_SIZE):
+        self.base = base
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self.query_hits = 0
+        self.query_misses = 0
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for start in range(0, len(input), self.batch_size):
+            vectors.extend(self.base(input[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, input: Documents) -> Embeddings:
+        found = {}
+        with self._lock:
+            for text in input:
+                if text in self._queries:
+                    self._queries.move_to_end(text)
+                    found[text] = self._queries[text]
+            self.query_hits += sum(1 for text in input if text in found)
+        missing = list(dict.fromkeys(t for t in input if t not in found))
+        if missing:
+            for text, vector in zip(missing, self.base.embed_query(missing)):
+                found[text] = vector
+            with self._lock:
+                self.query_misses += len(missing)
+                for text in missing:
+                    self._queries[text] = found[text]
+                while len(self._queries) > self.query_cache_size:
+                    self._queries.popitem(last=False)
+        return [found[text] for text in input]
+
+    def name(self) -> str:
+        return self.base.name()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.base.get_config()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name(),
+                "query_cache_size": len(self._queries),
+                "query_hits": self.query_hits,
+                "query_misses": self.query_misses,
+            }
+
+def build_backend(backend: str = EMBEDDING_BACKEND, model: str = EMBEDDING_MODEL) -> EmbeddingFunction:
+    if backend == "default":
+        return ResidentDefaultEmbeddingFunction()
+    if backend == "hash":
+        return HashEmbeddingFunction()
+    if backend == "sentence-transformers":
+        # Optional dependency: pip install sentence-transformers
+        from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+        return SentenceTransformerEmbeddingFunction(model_name=model)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+_embedding_function = None
+
+def get_embedding_function() -> CachedEmbeddingFunction:
+    global _embedding_function
+    if _embedding_function is None:
+        _embedding_function = CachedEmbeddingFunction(build_backend())
+    return _embedding_function
+
+def set_embedding_function(embedding_function: Optional[EmbeddingFunction]):
+    """Swap the process-wide embedder (tests use the hash backend). None rebuilds from the environment."""
+    global _embedding_function
+    if embedding_function is not None and not isinstance(embedding_function, CachedEmbeddingFunction):
+        embedding_function = CachedEmbeddingFunction(embedding_function)
+    _embedding_function = embedding_function
+
+def chroma_embedding_function(embedding_function) -> EmbeddingFunction:
+    """The embedder a Chroma collection is opened with: the backend itself, without the caching wrapper."""
+    return getattr(embedding_function, "base", embedding_function)
+
+def embedding_signature(embedding_function: EmbeddingFunction) -> str:
+    """Identifies the embedder and its config (e.g. model path), for keying cached embeddings."""
+    config = json.dumps(embedding_function.get_config(), sort_keys=True, default=str)
+    return f"{embedding_function.name()}-{hashlib.sha256(config.encode('utf-8')).hexdigest()[:12]}"
+
+def warm_up():
+    """Loads the model now (e.g. at startup) rather than on the first ingest or query."""
+    get_embedding_function()(["warm-up"])
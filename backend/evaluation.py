@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+import re
+import zlib
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel, model_validator
+from diffing import normalize_value
+
+# Scores extraction output against human-labelled references (REQUIREMENTS.md section 6):
+#   accuracy               - labelled values the extractor got right
+#   coverage               - labelled values the extractor returned anything for
+#   normalization_validity - returned date/number values whose normalization parses
+#   false_positives        - values returned where the reference says the field is absent
+#
+# Dates and numbers match exactly on their normalized form. Text matches when the normalized strings are
+# equal or, for clause text, when the token-set cosine similarity reaches FUZZY_MATCH_THRESHOLD. A label is clause
+# text when it has at least CLAUSE_MIN_TOKENS words; short values (party names, governing law) must match exactly,
+# since e.g. "Acme Holdings Inc" and "Acme Services Inc" share most tokens. Similarity is computed for all pairs at
+# once on hashed token matrices, in batches of EVALUATION_BATCH_SIZE pairs.
+FUZZY_MATCH_THRESHOLD = float(os.getenv("EVALUATION_FUZZY_THRESHOLD", "0.8"))
+CLAUSE_MIN_TOKENS = int(os.getenv("EVALUATION_CLAUSE_MIN_TOKENS", "8"))
+EVALUATION_BATCH_SIZE = 2048
+TOKEN_DIMENSIONS = 4096
+# Mismatches listed in a report, for spot checks
+MAX_REPORTED_ERRORS = 50
+
+TOKEN = re.compile(r"\w+")
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+class GoldLabel(BaseModel):
+    document_id: Optional[int] = None
+    filename: Optional[str] = None # Alternative to document_id; matches every project document with this filename
+    field_name: str
+    value: Optional[str] = None # None or "" when the field is absent from the document
+    normalization: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _has_document(self):
+        if self.document_id is None and not self.filename:
+            raise ValueError("A label needs a document_id or a filename")
+        return self
+
+def load_labels(path: str) -> List[GoldLabel]:
+    """Reads labels from a JSON list or a CSV file with document_id/filename, field_name, value, normalization columns."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = [{k: (v if v != "" else None) for k, v in row.items()} for row in csv.DictReader(f)]
+        else:
+            rows = json.load(f)
+    return [GoldLabel(**row) for row in rows]
+
+def _is_valid_date(text: Optional[str]) -> bool:
+    if not text or not ISO_DATE.match(text):
+        return False
+    try:
+        date.fromisoformat(text)
+        return True
+    except ValueError:
+        return False
+
+def _as_number(text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    try:
+        return float(text.replace(",", "").replace("$", "").strip())
+    except ValueError:
+        return None
+
+def field_kind(data_type: Optional[str], gold_normalizations: List[Optional[str]]) -> str:
+    """date, number or text. Untyped fields are dates when every labelled normalization is an ISO date."""
+    if data_type in ("date", "number"):
+        return data_type
+    labelled = [n for n in gold_normalizations if n]
+    if labelled and all(_is_valid_date(n) for n in labelled):
+        return "date"
+    return "text"
+
+def _token_matrix(texts: List[str]) -> np.ndarray:
+    """Binary bag-of-words rows via the hashing trick (stable crc32, as in embeddings.HashEmbeddingFunction)."""
+    matrix = np.zeros((len(texts), TOKEN_DIMENSIONS), dtype=np.float32)
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        for token in set(TOKEN.findall(text.casefold())):
+            rows.append(i)
+            cols.append(zlib.crc32(token.encode("utf-8")) % TOKEN_DIMENSIONS)
+    matrix[rows, cols] = 1.0
+    return matrix
+
+def token_similarity(gold: List[str], predicted: List[str]) -> np.ndarray:
+    """Token-set cosine similarity of each (gold[i], predicted[i]) pair."""
+    similarity = np.zeros(len(gold), dtype=np.float32)
+    for start in range(0, len(gold), EVALUATION_BATCH_SIZE):
+        a = _token_matrix(gold[start:start + EVALUATION_BATCH_SIZE])
+        b = _token_matrix(predicted[start:start + EVALUATION_BATCH_SIZE])
+        overlap = (a * b).sum(axis=1)
+        norms = np.sqrt(a.sum(axis=1) * b.sum(axis=1))
+        similarity[start:start + len(a)] = np.divide(overlap, norms, out=np.zeros_like(overlap), where=norms > 0)
+    return similarity
+
+def _score(kind: str, gold: List[Tuple[str, Optional[str]]], predicted: List[Tuple[str, Optional[str]]]) -> np.ndarray:
+    """Whether each prediction matches its label. Both lists hold (value, normalization) and are non-empty pairs."""
+    if kind == "date":
+        return np.array([(g_norm or g) == (p_norm or p) for (g, g_norm), (p, p_norm) in zip(gold, predicted)], dtype=bool)
+    if kind == "number":
+        g_num = np.array([_as_number(g_norm or g) for g, g_norm in gold], dtype=np.float64)
+        p_num = np.array([_as_number(p_norm or p) for p, p_norm in predicted], dtype=np.float64)
+        return np.isclose(g_num, p_num, rtol=1e-9, atol=1e-6) # NaN (unparseable) never matches
+    exact = np.array([normalize_value(g) == normalize_value(p) for (g, _), (p, _) in zip(gold, predicted)], dtype=bool)
+    clause = np.array([len(TOKEN.findall(g)) >= CLAUSE_MIN_TOKENS for g, _ in gold], dtype=bool)
+    fuzzy = token_similarity([g for g, _ in gold], [p for p, _ in predicted]) >= FUZZY_MATCH_THRESHOLD
+    return exact | (clause & fuzzy)
+
+def _valid_normalizations(kind: str, predicted: List[Tuple[str, Optional[str]]]) -> Optional[np.ndarray]:
+    if kind == "date":
+        return np.array([_is_valid_date(norm) for _, norm in predicted], dtype=bool)
+    if kind == "number":
+        return np.array([_as_number(norm or value) is not None for value, norm in predicted], dtype=bool)
+    return None
+
+def _rate(hits: float, total: int) -> Optional[float]:
+    return round(float(hits) / total, 4) if total else None
+
+def evaluate(
+    labels: List[GoldLabel],
+    predictions: Dict[Tuple[int, str], Tuple[Optional[str], Optional[str]]],
+    filenames: Dict[str, List[int]],
+    data_types: Optional[Dict[str, str]] = None,
+) -> Dict:
+    """
+    Scores predictions against labels.
+
+    Args:
+        labels: Reference values.
+        predictions: (document_id, field_name) -> (value, normalization) of the extracted records.
+        filenames: filename -> document ids of every document in the project.
+        data_types: field_name -> data_type from the project template.
+    Returns:
+        {"overall": metrics, "fields": {field_name: metrics}, "errors": [mismatches], "unmatched_labels": n}
+    """
+    data_types = data_types or {}
+    known = {document_id for ids in filenames.values() for document_id in ids}
+    by_field: Dict[str, List[Tuple[int, GoldLabel]]] = {}
+    unmatched = 0 # Labels for documents that are not in the project
+    for label in labels:
+        if label.document_id is not None:
+            document_ids = [label.document_id] if label.document_id in known else []
+        else:
+            document_ids = filenames.get(label.filename, [])
+        if not document_ids:
+            unmatched += 1
+        for document_id in document_ids:
+            by_field.setdefault(label.field_name, []).append((document_id, label))
+
+    fields = {}
+    errors = []
+    totals = {"labels": 0, "correct": 0, "covered": 0, "normalized": 0, "valid": 0, "false_positives": 0}
+    for field_name, pairs in by_field.items():
+        kind = field_kind(data_types.get(field_name), [label.normalization for _, label in pairs])
+        gold = [((label.value or "").strip(), label.normalization) for _, label in pairs]
+        pred = [predictions.get((document_id, field_name), (None, None)) for document_id, _ in pairs]
+        pred = [((value or "").strip(), norm) for value, norm in pred]
+
+        positive = np.array([bool(g) for g, _ in gold], dtype=bool)
+        returned = np.array([bool(p) for p, _ in pred], dtype=bool)
+        both = np.flatnonzero(positive & returned)
+        correct = np.zeros(len(pairs), dtype=bool)
+        if len(both):
+            correct[both] = _score(kind, [gold[i] for i in both], [pred[i] for i in both])
+        valid = _valid_normalizations(kind, [pred[i] for i in np.flatnonzero(returned)])
+
+        n_positive = int(positive.sum())
+        false_positives = int((~positive & returned).sum())
+        fields[field_name] = {
+            "kind": kind,
+            "labels": n_positive,
+            "accuracy": _rate(correct.sum(), n_positive),
+            "coverage": _rate((positive & returned).sum(), n_positive),
+            "normalization_validity": _rate(valid.sum(), len(valid)) if valid is not None else None,
+            "false_positives": false_positives,
+        }
+        totals["labels"] += n_positive
+        totals["correct"] += int(correct.sum())
+        totals["covered"] += int((positive & returned).sum())
+        totals["false_positives"] += false_positives
+        if valid is not None:
+            totals["normalized"] += len(valid)
+            totals["valid"] += int(valid.sum())
+
+        for i in np.flatnonzero(positive & ~correct):
+            if len(errors) >= MAX_REPORTED_ERRORS:
+                break
+            errors.append({"document_id": pairs[i][0], "field_name": field_name, "expected": gold[i][0], "predicted": pred[i][0] or None})
+
+    overall = {
+        "labels": totals["labels"],
+        "accuracy": _rate(totals["correct"], totals["labels"]),
+        "coverage": _rate(totals["covered"], totals["labels"]),
+        "normalization_validity": _rate(totals["valid"], totals["normalized"]),
+        "false_positives": totals["false_positives"],
+    }
+    return {"overall": overall, "fields": fields, "errors": errors, "unmatched_labels": unmatched}
@@ -1,12 +1,49 @@
 import os
 import json
-from typing import List, Dict, Any
-from groq import Groq
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+from groq import Groq, APIConnectionError, APIStatusError
+from json_stream import ResultsStreamParser
+from resilience import SingleFlight, CircuitBreaker, CircuitOpenError, call_with_retry
+import metrics
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile") # Strong model for extraction
+# Alternative Groq-compatible endpoint, e.g. the local mock server used by benchmark.py (unset = Groq's API)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+# Bump whenever generate_extraction_prompt changes meaningfully so cached results are not reused
+PROMPT_VERSION = "3"
+
+# Largest context sent in a single prompt before falling back to map-reduce over windows
+CONTEXT_CHAR_LIMIT = 20000
+# Per-field retrieval: chunks fetched per field query, and the cap on the merged context
+CHUNKS_PER_FIELD = int(os.getenv("EXTRACTION_CHUNKS_PER_FIELD", "3"))
+MAX_CONTEXT_CHUNKS = int(os.getenv("EXTRACTION_MAX_CONTEXT_CHUNKS", "10"))
+# Token budget of one map-reduce window and how many windows are extracted concurrently
+WINDOW_TOKEN_BUDGET = int(os.getenv("EXTRACTION_WINDOW_TOKENS", "4000"))
+WINDOW_MAX_WORKERS = int(os.getenv("EXTRACTION_WINDOW_WORKERS", "4"))
+
+# Provider tokens-per-minute budget shared by every extraction call (unset = unlimited)
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "0")) or None
+# Rough allowance for the JSON completion when budgeting a request up front
+COMPLETION_TOKEN_ESTIMATE = 1024
+
+# Retries of rate-limited (429), overloaded (5xx) or unreachable provider calls: attempts after the first,
+# and the jittered exponential backoff's base and cap in seconds. A Retry-After beyond the cap is not waited out.
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+GROQ_RETRY_BASE_DELAY = float(os.getenv("GROQ_RETRY_BASE_DELAY", "0.5"))
+GROQ_RETRY_MAX_DELAY = float(os.getenv("GROQ_RETRY_MAX_DELAY", "60"))
+# Consecutive failed calls that open the circuit (0 disables it), and how long it then fails fast
+GROQ_CIRCUIT_FAILURES = int(os.getenv("GROQ_CIRCUIT_FAILURES", "5"))
+GROQ_CIRCUIT_RESET_SECONDS = float(os.getenv("GROQ_CIRCUIT_RESET_SECONDS", "30"))
 
 # Default fields if no schema is provided
 DEFAULT_FIELDS = [
@@ -17,6 +54,23 @@ DEFAULT_FIELDS = [
     {"name": "Termination Clause", "description": "Conditions under which the agreement can be terminated"}
 ]
 
+def schema_to_fields(schema_rows) -> List[Dict[str, str]]:
+    """Project template (ExtractionSchema rows) -> prompt field definitions. Falls back to DEFAULT_FIELDS."""
+    if not schema_rows:
+        return DEFAULT_FIELDS
+    return [{"name": row.field_name, "description": row.field_description, "data_type": row.data_type} for row in schema_rows]
+
+def diff_fields(old: List[Dict[str, str]], new: List[Dict[str, str]]) -> Dict[str, List[str]]:
+    """Compares two field templates by name: which fields were added, edited or removed."""
+    # DEFAULT_FIELDS carry no data_type; treat that as the "string" default
+    old_by_name = {f["name"]: (f["description"], f.get("data_type", "string")) for f in old}
+    new_by_name = {f["name"]: (f["description"], f.get("data_type", "string")) for f in new}
+    return {
+        "added": [name for name in new_by_name if name not in old_by_name],
+        "changed": [name for name, f in new_by_name.items() if name in old_by_name and old_by_name[name] != f],
+        "removed": [name for name in old_by_name if name not in new_by_name],
+    }
+
 def get_groq_client():
     if not GROQ_API_KEY:
         # Fail gracefully or mock?
@@ -25,10 +79,94 @@ def get_groq_client():
         # if the user hasn't put the key in yet, but tries to run the app.
         # However, the extraction *action* should definitely fail.
         return None
-    return Groq(api_key=GROQ_API_KEY)
+    # The SDK's own retries are off: call_with_retry retries, reporting every attempt to the circuit breaker
+    return Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, max_retries=0)
+
+_groq_breaker = CircuitBreaker("groq", GROQ_CIRCUIT_FAILURES, GROQ_CIRCUIT_RESET_SECONDS)
+
+def get_groq_breaker() -> CircuitBreaker:
+    return _groq_breaker
+
+def is_transient_error(error: Exception) -> bool:
+    """Provider errors worth retrying: timeouts, connection failures, 408/409/429 and 5xx responses."""
+    if isinstance(error, APIConnectionError): # Includes APITimeoutError
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code in (408, 409, 429) or error.status_code >= 500)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The Retry-After (in seconds) a rate-limited or overloaded response asked for, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _create_completion(client, **kwargs):
+    """chat.completions.create with retries, backoff and the shared circuit breaker."""
+    return call_with_retry(
+        lambda: client.chat.completions.create(model=GROQ_MODEL, **kwargs),
+        is_transient_error,
+        retry_after_seconds,
+        max_retries=GROQ_MAX_RETRIES,
+        base_delay=GROQ_RETRY_BASE_DELAY,
+        max_delay=GROQ_RETRY_MAX_DELAY,
+        breaker=_groq_breaker,
+        name="llm_completion",
+    )
+
+# Identical prompts in flight at once (e.g. two reviewers extracting the same document) share one completion
+_completion_flights = SingleFlight("llm_completion")
+
+class TokenRateLimiter:
+    """
+    Blocks callers so at most `tokens_per_minute` tokens are spent in any rolling 60s window. With a `parent`,
+    every acquisition is also charged to it, so a narrower budget (one batch job) never escapes the shared one.
+    """
+
+    def __init__(self, tokens_per_minute: int, window: float = 60.0, parent: Optional["TokenRateLimiter"] = None):
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.parent = parent
+        self._events = deque() # (timestamp, tokens)
+        self._used = 0
+        self._lock = threading.Lock()
 
-def generate_extraction_prompt(text: str, fields: List[Dict[str, str]]) -> str:
+    def acquire(self, tokens: int):
+        self._acquire(tokens)
+        if self.parent:
+            self.parent.acquire(tokens)
+
+    def _acquire(self, tokens: int):
+        # A single request larger than the budget would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= self.window:
+                    self._used -= self._events.popleft()[1]
+                if self._used + tokens <= self.tokens_per_minute:
+                    self._events.append((now, tokens))
+                    self._used += tokens
+                    return
+                wait = self.window - (now - self._events[0][0])
+            time.sleep(wait)
+
+_default_rate_limiter = TokenRateLimiter(GROQ_TOKENS_PER_MINUTE) if GROQ_TOKENS_PER_MINUTE else None
+
+def get_default_rate_limiter() -> Optional[TokenRateLimiter]:
+    return _default_rate_limiter
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting English legal text
+    return len(text) // 4 + 1
+
+def generate_extraction_prompt(text: str, fields: List[Dict[str, str]], max_chars: Optional[int] = CONTEXT_CHAR_LIMIT) -> str:
     fields_str = json.dumps(fields, indent=2)
+    truncated = max_chars is not None and len(text) > max_chars
+    if truncated:
+        text = text[:max_chars]
     prompt = f"""
     You are a legal AI assistant. Extract the following fields from the document text provided below.
 
@@ -47,59 +185,275 @@ def generate_extraction_prompt(text: str, fields: List[Dict[str, str]]) -> str:
     If a field is not found, set "value" to null.
 
     Document Text:
-    {text[:20000]}
-
-    (Note: Text truncated to first 20000 chars for this demo to fit context window if needed)
+    {text}
+    """
+    if truncated:
+        prompt += f"""
+    (Note: Text truncated to first {max_chars} chars to fit the context window)
     """
-    # Note: 20k chars is a rough limit, might need better chunking for real prod,
-    # but acceptable for a "vertical slice" demo.
+    # Long documents without retrieval context go through extract_long_document instead of truncation.
     return prompt
 
-from vector_store import query_document
+from vector_store import query_document_fields
+from cache import get_cache
+
+def field_cache_key(text_hash: str, field: Dict[str, str], mode: str = "auto") -> str:
+    """Cache key for one field's result: changes with the document, the field definition, the model, the prompt or the mode."""
+    payload = json.dumps([PROMPT_VERSION, GROQ_MODEL, text_hash, field, mode], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def lookup_cached_fields(text_hash: str, fields: List[Dict[str, str]], mode: str = "auto"):
+    """Splits `fields` into cached results (by field name) and the fields that still need the LLM."""
+    cached, missing = {}, []
+    for field in fields:
+        data = get_cache().get("extractions", field_cache_key(text_hash, field, mode))
+        if data is None:
+            missing.append(field)
+        else:
+            cached[field["name"]] = json.loads(data)
+    return cached, missing
+
+def store_cached_fields(text_hash: str, fields: List[Dict[str, str]], results: List[Dict[str, Any]], mode: str = "auto"):
+    by_name = {res.get("field_name"): res for res in results}
+    for field in fields:
+        if field["name"] in by_name:
+            get_cache().put("extractions", field_cache_key(text_hash, field, mode), json.dumps(by_name[field["name"]]).encode("utf-8"))
+
+def extract_data_from_text(text: str, fields: List[Dict[str, str]] = DEFAULT_FIELDS, document_id: int = None, rate_limiter: Optional[TokenRateLimiter] = None, use_cache: bool = True, mode: str = "auto", project_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Extracts `fields` from a document, only calling the LLM for fields without a cached result.
+
+    Results are cached per field, keyed on the document text, the field definition, the model and
+    PROMPT_VERSION, so re-running an unchanged template is free and editing one field re-runs only that field.
+    Pass use_cache=False to force a fresh extraction (the new results still refresh the cache).
+
+    Modes:
+        auto: retrieved chunks as context; documents without chunks that are too long for one prompt use map_reduce.
+        map_reduce: always extract from the whole document via extract_long_document.
+    """
+    if mode not in ("auto", "map_reduce"):
+        raise ValueError(f"Unknown extraction mode: {mode}")
+
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cached, missing = lookup_cached_fields(text_hash, fields, mode) if use_cache else ({}, list(fields))
+    if not missing:
+        return [cached[f["name"]] for f in fields]
+
+    if mode == "map_reduce":
+        fresh = extract_long_document(text, missing, rate_limiter)
+    else:
+        fresh = _extract_fields(text, missing, document_id, rate_limiter, project_id)
+    store_cached_fields(text_hash, missing, fresh, mode)
+
+    # Keep template order; anything the LLM returned under an unexpected name goes last
+    fresh_by_name = {res.get("field_name"): res for res in fresh}
+    results = [cached.get(f["name"]) or fresh_by_name.pop(f["name"], None) for f in fields]
+    return [res for res in results if res is not None] + list(fresh_by_name.values())
+
+def merge_field_chunks(per_field: List[List[str]], limit: int = MAX_CONTEXT_CHUNKS) -> List[str]:
+    """
+    Unions per-field results into one context, deduplicating chunks shared between fields.
+    Takes every field's best chunk before any field's second best so each field is represented under `limit`.
+    """
+    merged, seen = [], set()
+    for rank in range(max((len(chunks) for chunks in per_field), default=0)):
+        for chunks in per_field:
+            if rank < len(chunks) and chunks[rank] not in seen:
+                seen.add(chunks[rank])
+                merged.append(chunks[rank])
+                if len(merged) == limit:
+                    return merged
+    return merged
+
+def _retrieved_context(fields: List[Dict[str, str]], document_id: Optional[int], project_id: Optional[int] = None) -> Optional[str]:
+    """The document's chunks retrieved for `fields`, joined into one prompt context, or None without any."""
+    if not document_id:
+        return None
+    # One query per field, issued as a single batched search
+    queries = [f"{f['name']}: {f['description']}" for f in fields]
+    try:
+        chunks = merge_field_chunks(query_document_fields(document_id, queries, n_results=CHUNKS_PER_FIELD, project_id=project_id))
+        if chunks:
+            print(f"Using {len(chunks)} chunks from vector store for context.")
+            return "\n---\n".join(chunks)
+    except Exception as e:
+        print(f"Vector retrieval failed: {e}")
+    return None
+
+def _extract_fields(text: str, fields: List[Dict[str, str]], document_id: Optional[int], rate_limiter: Optional[TokenRateLimiter], project_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    context_text = _retrieved_context(fields, document_id, project_id)
+    if context_text is None:
+        if len(text) > CONTEXT_CHAR_LIMIT:
+            # Without retrieval, truncating would silently drop late clauses; cover the whole document instead
+            return extract_long_document(text, fields, rate_limiter)
+        context_text = text
+
+    return _complete_extraction(generate_extraction_prompt(context_text, fields), rate_limiter)
 
-def extract_data_from_text(text: str, fields: List[Dict[str, str]] = DEFAULT_FIELDS, document_id: int = None) -> List[Dict[str, Any]]:
+def _groq_client_for_prompt(prompt: str, rate_limiter: Optional[TokenRateLimiter]):
     client = get_groq_client()
     if not client:
         raise ValueError("GROQ_API_KEY not set in environment variables")
 
-    # context_text = text[:20000] # Default fallback
-
-    if document_id:
-        # Construct a query from fields
-        query_parts = [f"{f['name']}: {f['description']}" for f in fields]
-        query_text = "Find details about: " + ", ".join(query_parts)
-        
-        # Retrieve relevant chunks
-        try:
-            chunks = query_document(document_id, query_text, n_results=10) # Get top 10 chunks
-            if chunks:
-                print(f"Using {len(chunks)} chunks from vector store for context.")
-                context_text = "\n---\n".join(chunks)
-            else:
-                 context_text = text[:20000]
-        except Exception as e:
-             print(f"Vector retrieval failed: {e}")
-             context_text = text[:20000]
-    else:
-        context_text = text[:20000]
+    rate_limiter = rate_limiter or get_default_rate_limiter()
+    if rate_limiter:
+        rate_limiter.acquire(estimate_tokens(prompt) + COMPLETION_TOKEN_ESTIMATE)
+    return client
+
+def _count_tokens(prompt: str, completion: str, usage):
+    """Records a completion's token counts (the provider's, else estimated)."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt)
+    completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(completion or "")
+    metrics.increment("llm_tokens_total", prompt_tokens, kind="prompt")
+    metrics.increment("llm_tokens_total", completion_tokens, kind="completion")
+
+def _request_outcome(error: Exception) -> str:
+    return "circuit_open" if isinstance(error, CircuitOpenError) else "error"
 
-    prompt = generate_extraction_prompt(context_text, fields)
+def _complete_extraction(prompt: str, rate_limiter: Optional[TokenRateLimiter]) -> List[Dict[str, Any]]:
+    """Sends one extraction prompt and returns its parsed "results" list."""
+    key = hashlib.sha256(f"{GROQ_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+    # Every caller parses the shared completion text itself, so none sees another's mutations
+    content = _completion_flights.do(key, lambda: _request_completion(prompt, rate_limiter))
+    return json.loads(content).get("results", [])
+
+def _request_completion(prompt: str, rate_limiter: Optional[TokenRateLimiter]) -> str:
+    client = _groq_client_for_prompt(prompt, rate_limiter)
 
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile", # Strong model for extraction
+        with metrics.timed("llm_completion"):
+            completion = _create_completion(
+                client,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+
+        content = completion.choices[0].message.content
+        _count_tokens(prompt, content, getattr(completion, "usage", None))
+        json.loads(content) # A malformed completion fails every caller sharing it
+        metrics.increment("llm_requests_total", outcome="ok")
+        return content
+    except Exception as e:
+        metrics.increment("llm_requests_total", outcome=_request_outcome(e))
+        print(f"Extraction error: {e}")
+        raise e
+
+def _stream_completion(prompt: str, rate_limiter: Optional[TokenRateLimiter]) -> Iterator[Dict[str, Any]]:
+    """Sends one extraction prompt with streaming on, yielding each result object as soon as it is complete."""
+    client = _groq_client_for_prompt(prompt, rate_limiter)
+    parser = ResultsStreamParser()
+    started = time.perf_counter()
+    usage = None
+    try:
+        # No response_format: Groq's JSON mode does not stream. The prompt already asks for strict JSON,
+        # and the parser skips anything before the results array.
+        # Only opening the stream is retried: results already yielded cannot be taken back
+        stream = _create_completion(
+            client,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0,
-            response_format={"type": "json_object"}
+            stream=True
         )
-
-        content = completion.choices[0].message.content
-        data = json.loads(content)
-        return data.get("results", [])
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield from parser.feed(chunk.choices[0].delta.content)
+            # Groq reports usage on the final chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+        metrics.observe_stage("llm_completion", time.perf_counter() - started)
+        _count_tokens(prompt, parser.text, usage)
+        yield from parser.remaining()
+        metrics.increment("llm_requests_total", outcome="ok")
     except Exception as e:
+        metrics.increment("llm_requests_total", outcome=_request_outcome(e))
         print(f"Extraction error: {e}")
-        # Return empty list or re-raise depending on desired behavior
         raise e
+
+def stream_extraction(text: str, fields: List[Dict[str, str]] = DEFAULT_FIELDS, document_id: int = None, rate_limiter: Optional[TokenRateLimiter] = None, use_cache: bool = True, project_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    extract_data_from_text (auto mode) that yields each field's result as soon as it is available: cached
+    fields first, then fields in the order the LLM completes them. Documents that need map-reduce
+    extraction yield their results together at the end.
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cached, missing = lookup_cached_fields(text_hash, fields) if use_cache else ({}, list(fields))
+    for field in fields:
+        if field["name"] in cached:
+            yield cached[field["name"]]
+    if not missing:
+        return
+
+    context_text = _retrieved_context(missing, document_id, project_id)
+    if context_text is None and len(text) > CONTEXT_CHAR_LIMIT:
+        fresh = extract_long_document(text, missing, rate_limiter)
+        store_cached_fields(text_hash, missing, fresh)
+        yield from fresh
+        return
+
+    fresh = []
+    for res in _stream_completion(generate_extraction_prompt(context_text or text, missing), rate_limiter):
+        fresh.append(res)
+        yield res
+    store_cached_fields(text_hash, missing, fresh)
+
+def pack_windows(text: str, window_tokens: int = WINDOW_TOKEN_BUDGET) -> List[Tuple[int, int]]:
+    """
+    Packs the document into consecutive (start, end) character windows of at most `window_tokens` tokens.
+    Windows end on paragraph breaks where possible so clauses are not split between two prompts.
+    """
+    max_chars = max(1, window_tokens * 4)
+    windows = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Prefer a paragraph break, then a line break, in the back half of the window
+            for sep in ("\n\n", "\n"):
+                cut = text.rfind(sep, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        windows.append((start, end))
+        start = end
+    return windows
+
+def reduce_field_candidates(fields: List[Dict[str, str]], candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keeps, per field, the found value with the highest confidence (or a null result if no window found it)."""
+    results = []
+    for field in fields:
+        options = [c for c in candidates if c.get("field_name") == field["name"]]
+        found = [c for c in options if c.get("value") is not None]
+        if found:
+            results.append(max(found, key=lambda c: c.get("confidence") or 0))
+        elif options:
+            results.append(options[0])
+        else:
+            results.append({"field_name": field["name"], "value": None, "confidence": 0.0, "citation": None, "normalization": None})
+    return results
+
+def extract_long_document(text: str, fields: List[Dict[str, str]], rate_limiter: Optional[TokenRateLimiter] = None, window_tokens: int = WINDOW_TOKEN_BUDGET, max_workers: int = WINDOW_MAX_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Map-reduce extraction over the whole document: every token-budgeted window is extracted concurrently,
+    then each field keeps its most confident candidate. Citations are suffixed with the character
+    offsets of the window they came from.
+    """
+    windows = pack_windows(text, window_tokens)
+    print(f"Extracting {len(fields)} fields from {len(windows)} windows.")
+
+    def extract_window(window: Tuple[int, int]) -> List[Dict[str, Any]]:
+        start, end = window
+        results = _complete_extraction(generate_extraction_prompt(text[start:end], fields, max_chars=None), rate_limiter)
+        for res in results:
+            if res.get("value") is not None:
+                res["citation"] = f"{res.get('citation') or ''} [chars {start}-{end}]".strip()
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        candidates = [res for results in pool.map(extract_window, windows) for res in results]
+    return reduce_field_candidates(fields, candidates)
@@ -0,0 +1,122 @@
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+from pydantic import BaseModel, Field
+
+# Background jobs (batch extraction, ingestion pipelines) run on a small shared pool.
+# Each job may fan out further on its own bounded pool.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs (and their per-item results) are kept for polling, then dropped after JOB_TTL_SECONDS
+# or once more than MAX_FINISHED_JOBS have piled up, oldest first
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "500"))
+
+class JobItem(BaseModel):
+    status: str = "queued" # queued, running, completed, failed
+    detail: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str = "queued" # queued, running, completed, failed
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    items: Dict[str, JobItem] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+_jobs: Dict[str, Job] = {}
+_lock = threading.Lock()
+_executor = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    return _executor
+
+def _evict_finished(now: datetime):
+    # Caller holds _lock
+    finished = sorted((job.finished_at, job_id) for job_id, job in _jobs.items() if job.finished_at)
+    excess = len(finished) - MAX_FINISHED_JOBS
+    for i, (finished_at, job_id) in enumerate(finished):
+        if i < excess or (now - finished_at).total_seconds() > JOB_TTL_SECONDS:
+            del _jobs[job_id]
+
+def create_job(kind: str, item_keys: Iterable[Any] = ()) -> Job:
+    job = Job(id=uuid.uuid4().hex, kind=kind)
+    for key in item_keys:
+        job.items[str(key)] = JobItem()
+    job.total = len(job.items)
+    with _lock:
+        _evict_finished(job.created_at)
+        _jobs[job.id] = job
+    return job.model_copy(deep=True)
+
+def get_job(job_id: str) -> Optional[Job]:
+    """Returns a snapshot of the job so callers can serialize it without holding the lock."""
+    with _lock:
+        job = _jobs.get(job_id)
+        return job.model_copy(deep=True) if job else None
+
+def start_job(job_id: str):
+    with _lock:
+        _jobs[job_id].status = "running"
+
+def update_item(job_id: str, key: Any, status: str, detail: Optional[str] = None, result: Optional[Dict[str, Any]] = None):
+    with _lock:
+        job = _jobs[job_id]
+        if str(key) not in job.items:
+            job.items[str(key)] = JobItem()
+            job.total = len(job.items)
+        item = job.items[str(key)]
+        item.status = status
+        item.detail = detail
+        item.result = result
+        job.completed = sum(1 for i in job.items.values() if i.status == "completed")
+        job.failed = sum(1 for i in job.items.values() if i.status == "failed")
+
+def finish_job(job_id: str, error: Optional[str] = None):
+    with _lock:
+        job = _jobs[job_id]
+        if error:
+            job.status = "failed"
+            job.error = error
+        else:
+            job.status = "failed" if job.failed and not job.completed else "completed"
+        job.finished_at = datetime.utcnow()
+
+def submit(job_id: str, fn, *args, **kwargs):
+    """Runs `fn` on the job pool, marking the job running/finished around it."""
+    def run():
+        start_job(job_id)
+        try:
+            fn(job_id, *args, **kwargs)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            finish_job(job_id, error=str(e))
+            return
+        finish_job(job_id)
+    return get_executor().submit(run)
+
+def run_items(job_id: str, keys: Iterable[Any], fn: Callable[[Any], Optional[Dict[str, Any]]], max_workers: int):
+    """Fans `fn(key)` out over a bounded pool, recording each key's outcome as a job item."""
+    def work(key):
+        update_item(job_id, key, "running")
+        return fn(key)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"job-{job_id[:8]}") as pool:
+        futures = {pool.submit(work, key): key for key in keys}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                update_item(job_id, key, "completed", result=future.result())
+            except Exception as e:
+                print(f"Job {job_id} item {key} failed: {e}")
+                update_item(job_id, key, "failed", detail=str(e))
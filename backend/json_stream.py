@@ -0,0 +1,71 @@
+import json
+import re
+from typing import Any, Dict, List
+
+# Incremental parsing of a streamed extraction completion, {"results": [{...}, {...}, ...]}: each
+# object in the results array is returned as soon as its closing brace arrives, instead of after the
+# whole completion. Anything before the array (prose, a ``` fence) is skipped.
+RESULTS_ARRAY = re.compile(r'"results"\s*:\s*\[')
+
+class ResultsStreamParser:
+    def __init__(self):
+        self.text = "" # Everything fed so far, for a whole-document fallback parse
+        self.emitted = 0
+        self.done = False # Seen the array's closing bracket
+        self._array_start = None # Offset in `text` just past the "results" array's "["
+        self._position = 0 # Next offset to scan
+        self._object_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Adds streamed text; returns the result objects it completed."""
+        self.text += chunk
+        if self._array_start is None:
+            # Rescan a little of the previous text in case the key was split across chunks
+            match = RESULTS_ARRAY.search(self.text, max(0, len(self.text) - len(chunk) - 16))
+            if match is None:
+                return []
+            self._array_start = self._position = match.end()
+
+        completed = []
+        text = self.text
+        position = self._position
+        while position < len(text) and not self.done:
+            char = text[position]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._object_start = position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    self.done = True # End of the results array
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        item = json.loads(text[self._object_start:position + 1])
+                        if isinstance(item, dict):
+                            completed.append(item)
+            position += 1
+        self._position = position
+        self.emitted += len(completed)
+        return completed
+
+    def remaining(self) -> List[Dict[str, Any]]:
+        """
+        Results still owed once the stream has ended: none if the array was parsed incrementally, else
+        whatever a whole-document parse finds (raises ValueError if the completion is not valid JSON).
+        """
+        if self._array_start is not None:
+            return []
+        return json.loads(self.text).get("results", [])
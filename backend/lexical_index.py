@@ -0,0 +1,163 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from storage import atomic_write
+
+# Keyword retrieval to sit beside the vector store. Every document gets a BM25 inverted index over the
+# same chunks (and chunk IDs) that are embedded, written at ingest time as one zlib-compressed JSON file
+# per document. Loaded indexes are kept in an LRU of LEXICAL_CACHE_SIZE documents, so a lexical search is
+# a few array additions and needs no embedding model.
+LEXICAL_CACHE_SIZE = int(os.getenv("LEXICAL_CACHE_SIZE", "256"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal-rank fusion constant: a result at rank r contributes 1 / (RRF_K + r)
+RRF_K = 60
+INDEX_VERSION = 1
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or such that the this to under was were which will with".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.casefold()) if token not in STOPWORDS]
+
+class DocumentIndex:
+    """BM25 over one document's chunks."""
+
+    def __init__(self, ids: List[str], texts: List[str], lengths: List[int], postings: Dict[str, list]):
+        self.ids = ids
+        self.texts = texts
+        self.lengths = lengths
+        self.postings = postings # term -> [[chunk positions], [term frequencies]]
+        # Each posting's BM25 weight is fixed once the index is built, so a query only sums them
+        lengths_arr = np.array(lengths, dtype=np.float32)
+        average = max(float(lengths_arr.mean()), 1.0) if lengths else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths_arr / average)
+        self._weights = {}
+        for term, (positions, frequencies) in postings.items():
+            positions = np.array(positions, dtype=np.int32)
+            tf = np.array(frequencies, dtype=np.float32)
+            idf = math.log(1 + (len(ids) - len(positions) + 0.5) / (len(positions) + 0.5))
+            self._weights[term] = (positions, idf * tf * (BM25_K1 + 1) / (tf + norm[positions]))
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str]) -> "DocumentIndex":
+        postings: Dict[str, list] = {}
+        lengths = []
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                entry = postings.setdefault(term, [[], []])
+                entry[0].append(position)
+                entry[1].append(count)
+        return cls(ids, texts, lengths, postings)
+
+    def search(self, query: str, n_results: int) -> List[int]:
+        """Positions of the best `n_results` chunks containing a query term, best first."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self._weights:
+                positions, weights = self._weights[term]
+                scores[positions] += weights
+        matched = np.flatnonzero(scores > 0)
+        # Stable sort: equal scores keep document order
+        return matched[np.argsort(-scores[matched], kind="stable")][:n_results].tolist()
+
+    def to_bytes(self) -> bytes:
+        data = {"version": INDEX_VERSION, "ids": self.ids, "texts": self.texts, "lengths": self.lengths, "postings": self.postings}
+        return zlib.compress(json.dumps(data).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> Optional["DocumentIndex"]:
+        data = json.loads(zlib.decompress(blob))
+        if data.get("version") != INDEX_VERSION:
+            return None # Written by another version; rebuilt by the caller
+        return cls(data["ids"], data["texts"], data["lengths"], data["postings"])
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[str]:
+    """Merges ranked ID lists: each ID scores the sum of 1 / (k + rank) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    # Stable: ties keep first-seen order, which favours the earlier list
+    return sorted(scores, key=lambda item: -scores[item])
+
+class LexicalStore:
+    """Document indexes under `root`, one directory per project."""
+
+    def __init__(self, root: str, cache_size: int = LEXICAL_CACHE_SIZE):
+        self.root = root
+        self.cache_size = cache_size
+        self._loaded = OrderedDict() # path -> DocumentIndex
+        self._lock = threading.Lock()
+
+    def _project_dir(self, project_id: Optional[int]) -> str:
+        return os.path.join(self.root, "legacy" if project_id is None else f"project_{project_id}")
+
+    def _path(self, document_id: int, project_id: Optional[int]) -> str:
+        return os.path.join(self._project_dir(project_id), f"{document_id}.json.z")
+
+    def _remember(self, path: str, index: DocumentIndex):
+        with self._lock:
+            self._loaded[path] = index
+            self._loaded.move_to_end(path)
+            while len(self._loaded) > self.cache_size:
+                self._loaded.popitem(last=False)
+
+    def put(self, document_id: int, ids: List[str], texts: List[str], project_id: Optional[int] = None) -> DocumentIndex:
+        index = DocumentIndex.build(ids, texts)
+        path = self._path(document_id, project_id)
+        atomic_write(path, index.to_bytes())
+        self._remember(path, index)
+        return index
+
+    def get(self, document_id: int, project_id: Optional[int] = None) -> Optional[DocumentIndex]:
+        """The document's index, or None if it has none (e.g. ingested before lexical indexing)."""
+        path = self._path(document_id, project_id)
+        with self._lock:
+            index = self._loaded.get(path)
+            if index is not None:
+                self._loaded.move_to_end(path)
+                return index
+        try:
+            with open(path, "rb") as f:
+                index = DocumentIndex.from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        if index is not None:
+            self._remember(path, index)
+        return index
+
+    def delete(self, document_id: int, project_id: Optional[int] = None):
+        path = self._path(document_id, project_id)
+        with self._lock:
+            self._loaded.pop(path, None)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def delete_project(self, project_id: int):
+        directory = self._project_dir(project_id)
+        with self._lock:
+            for path in [p for p in self._loaded if os.path.dirname(p) == directory]:
+                del self._loaded[path]
+        shutil.rmtree(directory, ignore_errors=True)
+
+_stores: Dict[str, LexicalStore] = {}
+_stores_lock = threading.Lock()
+
+def get_lexical_store(root: str) -> LexicalStore:
+    """The process-wide store for `root` (one per vector store directory)."""
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = LexicalStore(root)
+        return _stores[root]
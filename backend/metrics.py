@@ -0,0 +1,132 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# In-process counters and latency histograms, served at GET /metrics in the Prometheus text format.
+#
+# Pipeline stages are timed into one histogram family, ltr_stage_duration_seconds{stage=...}:
+#   parse, chunk, embed, chroma_upsert, chroma_query, lexical_query, llm_completion, db_commit
+# A request sent with "X-Profile: 1" also collects its own stage timings, returned in a Server-Timing header.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = "ltr_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1) # Last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+_histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+_counters: Dict[str, Dict[Labels, float]] = {}
+_help: Dict[str, str] = {
+    "stage_duration_seconds": "Time spent in each pipeline stage.",
+    "http_request_duration_seconds": "Time to produce each HTTP response (streamed bodies excluded).",
+    "llm_requests_total": "LLM completion requests by outcome.",
+    "llm_tokens_total": "LLM tokens by kind (prompt, completion).",
+    "chunks_stored_total": "Chunks written to the vector store.",
+    "retries_total": "Retried provider calls.",
+    "coalesced_calls_total": "Calls that joined an identical call already in flight instead of running their own.",
+    "circuit_opened_total": "Times a circuit breaker opened.",
+    "circuit_rejections_total": "Calls rejected while a circuit breaker was open.",
+}
+_lock = threading.Lock()
+
+# Stage timings of the current request when it asked to be profiled: stage -> [seconds, calls]
+_profile: ContextVar[Optional[Dict[str, list]]] = ContextVar("profile", default=None)
+_profile_lock = threading.Lock()
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def observe(name: str, seconds: float, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _labels(labels)
+        if key not in series:
+            series[key] = _Histogram()
+        series[key].observe(seconds)
+
+def increment(name: str, amount: float = 1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + amount
+
+def observe_stage(stage: str, seconds: float):
+    observe("stage_duration_seconds", seconds, stage=stage)
+    profile = _profile.get()
+    if profile is not None:
+        with _profile_lock:
+            entry = profile.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+@contextmanager
+def timed(stage: str):
+    """Times the block into ltr_stage_duration_seconds{stage=...} (and the request profile, if any)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+def start_profile() -> Dict[str, list]:
+    """Starts collecting stage timings for the current request (and the threads it hands work to)."""
+    profile = {}
+    _profile.set(profile)
+    return profile
+
+def server_timing(profile: Dict[str, list], total: float) -> str:
+    """A Server-Timing header value: one entry per stage, slowest first, then the whole request."""
+    with _profile_lock:
+        stages = sorted(profile.items(), key=lambda item: -item[1][0])
+    entries = [f'{stage};dur={seconds * 1000:.2f};desc="{calls} calls"' for stage, (seconds, calls) in stages]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {_help.get(name, name)}")
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{full}{_format_labels(labels)} {value:g}")
+        for name, series in sorted(_histograms.items()):
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {_help.get(name, name)}")
+            lines.append(f"# TYPE {full} histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{full}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """Clears every metric (tests)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,30 @@
+"""
+Moves chunks from the single legacy "documents" Chroma collection into per-project (or shard)
+collections, reusing stored embeddings. Document -> project ownership comes from the SQL database.
+
+Usage (from backend/):
+    python migrate_vector_store.py [--db-path ../data/chroma_db] [--batch-size 500] [--drop-legacy]
+"""
+import argparse
+from sqlmodel import Session, select
+from database import engine
+from models import Document
+from vector_store import migrate_legacy_collection, DEFAULT_CHROMA_DB_DIR
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DEFAULT_CHROMA_DB_DIR, help="ChromaDB directory")
+    parser.add_argument("--batch-size", type=int, default=500, help="Chunks read and written per batch")
+    parser.add_argument("--drop-legacy", action="store_true", help="Delete the legacy collection once every chunk is migrated")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        document_projects = {doc_id: project_id for doc_id, project_id in session.exec(select(Document.id, Document.project_id)).all()}
+
+    result = migrate_legacy_collection(document_projects, batch_size=args.batch_size, db_path=args.db_path, drop_legacy=args.drop_legacy)
+    print(f"Migrated {result['migrated']} chunks; skipped {result['skipped']} chunks of unknown documents.")
+    if args.drop_legacy and result["skipped"]:
+        print("Legacy collection kept because some chunks could not be mapped to a project.")
+
+if __name__ == "__main__":
+    main()
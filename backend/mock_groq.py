@@ -0,0 +1,234 @@
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions API, for benchmarks and offline runs.
+
+Answers extraction prompts (see extraction.generate_extraction_prompt) with a "results" object holding
+every requested field, after a configurable latency (spread over the chunks when streaming). Optional requests- and tokens-per-minute limits
+reject excess calls with 429 and a Retry-After header, as Groq does.
+
+Usage (from backend/):
+    python mock_groq.py [--port 8900] [--latency 0.5] [--jitter 0.1] [--requests-per-minute 30]
+    GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=mock uvicorn app:app
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+FIELDS = re.compile(r"Fields to extract:\s*(\[.*?\])\s*\n\s*For each field", re.DOTALL)
+WORD = re.compile(r"\w{4,}")
+# Characters of the completion sent per streamed chunk
+STREAM_PIECE_CHARS = 32
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1 # Same rule as extraction.estimate_tokens
+
+def answer_prompt(prompt: str) -> List[Dict]:
+    """
+    One result per requested field: the first line of the document text mentioning a word of the field
+    name, or null when none does. Deterministic, so repeated runs do identical work.
+    """
+    match = FIELDS.search(prompt)
+    fields = json.loads(match.group(1)) if match else []
+    document = prompt.split("Document Text:", 1)[-1]
+    lines = [line.strip() for line in document.splitlines() if line.strip()]
+    lowered = [line.casefold() for line in lines]
+    results = []
+    for field in fields:
+        words = [w.casefold() for w in WORD.findall(field.get("name", ""))]
+        found = next((lines[i] for i, line in enumerate(lowered) if any(w in line for w in words)), None)
+        value = found[:200] if found else None
+        results.append({
+            "field_name": field.get("name"),
+            "value": value,
+            "confidence": 0.8 if value else 0.0,
+            "citation": value,
+            "normalization": value.upper() if value else None,
+        })
+    return results
+
+class _Limit:
+    """Rolling 60s budget of `per_minute` units (requests or tokens); None is unlimited."""
+
+    def __init__(self, per_minute: Optional[int]):
+        self.per_minute = per_minute
+        self._events = deque() # (timestamp, cost)
+        self._used = 0
+
+    def wait(self, cost: int, now: float) -> float:
+        """Seconds until `cost` fits in the budget (0 when it fits now)."""
+        if not self.per_minute:
+            return 0.0
+        while self._events and now - self._events[0][0] >= 60.0:
+            self._used -= self._events.popleft()[1]
+        # A single call larger than the whole budget is let through on an empty window
+        if self._used + cost <= self.per_minute or not self._events:
+            return 0.0
+        return 60.0 - (now - self._events[0][0])
+
+    def spend(self, cost: int, now: float):
+        if self.per_minute:
+            self._events.append((now, cost))
+            self._used += cost
+
+class MockGroqServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 latency_per_1k_tokens: float = 0.0, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, seed: int = 0):
+        """
+        Args:
+            port: 0 picks a free port (see `url`).
+            latency: Seconds added to every completion, plus up to `jitter` seconds of uniform noise
+                and `latency_per_1k_tokens` per thousand prompt tokens.
+            requests_per_minute / tokens_per_minute: Rate limits; None disables them.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.stats = {"requests": 0, "completions": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._requests = _Limit(requests_per_minute)
+        self._tokens = _Limit(tokens_per_minute)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockGroqServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _complete(self, body: dict):
+        """
+        (status, headers, payload) for one chat completion request. With "stream": true the payload is
+        an iterator of server-sent event lines, spread evenly over the completion's latency.
+        """
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt)
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            retry_after = max(self._requests.wait(1, now), self._tokens.wait(prompt_tokens, now))
+            if retry_after:
+                self.stats["rate_limited"] += 1
+                error = {"error": {"message": f"Rate limit reached. Please try again in {retry_after:.2f}s.", "type": "tokens", "code": "rate_limit_exceeded"}}
+                return 429, {"Retry-After": str(max(1, math.ceil(retry_after)))}, error
+            self._requests.spend(1, now)
+            self._tokens.spend(prompt_tokens, now)
+            delay = self.latency + self._random.uniform(0, self.jitter) + self.latency_per_1k_tokens * prompt_tokens / 1000
+
+        content = json.dumps({"results": answer_prompt(prompt)})
+        completion_tokens = estimate_tokens(content)
+        with self._lock:
+            self.stats["completions"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+        completion = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+        }
+        if body.get("stream"):
+            return 200, {}, self._stream(completion, content, delay)
+
+        time.sleep(delay)
+        return 200, {}, {
+            **completion,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _stream(self, completion: dict, content: str, delay: float) -> Iterator[str]:
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        for i, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            chunk = {**completion, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        chunk = {**completion, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like the real API
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.rstrip("/") != COMPLETIONS_PATH:
+                    status, headers, payload = 404, {}, {"error": {"message": f"Unknown path {self.path}"}}
+                else:
+                    status, headers, payload = server._complete(body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if isinstance(payload, dict):
+                    data = json.dumps(payload).encode("utf-8")
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in payload:
+                    data = event.encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass # One line per request would swamp benchmark output
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Up to this many extra seconds per completion")
+    parser.add_argument("--latency-per-1k-tokens", type=float, default=0.0, help="Extra seconds per thousand prompt tokens")
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--tokens-per-minute", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockGroqServer(args.host, args.port, args.latency, args.jitter, args.latency_per_1k_tokens,
+                            args.requests_per_minute, args.tokens_per_minute)
+    print(f"Mock Groq API on {server.url} (set GROQ_BASE_URL={server.url})")
+    with server:
+        try:
+            server._thread.join()
+        except KeyboardInterrupt:
+            pass
+    print(json.dumps(server.stats))
+
+if __name__ == "__main__":
+    main()
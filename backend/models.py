@@ -1,22 +1,30 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
-from sqlmodel import Field, SQLModel, Relationship, JSON
+from sqlmodel import Field, SQLModel, Relationship, JSON, Column
 
 class Project(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
+    schema_version: int = Field(default=0) # Bumped whenever the field template changes
+    table_version: int = Field(default=0) # Bumped whenever any of the project's extracted records change
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     documents: List["Document"] = Relationship(back_populates="project")
 
 class Document(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     filename: str
-    content: str  # Storing full text content for now
+    content: str = "" # Legacy inline text; parsed text now lives in the content store (content_store.py)
+    content_hash: Optional[str] = None # Content store key of the parsed text
+    content_length: Optional[int] = None # Characters of parsed text
+    page_count: Optional[int] = None
+    records_version: int = Field(default=0) # Project.table_version at which this document's records last changed
     file_path: str # Path relative to repo root
-    status: str = Field(default="uploaded") # uploaded, extracted, error
+    file_hash: Optional[str] = None # SHA-256 of the source file; keys the parse/embedding cache
+    status: str = Field(default="uploaded", index=True) # uploaded, queued, parsing, embedding, ingested, extracted, error
+    error: Optional[str] = None # Last pipeline failure, if any
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     project: Optional[Project] = Relationship(back_populates="documents")
@@ -25,10 +33,11 @@ class Document(SQLModel, table=True):
 class ExtractionSchema(SQLModel, table=True):
     """Defines the fields we want to extract for a project"""
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     field_name: str
     field_description: str
     data_type: str = Field(default="string") # string, number, date
+    version: int = Field(default=1) # Project.schema_version at which this field was last added or edited
 
     # We might want to link this to Project more directly later,
     # but for now let's assume one schema per project or just global.
@@ -37,12 +46,27 @@ class ExtractionSchema(SQLModel, table=True):
 
 class ExtractedRecord(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    document_id: int = Field(foreign_key="document.id")
+    document_id: int = Field(foreign_key="document.id", index=True)
     field_name: str
     value: Optional[str] = None
     confidence: Optional[float] = None
     citation: Optional[str] = None
     normalization: Optional[str] = None
-    status: str = Field(default="pending") # pending, approved, rejected, manual_updated
+    status: str = Field(default="pending", index=True) # pending, approved, rejected, manual_updated
 
     document: Optional[Document] = Relationship(back_populates="extracted_records")
+
+class EvaluationReport(SQLModel, table=True):
+    """Scores of a project's extractions against reference labels, kept to compare prompt and model versions"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    tag: Optional[str] = None # Free-form label for the run, e.g. "baseline" or "prompt-v4"
+    model: str # GROQ_MODEL at evaluation time
+    prompt_version: str
+    schema_version: int
+    labels: int # Labelled (non-empty) values scored
+    accuracy: Optional[float] = None
+    coverage: Optional[float] = None
+    normalization_validity: Optional[float] = None
+    metrics: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON)) # Per-field metrics and sample errors
+    created_at: datetime = Field(default_factory=datetime.utcnow)
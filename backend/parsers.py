@@ -1,20 +1,237 @@
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Iterator, List, Optional, Tuple
+from pydantic import BaseModel
 from pypdf import PdfReader
 from bs4 import BeautifulSoup
+import metrics
 
-def parse_pdf(file_path: str) -> str:
-    """Extracts text from a PDF file."""
+# HTML parser: "fast" streams the file through the standard library's tokenizer without building a tree,
+# collapsing layout whitespace and keeping each table row on one line; "soup" is BeautifulSoup's get_text().
+HTML_PARSER = os.getenv("HTML_PARSER", "fast")
+# Characters read from an HTML file per parser feed
+HTML_READ_CHARS = 64 * 1024
+
+# Bump whenever parser output changes so cached parses (see cache.py) are not reused
+PARSER_VERSION = "3" if HTML_PARSER == "fast" else "3-soup"
+# Separates PDF pages in parsed text so chunks can be mapped back to page numbers
+PAGE_BREAK = "\f"
+
+# Parallel PDF parsing: page ranges are spread over a process pool once a file is long enough
+# for the pool round-trip to pay off.
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+# Pages handed to a worker per task; small enough to stream, large enough to amortize re-opening the file
+PDF_PAGES_PER_TASK = 8
+
+_pdf_pool = None
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        # spawn, not fork: the API process runs worker threads that must not be forked mid-lock
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
+def _extract_page_range(file_path: str, page_range: Tuple[int, int]) -> List[str]:
+    """Worker entry point: extracts the text of pages [start, end)."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(*page_range)]
+
+def iter_pdf_pages(file_path: str, parallel: Optional[bool] = None) -> Iterator[str]:
+    """
+    Yields the text of each PDF page in order, as soon as it is extracted.
+
+    Args:
+        file_path: Path to the PDF.
+        parallel: Force (True) or disable (False) process-pool parsing. By default long
+            documents (PDF_PARALLEL_MIN_PAGES+) are parsed in parallel when more than one worker is configured.
+    """
     try:
         reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        page_count = len(reader.pages)
+        if parallel is None:
+            parallel = PDF_PARSE_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+
+        if not parallel:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+
+        ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+        # map() yields results in submission order, so pages stream out in document order
+        for texts in _get_pdf_pool().map(_extract_page_range, [file_path] * len(ranges), ranges):
+            yield from texts
     except Exception as e:
         raise ValueError(f"Error parsing PDF: {e}")
 
-def parse_html(file_path: str) -> str:
-    """Extracts text from an HTML file."""
+def parse_pdf(file_path: str, parallel: Optional[bool] = None) -> str:
+    """Extracts text from a PDF file. Pages are separated by PAGE_BREAK."""
+    return "".join(page + "\n" + PAGE_BREAK for page in iter_pdf_pages(file_path, parallel=parallel))
+
+# Elements that start a new block of text. The lower-case SGML tags wrap each exhibit in EDGAR filings.
+HTML_BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "body", "caption", "center", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "html",
+    "li", "main", "nav", "ol", "p", "pre", "section", "title", "ul",
+    "document", "type", "sequence", "filename", "description", "text",
+    "tr", "td", "th", # Only inside nested tables, where they separate words in the enclosing cell
+})
+HTML_SKIP_TAGS = frozenset({"script", "style", "noscript", "template"})
+HEADING_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6", "title"})
+# Stands in for <br> until whitespace is collapsed
+_LINE_BREAK = "\x00"
+
+class HtmlBlock(BaseModel):
+    kind: str # "text", "heading", "item" (list item) or "row" (table row, cells separated by tabs)
+    text: str
+    start: int # Offset of the first character in the parsed text
+    end: int # Offset one past the last character
+
+def _collapse(pieces: List[str]) -> str:
+    """Joins text pieces, collapsing whitespace runs to one space; <br> becomes a line break."""
+    lines = (" ".join(line.split()) for line in "".join(pieces).split(_LINE_BREAK))
+    return "\n".join(line for line in lines if line)
+
+class _BlockCollector(HTMLParser):
+    """
+    Collects (kind, text, table number) blocks while HTML is fed in. Rows of top-level tables
+    become one block each; anything inside a cell, nested tables included, is flattened into the cell's text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Tuple[str, str, int]] = []
+        self._pieces: List[str] = [] # Text of the open block, or of the open cell inside a row
+        self._kind = "text"
+        self._skip = 0 # Depth inside script/style
+        self._tables = 0 # Table nesting depth
+        self._table_count = 0
+        self._cells: Optional[List[str]] = None # Cells of the open row, None outside rows
+
+    def _flush(self, kind: str = "text"):
+        text = _collapse(self._pieces)
+        if text:
+            self.blocks.append((self._kind, text, 0))
+        self._pieces = []
+        self._kind = kind
+
+    def _end_cell(self):
+        if self._cells is not None:
+            text = _collapse(self._pieces).replace("\n", " ")
+            if text:
+                self._cells.append(text)
+        self._pieces = []
+
+    def _end_row(self):
+        if self._cells is None:
+            return
+        self._end_cell()
+        if self._cells:
+            self.blocks.append(("row", "\t".join(self._cells), self._table_count))
+        self._cells = None
+
+    def _start_row(self):
+        if self._cells is None:
+            self._flush() # Text before the table's first row, e.g. its <caption>
+        self._end_row()
+        self._cells = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIP_TAGS:
+            self._skip += 1
+        elif self._skip:
+            return
+        elif tag == "br":
+            self._pieces.append(_LINE_BREAK)
+        elif tag == "table":
+            self._tables += 1
+            if self._tables == 1:
+                self._table_count += 1
+                self._flush()
+            else:
+                self._pieces.append(" ")
+        elif self._tables == 1 and tag == "tr":
+            self._start_row()
+        elif self._tables == 1 and tag in ("td", "th"):
+            if self._cells is None: # Cell without a <tr>
+                self._start_row()
+            self._end_cell()
+        elif tag in HTML_BLOCK_TAGS and self._tables:
+            self._pieces.append(" ")
+        elif tag in HTML_BLOCK_TAGS:
+            self._flush("heading" if tag in HEADING_TAGS else "item" if tag == "li" else "text")
+
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif self._skip:
+            return
+        elif tag == "table" and self._tables:
+            self._tables -= 1
+            if self._tables == 0:
+                self._end_row()
+                self._flush()
+            else:
+                self._pieces.append(" ")
+        elif self._tables == 1 and tag == "tr":
+            self._end_row()
+        elif self._tables == 1 and tag in ("td", "th"):
+            self._end_cell()
+        elif tag in HTML_BLOCK_TAGS and self._tables:
+            self._pieces.append(" ")
+        elif tag in HTML_BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._pieces.append(data)
+
+    def close(self):
+        super().close()
+        self._end_row()
+        self._flush()
+
+def parse_html_blocks(file_path: str) -> List[HtmlBlock]:
+    """
+    Streams an HTML file into text blocks: paragraphs, headings, list items and table rows, with layout
+    whitespace collapsed. Blocks are separated by a blank line in the parsed text, rows of the same table
+    by a line break, and each block keeps its offsets in that text. The content store records the same
+    blocks (ContentStore.block_span), so a citation can be widened to the block it falls in.
+    """
+    collector = _BlockCollector()
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            for chunk in iter(lambda: f.read(HTML_READ_CHARS), ""):
+                collector.feed(chunk)
+        collector.close()
+    except Exception as e:
+        raise ValueError(f"Error parsing HTML: {e}")
+
+    blocks = []
+    offset = 0
+    previous_table = 0
+    for kind, text, table in collector.blocks:
+        if blocks:
+            offset += 1 if table and table == previous_table else 2
+        blocks.append(HtmlBlock(kind=kind, text=text, start=offset, end=offset + len(text)))
+        offset += len(text)
+        previous_table = table
+    return blocks
+
+def html_blocks_text(blocks: List[HtmlBlock]) -> str:
+    """The parsed text the blocks' offsets index into."""
+    parts = []
+    end = 0
+    for block in blocks:
+        parts.append("\n" * (block.start - end))
+        parts.append(block.text)
+        end = block.end
+    return "".join(parts)
+
+def _parse_html_soup(file_path: str) -> str:
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             soup = BeautifulSoup(f, "html.parser")
@@ -23,17 +240,35 @@ def parse_html(file_path: str) -> str:
     except Exception as e:
         raise ValueError(f"Error parsing HTML: {e}")
 
+def parse_html(file_path: str, parser: Optional[str] = None) -> str:
+    """Extracts text from an HTML file with `parser` ("fast" or "soup"; default HTML_PARSER)."""
+    parser = parser or HTML_PARSER
+    if parser == "soup":
+        return _parse_html_soup(file_path)
+    if parser != "fast":
+        raise ValueError(f"Unknown HTML parser: {parser}")
+    return html_blocks_text(parse_html_blocks(file_path))
+
 def parse_document(file_path: str) -> str:
     """Determines file type and calls appropriate parser."""
+    with metrics.timed("parse"):
+        return "".join(iter_document_pages(file_path))
+
+def iter_document_pages(file_path: str) -> Iterator[str]:
+    """
+    Streams a document's parsed text page by page, each PDF page followed by its PAGE_BREAK, so the pieces
+    join to parse_document's text. Formats without pages yield their whole text once.
+    """
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
 
     if ext == ".pdf":
-        return parse_pdf(file_path)
+        for page in iter_pdf_pages(file_path):
+            yield page + "\n" + PAGE_BREAK
     elif ext in [".html", ".htm"]:
-        return parse_html(file_path)
+        yield parse_html(file_path)
     elif ext == ".txt":
         with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+            yield f.read()
     else:
         raise ValueError(f"Unsupported file type: {ext}")
@@ -0,0 +1,131 @@
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import Engine
+from sqlmodel import Session, delete, insert, select, update
+from models import Project, Document, ExtractedRecord
+
+# Bulk persistence of extraction results. Replacing a document's records costs a fixed number of
+# statements (one DELETE, one multi-row INSERT ... RETURNING, and the status and version UPDATEs) however many fields
+# the template has, and RecordWriter folds concurrent workers' writes into shared transactions.
+#
+# Every write also bumps the owning project's table_version and stamps the documents with it, which
+# lets the comparison table (table.py) re-read only the documents whose records changed.
+
+def record_values(document_id: int, res: dict) -> dict:
+    return {
+        "document_id": document_id,
+        "field_name": res.get("field_name"),
+        "value": res.get("value"),
+        "confidence": res.get("confidence"),
+        "citation": res.get("citation"),
+        "normalization": res.get("normalization"),
+        "status": "pending",
+    }
+
+def table_version_statements(document_ids: List[int]) -> list:
+    """
+    UPDATEs marking the records of `document_ids` as changed, to run in the same transaction as the
+    change itself. Returned as statements so both sync and async sessions can execute them.
+    """
+    return [
+        update(Project)
+        .where(Project.id.in_(select(Document.project_id).where(Document.id.in_(document_ids))))
+        .values(table_version=Project.table_version + 1)
+        .execution_options(synchronize_session=False),
+        update(Document)
+        .where(Document.id.in_(document_ids))
+        .values(records_version=select(Project.table_version).where(Project.id == Document.project_id).scalar_subquery())
+        .execution_options(synchronize_session=False),
+    ]
+
+def bump_table_version(session: Session, document_ids: List[int]):
+    for statement in table_version_statements(document_ids):
+        session.exec(statement)
+
+def insert_records(session: Session, rows: List[dict]) -> List[ExtractedRecord]:
+    """One multi-row INSERT ... RETURNING; records come back with their IDs, in input order."""
+    if not rows:
+        return []
+    # Not sort_by_parameter_order: SQLite can only honour that one row per statement. Keys are assigned
+    # in VALUES order within a statement, so sorting by id restores the input order.
+    records = session.scalars(insert(ExtractedRecord).returning(ExtractedRecord), rows).all()
+    return sorted(records, key=lambda rec: rec.id)
+
+def replace_records(session: Session, results_by_document: Dict[int, List[dict]]) -> Dict[int, List[ExtractedRecord]]:
+    """
+    Replaces every record of the given documents with their new results and marks them extracted.
+    Does not commit, so callers can put several documents in one transaction.
+    """
+    document_ids = list(results_by_document)
+    if not document_ids:
+        return {}
+    session.exec(delete(ExtractedRecord).where(ExtractedRecord.document_id.in_(document_ids)))
+    rows = [record_values(document_id, res) for document_id, results in results_by_document.items() for res in results]
+    saved = {document_id: [] for document_id in document_ids}
+    for rec in insert_records(session, rows):
+        saved[rec.document_id].append(rec)
+    session.exec(update(Document).where(Document.id.in_(document_ids)).values(status="extracted"))
+    bump_table_version(session, document_ids)
+    return saved
+
+def upsert_record(session: Session, document_id: int, res: dict) -> ExtractedRecord:
+    """
+    Replaces one field's record of a document, for results persisted one at a time as they stream in.
+    Does not commit.
+    """
+    session.exec(delete(ExtractedRecord).where(ExtractedRecord.document_id == document_id, ExtractedRecord.field_name == res.get("field_name")))
+    (record,) = insert_records(session, [record_values(document_id, res)])
+    bump_table_version(session, [document_id])
+    return record
+
+def finish_streamed_records(session: Session, document_id: int, keep_ids: List[int]):
+    """
+    Completes a streamed extraction the way replace_records would have: records not written by it
+    (fields no longer in the template) are dropped and the document is marked extracted. Does not commit.
+    """
+    session.exec(delete(ExtractedRecord).where(ExtractedRecord.document_id == document_id, ExtractedRecord.id.not_in(keep_ids)))
+    session.exec(update(Document).where(Document.id == document_id).values(status="extracted"))
+    bump_table_version(session, [document_id])
+
+class RecordWriter:
+    """
+    Group commit for extraction workers. Each worker calls write() with its document's results and
+    gets back the saved records once they are committed. Whichever worker takes the write lock commits
+    everything queued so far in one transaction, so under load N workers share one transaction per batch
+    instead of committing N times; a lone worker still commits straight away.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.transactions = 0
+        self._pending: List[Tuple[int, List[dict], Future]] = []
+        self._lock = threading.Lock() # Guards _pending
+        self._write_lock = threading.Lock() # One batch in flight at a time
+
+    def write(self, document_id: int, results: List[dict]) -> List[ExtractedRecord]:
+        entry = (document_id, results, Future())
+        with self._lock:
+            self._pending.append(entry)
+        with self._write_lock:
+            if not entry[2].done():
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                self._flush(batch)
+        return entry[2].result()
+
+    def _flush(self, batch: Iterable[Tuple[int, List[dict], Future]]):
+        batch = list(batch)
+        try:
+            # expire_on_commit=False: the returned records are read after this session closes
+            with Session(self.engine, expire_on_commit=False) as session:
+                # A document written twice in one batch keeps its latest results
+                saved = replace_records(session, {document_id: results for document_id, results, _ in batch})
+                session.commit()
+            self.transactions += 1
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for document_id, _, future in batch:
+            future.set_result(saved[document_id])
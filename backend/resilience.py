@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+import metrics
+
+# Guards for calls to a slow, rate-limited provider (the LLM API):
+#   SingleFlight: identical calls in flight at the same time share one execution and its outcome.
+#   call_with_retry: retries transient failures with jittered exponential backoff, honoring Retry-After.
+#   CircuitBreaker: after repeated transient failures, rejects calls outright until a cool-down has passed.
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers arriving while it runs wait for its result (or error)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            metrics.increment("coalesced_calls_total", call=self.name)
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def _finish(self, key: Hashable):
+        # Callers arriving after this start a fresh call rather than reuse a finished one
+        with self._lock:
+            del self._calls[key]
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable after repeated failures; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    closed: calls go through; `failure_threshold` consecutive failures open the circuit (0 never opens it).
+    open: calls fail fast with CircuitOpenError for `reset_timeout` seconds.
+    half_open: then a single trial call goes through; success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False # A half-open trial call is in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if now - self._opened_at >= self.reset_timeout else "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return
+            retry_after = max(1.0, self.reset_timeout - (now - self._opened_at))
+        metrics.increment("circuit_rejections_total", circuit=self.name)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            failures = self._failures
+            reopen = self._trial
+            self._trial = False
+            if not (reopen or (self.failure_threshold and self._failures >= self.failure_threshold)):
+                return
+            self._opened_at = time.monotonic()
+        metrics.increment("circuit_opened_total", circuit=self.name)
+        print(f"Circuit {self.name} opened after {failures} consecutive failures; failing fast for {self.reset_timeout:.0f}s")
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    retryable: Callable[[Exception], bool],
+    retry_after: Callable[[Exception], Optional[float]] = lambda e: None,
+    max_retries: int = 3,
+    base_delay: float = 0.5,
+    max_delay: float = 60.0,
+    breaker: Optional[CircuitBreaker] = None,
+    name: str = "call",
+    sleep: Callable[[float], None] = time.sleep,
+) -> Any:
+    """
+    Calls `fn`, retrying errors for which `retryable` is true up to `max_retries` times. Each retry waits a
+    jittered exponential backoff, but never less than the error's `retry_after` (the server's Retry-After);
+    when that is longer than `max_delay` the error is raised instead of holding the caller.
+    With a `breaker`, every attempt is checked against and reported to it: only retryable errors count as
+    failures, since any other answer means the provider is up.
+    """
+    attempt = 0
+    while True:
+        if breaker:
+            breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            if not retryable(e):
+                if breaker:
+                    breaker.record_success()
+                raise
+            if breaker:
+                breaker.record_failure()
+            delay = max(backoff_delay(attempt, base_delay, max_delay), retry_after(e) or 0.0)
+            if attempt >= max_retries or delay > max_delay:
+                raise
+            attempt += 1
+            metrics.increment("retries_total", call=name)
+            print(f"{name} failed ({e}); retry {attempt}/{max_retries} in {delay:.2f}s")
+            sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
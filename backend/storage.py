@@ -0,0 +1,26 @@
+import os
+import threading
+
+# Files are written next to their destination under a writer-unique temporary name, then renamed into
+# place, so readers never see a partial file. Directory scans skip names ending in TEMP_SUFFIX.
+TEMP_SUFFIX = ".tmp"
+
+def write_temp(path: str, *parts: bytes) -> str:
+    """Writes `parts` to a temporary file beside `path` and returns its name, for the caller to os.replace."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{TEMP_SUFFIX}"
+    try:
+        with open(tmp_path, "wb") as f:
+            for part in parts:
+                f.write(part)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return tmp_path
+
+def atomic_write(path: str, *parts: bytes):
+    """Replaces `path` with the concatenated `parts` in one rename."""
+    os.replace(write_temp(path, *parts), path)
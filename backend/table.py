@@ -0,0 +1,120 @@
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from extraction import schema_to_fields
+from models import Project, Document, ExtractedRecord, ExtractionSchema
+
+# Project-wide comparison table: one row per field, one column per document.
+#
+# Each project's matrix is materialized in memory and kept up to date incrementally. Record writes stamp
+# the documents they touch with the project's new table_version (records.table_version_statements), so a
+# refresh re-reads only the records of documents stamped after the cached version. The cache is keyed by
+# a version tuple that doubles as the HTTP ETag; an unchanged table costs a single aggregate query.
+
+class Cell(BaseModel):
+    record_id: int
+    value: Optional[str] = None
+    confidence: Optional[float] = None
+    citation: Optional[str] = None
+    normalization: Optional[str] = None
+    status: str
+
+class TableDocument(BaseModel):
+    id: int
+    filename: str
+
+class TableRow(BaseModel):
+    field_name: str
+    cells: List[Optional[Cell]] # Aligned with ProjectTable.documents; None where the field was not extracted
+
+class ProjectTable(BaseModel):
+    project_id: int
+    documents: List[TableDocument]
+    rows: List[TableRow]
+
+# (table_version, schema_version, document count, highest document id): changes whenever records, the
+# field template or the set of documents change
+TableVersion = Tuple[int, int, int, int]
+
+class _Materialized:
+    def __init__(self):
+        self.version: Optional[TableVersion] = None
+        self.fields: List[str] = []
+        self.documents: Dict[int, TableDocument] = {}
+        self.cells: Dict[int, Dict[str, Cell]] = {} # document id -> field name -> cell
+
+_tables: Dict[int, _Materialized] = {}
+_lock = threading.Lock()
+
+def etag(project_id: int, version: TableVersion) -> str:
+    digest = hashlib.sha256(f"{project_id}:{version}".encode("utf-8")).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+async def table_version(session: AsyncSession, project: Project) -> TableVersion:
+    count, max_id = (await session.exec(
+        select(func.count(Document.id), func.max(Document.id)).where(Document.project_id == project.id)
+    )).one()
+    return (project.table_version, project.schema_version, count, max_id or 0)
+
+async def _refresh(session: AsyncSession, project: Project, version: TableVersion, table: _Materialized):
+    previous = table.version[0] if table.version else None
+
+    documents = (await session.exec(
+        select(Document.id, Document.filename, Document.records_version).where(Document.project_id == project.id).order_by(Document.id)
+    )).all()
+    changed = [doc.id for doc in documents if previous is None or doc.records_version > previous or doc.id not in table.documents]
+
+    statement = select(ExtractedRecord).order_by(ExtractedRecord.id)
+    if previous is None:
+        statement = statement.join(Document).where(Document.project_id == project.id)
+    else:
+        statement = statement.where(ExtractedRecord.document_id.in_(changed))
+    cells: Dict[int, Dict[str, Cell]] = {document_id: {} for document_id in changed}
+    if changed:
+        for rec in (await session.exec(statement)).all():
+            cells[rec.document_id][rec.field_name] = Cell(
+                record_id=rec.id, value=rec.value, confidence=rec.confidence, citation=rec.citation,
+                normalization=rec.normalization, status=rec.status,
+            )
+
+    schema_rows = (await session.exec(
+        select(ExtractionSchema).where(ExtractionSchema.project_id == project.id).order_by(ExtractionSchema.id)
+    )).all()
+
+    with _lock:
+        table.cells.update(cells)
+        table.documents = {doc.id: TableDocument(id=doc.id, filename=doc.filename) for doc in documents}
+        for document_id in set(table.cells) - set(table.documents):
+            del table.cells[document_id]
+        template = [f["name"] for f in schema_to_fields(schema_rows)]
+        # Fields dropped from the template keep a row while reviewed records still hold values for them
+        extra = sorted({name for row in table.cells.values() for name in row} - set(template))
+        table.fields = template + extra
+        table.version = version
+
+async def get_table(session: AsyncSession, project: Project, version: TableVersion) -> ProjectTable:
+    """The project's comparison table at `version`, refreshing the materialized copy if it is older."""
+    with _lock:
+        table = _tables.setdefault(project.id, _Materialized())
+    if table.version != version:
+        await _refresh(session, project, version, table)
+
+    with _lock:
+        document_ids = list(table.documents)
+        return ProjectTable(
+            project_id=project.id,
+            documents=[table.documents[document_id] for document_id in document_ids],
+            rows=[
+                TableRow(field_name=name, cells=[table.cells.get(document_id, {}).get(name) for document_id in document_ids])
+                for name in table.fields
+            ],
+        )
+
+def forget(project_id: int):
+    """Drops a project's materialized table (e.g. when the project is deleted)."""
+    with _lock:
+        _tables.pop(project_id, None)
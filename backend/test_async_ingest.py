@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+from app import app
+from unittest.mock import patch
+import json
+import pytest
+
+def test_async_ingestion(wait_for_job):
+    with patch("app.process_and_store_document") as mock_store:
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "Async Ingest", "description": "d"}).json()["id"]
+            files = [f for f in client.get("/files").json() if f.endswith(".html") or f.endswith(".pdf")][:2]
+            if not files:
+                pytest.skip("No files")
+
+            response = client.post(f"/projects/{pid}/ingest/async", json={"filenames": files})
+            assert response.status_code == 200, response.text
+            job = response.json()
+            assert job["total"] == len(files)
+
+            # Documents are visible straight away, before parsing finishes
+            docs = client.get(f"/projects/{pid}/documents").json()
+            assert len(docs) == len(files)
+
+            job = wait_for_job(client, job["id"])
+            assert job["status"] == "completed"
+            assert mock_store.call_count == len(files)
+            for did in job["items"]:
+                doc = client.get(f"/documents/{did}").json()
+                assert doc["status"] == "ingested"
+                assert len(doc["content"]) > 0
+
+def test_async_ingestion_records_embedding_failure():
+    with patch("app.process_and_store_document", side_effect=RuntimeError("embedder offline")):
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "Async Fail", "description": "d"}).json()["id"]
+            files = [f for f in client.get("/files").json() if f.endswith(".html")][:1]
+            if not files:
+                pytest.skip("No html files")
+
+            job_id = client.post(f"/projects/{pid}/ingest/async", json={"filenames": files}).json()["id"]
+
+            # The SSE stream ends with the final job snapshot
+            with client.stream("GET", f"/jobs/{job_id}/events") as response:
+                events = [json.loads(line[len("data: "):]) for line in response.iter_lines() if line.startswith("data: ")]
+            assert events[-1]["status"] == "failed"
+
+            did = next(iter(events[-1]["items"]))
+            doc = client.get(f"/documents/{did}").json()
+            assert doc["status"] == "error"
+            assert "embedder offline" in doc["error"]
+
+def test_async_ingestion_missing_file():
+    with TestClient(app) as client:
+        pid = client.post("/projects", json={"name": "Async Missing", "description": "d"}).json()["id"]
+        response = client.post(f"/projects/{pid}/ingest/async", json={"filenames": ["nope.pdf"]})
+        assert response.status_code == 404
@@ -0,0 +1,101 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app import app
+from database import engine
+from models import Document
+from extraction import TokenRateLimiter
+import jobs
+from unittest.mock import patch
+import time
+import pytest
+
+def test_batch_extraction(wait_for_job):
+    mock_data = [{"field_name": "Contract Title", "value": "Mock Agreement", "confidence": 0.9}]
+
+    with patch("app.extract_data_from_text", return_value=mock_data):
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "Batch", "description": "d"}).json()["id"]
+
+            files = client.get("/files").json()
+            if not files:
+                pytest.skip("No files")
+            target = next((f for f in files if f.endswith(".html")), files[0])
+
+            doc_ids = [client.post(f"/projects/{pid}/ingest", json={"filename": target}).json()["id"] for _ in range(3)]
+
+            response = client.post(f"/projects/{pid}/extract", json={"max_workers": 2})
+            assert response.status_code == 200, response.text
+            job = wait_for_job(client, response.json()["id"])
+
+            assert job["status"] == "completed"
+            assert job["total"] == 3
+            assert client.post(f"/projects/{pid}/extract", json={"max_workers": 10_000}).status_code == 422
+            assert job["completed"] == 3
+            for did in doc_ids:
+                assert job["items"][str(did)]["result"] == {"records": 1}
+                assert len(client.get(f"/documents/{did}/records").json()) == 1
+
+def test_batch_extraction_reports_failures(wait_for_job):
+    with patch("app.extract_data_from_text", side_effect=ValueError("GROQ_API_KEY not set")):
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "BatchFail", "description": "d"}).json()["id"]
+            files = client.get("/files").json()
+            if not files:
+                pytest.skip("No files")
+            did = client.post(f"/projects/{pid}/ingest", json={"filename": files[0]}).json()["id"]
+
+            job = wait_for_job(client, client.post(f"/projects/{pid}/extract").json()["id"])
+            assert job["status"] == "failed"
+            assert job["items"][str(did)]["status"] == "failed"
+            assert "GROQ_API_KEY" in job["items"][str(did)]["detail"]
+
+def test_documents_without_text_are_not_extracted(wait_for_job):
+    with patch("app.extract_data_from_text") as extract:
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "NoText", "description": "d"}).json()["id"]
+            with Session(engine) as session:
+                docs = [Document(project_id=pid, filename=f"{status}.pdf", file_path="", status=status) for status in ("queued", "error")]
+                session.add_all(docs)
+                session.commit()
+                doc_ids = [doc.id for doc in docs]
+
+            for did in doc_ids:
+                assert client.post(f"/documents/{did}/extract").status_code == 409
+                assert client.post(f"/documents/{did}/extract/stream").status_code == 409
+
+            job = wait_for_job(client, client.post(f"/projects/{pid}/extract").json()["id"])
+            assert job["total"] == 0
+            assert [client.get(f"/documents/{did}").json()["status"] for did in doc_ids] == ["queued", "error"]
+    extract.assert_not_called()
+
+def test_token_rate_limiter_blocks_over_budget():
+    limiter = TokenRateLimiter(100, window=0.2)
+    start = time.monotonic()
+    limiter.acquire(60)
+    limiter.acquire(60) # Must wait for the first reservation to leave the window
+    assert time.monotonic() - start >= 0.15
+
+def test_job_rate_limiter_charges_the_shared_budget():
+    shared = TokenRateLimiter(100, window=0.2)
+    job_limiter = TokenRateLimiter(80, window=0.2, parent=shared)
+    job_limiter.acquire(50)
+    start = time.monotonic()
+    shared.acquire(60) # Only 50 of the shared budget is left
+    assert time.monotonic() - start >= 0.15
+
+def test_finished_jobs_are_evicted(monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_FINISHED_JOBS", 2)
+    finished = []
+    for _ in range(3):
+        job = jobs.create_job("test")
+        jobs.finish_job(job.id)
+        finished.append(job.id)
+    running = jobs.create_job("test")
+    assert jobs.get_job(finished[0]) is None # Oldest finished job beyond the cap
+    assert all(jobs.get_job(job_id) for job_id in finished[1:] + [running.id])
+
+    monkeypatch.setattr(jobs, "JOB_TTL_SECONDS", 0)
+    jobs.create_job("test")
+    assert jobs.get_job(finished[2]) is None and jobs.get_job(running.id) # Unfinished jobs are never dropped
+    with TestClient(app) as client:
+        assert client.get(f"/jobs/{finished[2]}").status_code == 404
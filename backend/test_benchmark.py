@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+import groq
+import pytest
+from groq import Groq
+from mock_groq import MockGroqServer
+from extraction import generate_extraction_prompt, DEFAULT_FIELDS
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONTRACT = """<html><body>
+<h1>SUPPLY AGREEMENT</h1>
+<p>This Supply Agreement is effective as of January 1, 2024 between Acme Corp and Widget LLC, the parties hereto.</p>
+<p>This Agreement is governed by the laws of the State of Delaware.</p>
+<p>Termination: either party may terminate this Agreement on 90 days written notice.</p>
+</body></html>"""
+
+def complete(client, prompt):
+    completion = client.chat.completions.create(
+        model="mock", messages=[{"role": "user", "content": prompt}], response_format={"type": "json_object"}
+    )
+    return json.loads(completion.choices[0].message.content)["results"]
+
+def test_mock_server_answers_extraction_prompts():
+    prompt = generate_extraction_prompt("Governing Law: the laws of Delaware.\nNothing else here.", DEFAULT_FIELDS)
+    with MockGroqServer() as server:
+        results = complete(Groq(api_key="test", base_url=server.url), prompt)
+    assert [r["field_name"] for r in results] == [f["name"] for f in DEFAULT_FIELDS]
+    by_name = {r["field_name"]: r["value"] for r in results}
+    assert by_name["Governing Law"] == "Governing Law: the laws of Delaware."
+    assert by_name["Effective Date"] is None
+    assert server.stats["completions"] == 1
+
+def test_mock_server_rate_limits_with_retry_after():
+    prompt = generate_extraction_prompt("Some text.", DEFAULT_FIELDS)
+    with MockGroqServer(requests_per_minute=1) as server:
+        client = Groq(api_key="test", base_url=server.url, max_retries=0)
+        complete(client, prompt)
+        with pytest.raises(groq.RateLimitError) as exc:
+            complete(client, prompt)
+    assert 1 <= int(exc.value.response.headers["Retry-After"]) <= 60
+    assert (server.stats["requests"], server.stats["completions"], server.stats["rate_limited"]) == (2, 1, 1)
+
+def test_benchmark_reports_every_stage(tmp_path):
+    contract = tmp_path / "contract.html"
+    contract.write_text(CONTRACT, encoding="utf-8")
+    output = tmp_path / "report.json"
+    subprocess.run(
+        [sys.executable, "benchmark.py", "--files", str(contract), "--scale", "3", "--latency", "0", "--jitter", "0",
+         "--work-dir", str(tmp_path / "work"), "--output", str(output)],
+        cwd=BACKEND_DIR, check=True, capture_output=True, timeout=300,
+    )
+    report = json.loads(output.read_text())
+    assert report["corpus"]["documents"] == 3
+    assert list(report["stages"]) == ["parse", "ingest", "chunk", "embed", "retrieve", "extract", "persist"]
+    assert report["stages"]["extract"]["count"] == 3
+    assert report["stages"]["persist"]["latency_ms"]["p95"] >= report["stages"]["persist"]["latency_ms"]["p50"]
+    assert report["extraction_errors"] == []
+    assert report["mock_llm"]["completions"] == 3
@@ -0,0 +1,80 @@
+import os
+from unittest.mock import patch
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import cache
+from cache import ContentCache, parse_document_cached, get_embeddings, put_embeddings
+from storage import write_temp
+
+@pytest.fixture
+def temp_cache(tmp_path):
+    content_cache = ContentCache(root=str(tmp_path / "cache"), max_bytes=10_000)
+    cache.set_cache(content_cache)
+    yield content_cache
+    cache.set_cache(None)
+
+def test_parse_is_cached_by_content(temp_cache, tmp_path):
+    path = tmp_path / "contract.txt"
+    path.write_text("This Agreement is governed by the laws of Delaware.")
+    copy = tmp_path / "copy.txt"
+    copy.write_text(path.read_text())
+
+    text, digest = parse_document_cached(str(path))
+    text_again, digest_again = parse_document_cached(str(copy))
+
+    assert text == text_again
+    assert digest == digest_again
+    assert temp_cache.stats()["namespaces"]["parsed"] == {"hits": 1, "misses": 1}
+
+def test_embeddings_round_trip(temp_cache):
+    put_embeddings("doc", [[0.1, 0.2], [0.3, 0.4]])
+    assert np.allclose(get_embeddings("doc"), [[0.1, 0.2], [0.3, 0.4]])
+    assert get_embeddings("missing") is None
+
+def test_eviction_keeps_cache_under_budget(temp_cache):
+    for i in range(30):
+        temp_cache.put("parsed", f"key{i:02d}", b"x" * 1000)
+        # Keep key00 hot so LRU eviction spares it
+        temp_cache.get("parsed", "key00")
+    stats = temp_cache.stats()
+    assert stats["bytes"] <= 10_000
+    assert stats["evictions"] > 0
+    assert temp_cache.get("parsed", "key00") is not None
+    assert temp_cache.get("parsed", "key01") is None
+
+def test_extraction_results_have_their_own_budget(tmp_path):
+    content_cache = ContentCache(root=str(tmp_path / "cache"), max_bytes=10_000, namespace_max_bytes={"extractions": 3_000})
+    content_cache.put("extractions", "field", b"r" * 500)
+    os.utime(content_cache._path("extractions", "field"), (0, 0)) # Least recently used of all
+    for i in range(30):
+        content_cache.put("parsed", f"key{i:02d}", b"x" * 1000)
+    assert content_cache.get("extractions", "field") is not None
+
+    for i in range(10):
+        content_cache.put("extractions", f"other{i}", b"r" * 500)
+    stats = content_cache.stats()
+    assert stats["budgets"]["extractions"]["bytes"] <= 3_000
+    assert stats["bytes"] <= 10_000
+    assert content_cache.get("extractions", "field") is None
+
+def test_eviction_spares_writes_in_progress(temp_cache):
+    # Another writer's temporary file, older than every entry
+    in_progress = write_temp(temp_cache._path("parsed", "pending"), b"y" * 5000)
+    os.utime(in_progress, (0, 0))
+    for i in range(15):
+        temp_cache.put("parsed", f"key{i:02d}", b"x" * 1000)
+    assert temp_cache.stats()["evictions"] > 0
+    assert os.path.exists(in_progress)
+
+def test_get_survives_concurrent_eviction(temp_cache):
+    temp_cache.put("parsed", "key", b"data")
+    with patch("cache.os.utime", side_effect=FileNotFoundError):
+        assert temp_cache.get("parsed", "key") == b"data"
+
+def test_cache_stats_endpoint(temp_cache):
+    from app import app
+    with TestClient(app) as client:
+        response = client.get("/cache/stats")
+        assert response.status_code == 200
+        assert response.json()["max_bytes"] == 10_000
@@ -0,0 +1,50 @@
+from chunking import split_text
+from parsers import PAGE_BREAK
+
+CONTRACT = """SUPPLY AGREEMENT
+
+ARTICLE 1 DEFINITIONS
+
+1.1 "Goods" means the products listed in Exhibit A. The Supplier shall manufacture the Goods in accordance with the Specifications.
+
+1.2 "Term" means the period described in Section 9.
+
+ARTICLE 2 GOVERNING LAW
+
+2.1 This Agreement is governed by the laws of the State of Delaware, without regard to its conflict of laws principles.
+(a) Each party submits to the jurisdiction of the courts of Delaware.
+(b) Each party waives trial by jury.
+"""
+
+def test_chunks_have_exact_offsets():
+    chunks = split_text(CONTRACT, chunk_size=200, chunk_overlap=50)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert CONTRACT[chunk.start:chunk.end] == chunk.text
+        assert len(chunk.text) <= 200
+        assert chunk.text == chunk.text.strip()
+        assert chunk.page is None
+
+def test_chunks_cover_text_and_make_progress():
+    chunks = split_text(CONTRACT, chunk_size=120, chunk_overlap=40)
+    covered = "".join(CONTRACT[c.start:c.end] for c in chunks)
+    for word in CONTRACT.split():
+        assert word in covered
+    assert all(a.start < b.start and a.end < b.end for a, b in zip(chunks, chunks[1:]))
+
+def test_sections_start_new_chunks():
+    chunks = split_text(CONTRACT, chunk_size=300, chunk_overlap=0)
+    assert any(c.text.startswith("ARTICLE 2") for c in chunks)
+    # Numbered clauses are never cut mid-sentence when they fit
+    assert any("2.1 This Agreement is governed by the laws of the State of Delaware" in c.text for c in chunks)
+
+def test_long_paragraph_split_on_word_boundaries():
+    text = " ".join(f"word{i}" for i in range(500))
+    chunks = split_text(text, chunk_size=100, chunk_overlap=0)
+    assert all(len(c.text) <= 100 for c in chunks)
+    assert all(not c.text.startswith(" ") and text[c.end:c.end + 1] in ("", " ") for c in chunks)
+
+def test_page_numbers_follow_page_breaks():
+    text = "Page one clause.\n" + PAGE_BREAK + "Page two clause.\n" + PAGE_BREAK + "Page three clause.\n" + PAGE_BREAK
+    chunks = split_text(text, chunk_size=20, chunk_overlap=0)
+    assert [(c.text, c.page) for c in chunks] == [("Page one clause.", 1), ("Page two clause.", 2), ("Page three clause.", 3)]
@@ -0,0 +1,99 @@
+import tempfile
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from content_store import ContentStore, set_content_store, document_text, move_inline_content
+from database import engine, create_db_and_tables
+from models import Project, Document
+from parsers import PAGE_BREAK
+
+TEXT = "Première page — clause one.\n" + PAGE_BREAK + "Second page: governing law.\n" + PAGE_BREAK + "Third page."
+
+@pytest.fixture
+def small_blocks():
+    store = ContentStore(root=tempfile.mkdtemp(), block_chars=10)
+    set_content_store(store)
+    yield store
+    set_content_store(None)
+
+def test_range_reads_across_blocks(small_blocks):
+    key = small_blocks.put(TEXT)
+    assert small_blocks.put(TEXT) == key # Same text, same blob
+
+    assert small_blocks.get(key) == TEXT
+    for start, end in [(0, 5), (8, 23), (9, 10), (25, len(TEXT)), (40, 1000), (50, 50)]:
+        assert small_blocks.read(key, start, end) == TEXT[start:end]
+    assert small_blocks.info(key) == {"chars": len(TEXT), "pages": 3}
+
+    # The blob is compressed text plus a small header, not a copy of the text
+    with open(small_blocks._path(key), "rb") as f:
+        assert TEXT.encode("utf-8") not in f.read()
+
+def test_pages(small_blocks):
+    key = small_blocks.put(TEXT)
+    start, end = small_blocks.page_span(key, 2)
+    assert TEXT[start:end] == "Second page: governing law.\n" + PAGE_BREAK
+    assert small_blocks.page_of(key, start) == 2
+    assert small_blocks.page_of(key, len(TEXT) - 1) == 3
+    with pytest.raises(IndexError):
+        small_blocks.page_span(key, 4)
+
+def test_text_blocks(small_blocks):
+    text = "Heading\n\nFirst paragraph\nwraps here.\n \nRow 1\tA\nRow 2\tB\n" + PAGE_BREAK + "  Next page."
+    key = small_blocks.put(text)
+    blocks = [text[slice(*small_blocks.block_span(key, text.index(word)))] for word in ("Heading", "wraps", "Row 2", "Next")]
+    assert blocks == ["Heading", "First paragraph\nwraps here.", "Row 1\tA\nRow 2\tB", "Next page."]
+    assert small_blocks.block_span(key, text.index("\n\nFirst")) == small_blocks.block_span(key, 0) # Between blocks
+
+def test_header_cache_is_bounded(tmp_path):
+    store = ContentStore(root=str(tmp_path), header_cache_size=2)
+    keys = [store.put(f"Document {i}.") for i in range(4)]
+    for key in keys:
+        store.info(key)
+    store.info(keys[2]) # Most recently used survives the next insert
+    assert store.read(keys[0]) == "Document 0."
+    assert list(store._headers) == [keys[2], keys[0]]
+
+def test_inline_content_is_moved(small_blocks):
+    create_db_and_tables()
+    with Session(engine) as session:
+        project = Project(name="Legacy")
+        session.add(project)
+        session.commit()
+        doc = Document(project_id=project.id, filename="old.txt", content=TEXT, file_path="old.txt")
+        session.add(doc)
+        session.commit()
+        doc_id = doc.id
+
+    assert move_inline_content(engine, batch_size=1) >= 1
+    with Session(engine) as session:
+        doc = session.get(Document, doc_id)
+        assert doc.content == ""
+        assert doc.page_count == 3
+        assert document_text(doc) == TEXT
+
+def test_content_range_endpoint():
+    from app import app
+    with TestClient(app) as client:
+        pid = client.post("/projects", json={"name": "Ranges", "description": "d"}).json()["id"]
+        files = [f for f in client.get("/files").json() if f.endswith(".pdf")]
+        if not files:
+            pytest.skip("No PDF files")
+        doc = client.post(f"/projects/{pid}/ingest", json={"filename": files[0]}).json()
+        full = client.get(f"/documents/{doc['id']}").json()["content"]
+        assert doc["content"] == full
+        assert doc["content_length"] == len(full)
+
+        part = client.get(f"/documents/{doc['id']}/content", params={"start": 100, "end": 400}).json()
+        assert part["text"] == full[100:400]
+        assert part["total_chars"] == len(full)
+
+        page = client.get(f"/documents/{doc['id']}/content", params={"page": 2}).json()
+        assert page["page"] == 2
+        assert full[page["start"]:page["end"]] == page["text"]
+        assert full[:page["start"]].count(PAGE_BREAK) == 1
+
+        assert client.get(f"/documents/{doc['id']}/content", params={"page": 10_000}).status_code == 404
+
+        block = client.get(f"/documents/{doc['id']}/content", params={"block_at": 150}).json()
+        assert block["start"] <= 150 and block["text"] == full[block["start"]:block["end"]]
@@ -0,0 +1,25 @@
+import asyncio
+from sqlalchemy import text
+from database import engine, async_engine, async_url, SQLITE_BUSY_TIMEOUT_MS
+
+def test_async_url_picks_async_driver():
+    assert async_url("sqlite:////tmp/app.db") == "sqlite+aiosqlite:////tmp/app.db"
+    assert async_url("postgresql://user:secret@db:5432/review") == "postgresql+asyncpg://user:secret@db:5432/review"
+    assert async_url("postgresql+psycopg2://u:p@db/review") == "postgresql+asyncpg://u:p@db/review"
+    # Already async-capable drivers are kept
+    assert async_url("postgresql+psycopg://u:p@db/review") == "postgresql+psycopg://u:p@db/review"
+
+def test_sqlite_pragmas_on_sync_engine():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == SQLITE_BUSY_TIMEOUT_MS
+
+def test_sqlite_pragmas_on_async_engine():
+    async def check():
+        async with async_engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            busy_timeout = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        await async_engine.dispose()
+        return journal_mode, busy_timeout
+
+    assert asyncio.run(check()) == ("wal", SQLITE_BUSY_TIMEOUT_MS)
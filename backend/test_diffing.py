@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import pytest
+from app import app
+from diffing import DiffCache, diff_field, normalize_value, token_diff
+from table import Cell
+
+def cell(record_id, value, normalization=None):
+    return Cell(record_id=record_id, value=value, normalization=normalization, status="pending")
+
+def test_groups_consensus_and_outliers():
+    entries = [(i, cell(i, "Delaware")) for i in range(1, 10)]
+    entries += [(10, cell(10, "the State of New York.")), (11, None), (12, cell(12, " DELAWARE. "))]
+    result = diff_field("Governing Law", entries, DiffCache())
+
+    assert result.missing_document_ids == [11]
+    consensus, other = result.groups
+    assert consensus.consensus and consensus.document_ids == list(range(1, 10)) + [12]
+    assert consensus.value == "Delaware"
+    assert other.outlier and other.document_ids == [10]
+    assert not result.clause and other.diff is None
+
+def test_normalization_takes_precedence():
+    entries = [(1, cell(1, "Jan 1, 2024", "2024-01-01")), (2, cell(2, "1 January 2024", "2024-01-01")), (3, cell(3, "2025"))]
+    groups = diff_field("Effective Date", entries, DiffCache()).groups
+    assert groups[0].document_ids == [1, 2]
+    assert normalize_value("  'Delaware Law.'  ") == "delaware law"
+
+def test_clause_token_diff_and_cache():
+    base = "Either party may terminate this Agreement upon thirty (30) days prior written notice to the other party."
+    other = "Either party may terminate this Agreement upon sixty (60) days prior written notice to the other party."
+    ops = token_diff(base, other)
+    assert [(op.op, op.base, op.other) for op in ops if op.op != "equal"] == [("replace", "thirty", "sixty"), ("replace", "30", "60")]
+    assert "".join(op.base for op in ops) == base and "".join(op.other for op in ops) == other
+
+    cache = DiffCache()
+    entries = [(1, cell(1, base)), (2, cell(2, base)), (3, cell(3, other))]
+    first = diff_field("Termination", entries, cache)
+    assert first.clause and first.groups[1].diff == ops
+    assert diff_field("Termination", entries, cache) is first # Same records: served from cache
+
+    # A re-extracted record (new id) is recomputed, but the token diff itself is reused
+    hits = cache.hits
+    diff_field("Termination", entries[:2] + [(3, cell(4, other))], cache)
+    assert cache.hits == hits + 1
+
+def test_project_diff_endpoint():
+    def extract(text, fields=None, document_id=None, **kwargs):
+        value = "New York" if document_id % 3 == 0 else "Delaware"
+        return [{"field_name": f["name"], "value": value} for f in fields]
+
+    with patch("app.extract_data_from_text", side_effect=extract):
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "Diff", "description": "d"}).json()["id"]
+            files = client.get("/files").json()
+            if not files:
+                pytest.skip("No files")
+            target = next((f for f in files if f.endswith(".html")), files[0])
+            client.put(f"/projects/{pid}/schema", json={"fields": [{"field_name": "Governing Law", "field_description": "Law"}]})
+            doc_ids = [client.post(f"/projects/{pid}/ingest", json={"filename": target}).json()["id"] for _ in range(3)]
+            for did in doc_ids:
+                client.post(f"/documents/{did}/extract")
+
+            diffs = client.get(f"/projects/{pid}/diff", params={"field": "Governing Law"}).json()
+            assert len(diffs) == 1
+            groups = diffs[0]["groups"]
+            assert sorted(d for g in groups for d in g["document_ids"]) == doc_ids
+            assert groups[0]["consensus"] and groups[0]["value"] == "Delaware"
+
+            assert client.get(f"/projects/{pid}/diff", params={"field": "Nope"}).status_code == 404
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from chromadb.api.types import Documents, Embeddings
+from embeddings import CachedEmbeddingFunction, HashEmbeddingFunction, set_embedding_function, get_embedding_function, build_backend
+from vector_store import process_and_store_document, query_document, query_document_fields, get_chroma_client, get_collection
+
+class RecordingEmbedding(HashEmbeddingFunction):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.calls.append(list(input))
+        return super().__call__(input)
+
+def test_hash_embeddings_are_deterministic_and_normalized():
+    embed = HashEmbeddingFunction()
+    first, second = embed(["Governing law: Delaware", "Governing law: Delaware"])
+    assert np.allclose(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert HashEmbeddingFunction.build_from_config(embed.get_config()).dimensions == embed.dimensions
+
+def test_document_embedding_is_batched():
+    base = RecordingEmbedding()
+    embed = CachedEmbeddingFunction(base, batch_size=4)
+    vectors = embed([f"chunk {i}" for i in range(10)])
+    assert len(vectors) == 10
+    assert [len(c) for c in base.calls] == [4, 4, 2]
+
+def test_query_embeddings_are_memoized():
+    base = RecordingEmbedding()
+    embed = CachedEmbeddingFunction(base, query_cache_size=2)
+    first = embed.embed_query(["Parties", "Governing Law"])
+    second = embed.embed_query(["Governing Law", "Parties", "Governing Law"])
+
+    assert len(base.calls) == 1
+    assert np.allclose(first[0], second[1])
+    assert embed.stats()["query_hits"] == 3
+
+    embed.embed_query(["Term"]) # Evicts the least recently used entry ("Parties")
+    embed.embed_query(["Governing Law", "Parties"])
+    assert base.calls[-1] == ["Parties"]
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        build_backend("nope")
+
+def test_vector_store_offline_with_hash_backend(hash_store):
+    process_and_store_document(1, "The parties are Alice and Bob.\n\nPayment is due in thirty days.", chunk_size=40, chunk_overlap=0, db_path=hash_store)
+    process_and_store_document(2, "This lease covers the warehouse.", db_path=hash_store)
+
+    assert query_document(1, "Who are the parties Alice Bob", n_results=1, db_path=hash_store) == ["The parties are Alice and Bob."]
+    per_field = query_document_fields(1, ["parties Alice", "payment due days"], n_results=1, db_path=hash_store)
+    assert per_field == [["The parties are Alice and Bob."], ["Payment is due in thirty days."]]
+
+    # Repeated field queries are served from the query cache
+    query_document_fields(1, ["parties Alice", "payment due days"], n_results=1, db_path=hash_store)
+    assert get_embedding_function().stats()["query_hits"] >= 2
+
+class OtherEmbedding(HashEmbeddingFunction):
+    @staticmethod
+    def name() -> str:
+        return "other"
+
+    @staticmethod
+    def build_from_config(config):
+        return OtherEmbedding()
+
+def test_collections_record_their_backend(hash_store):
+    process_and_store_document(1, "Alpha supply agreement.", db_path=hash_store, project_id=7)
+    client = get_chroma_client(hash_store)
+    assert client.get_collection("project_7").configuration_json["embedding_function"]["name"] == "hash"
+
+    # Same dimensions, different vectors: reopening with another backend must not mix them silently
+    set_embedding_function(OtherEmbedding())
+    with pytest.raises(ValueError, match="conflict"):
+        get_collection(client, 7)
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import pytest
+from app import app, DATA_DIR
+from evaluation import GoldLabel, evaluate, token_similarity
+
+CLAUSE = "Either party may terminate this Agreement upon thirty days prior written notice to the other party"
+
+def test_metrics_by_field_kind():
+    labels = [
+        GoldLabel(document_id=1, field_name="Effective Date", value="January 1, 2024", normalization="2024-01-01"),
+        GoldLabel(document_id=2, field_name="Effective Date", value="March 3, 2023", normalization="2023-03-03"),
+        GoldLabel(document_id=1, field_name="Termination", value=CLAUSE),
+        GoldLabel(document_id=2, field_name="Termination", value=CLAUSE),
+        GoldLabel(document_id=1, field_name="Fee", value="$1,000"),
+        GoldLabel(document_id=2, field_name="Fee", value=None), # Not in the contract
+        GoldLabel(document_id=1, field_name="Parties", value="Acme Holdings Inc and Widget LLC"),
+        GoldLabel(filename="missing.pdf", field_name="Fee", value="1"),
+    ]
+    predictions = {
+        (1, "Effective Date"): ("Jan 1, 2024", "2024-01-01"),
+        (2, "Effective Date"): ("March 2023", "March 2023"), # Wrong and not ISO
+        (1, "Termination"): (CLAUSE.replace("the other party", "the counterparty"), None), # Fuzzy match
+        (2, "Termination"): ("Governed by Delaware law", None),
+        (1, "Fee"): ("1000", None),
+        (2, "Fee"): ("500", None),
+        (1, "Parties"): ("Acme Services Inc and Widget LLC", None), # Most tokens shared, but too short for fuzzy matching
+    }
+    result = evaluate(labels, predictions, {"a.pdf": [1], "b.pdf": [2]}, {"Fee": "number"})
+
+    assert result["fields"]["Effective Date"] == {
+        "kind": "date", "labels": 2, "accuracy": 0.5, "coverage": 1.0, "normalization_validity": 0.5, "false_positives": 0,
+    }
+    assert result["fields"]["Termination"]["kind"] == "text"
+    assert result["fields"]["Termination"]["accuracy"] == 0.5
+    assert result["fields"]["Fee"]["accuracy"] == 1.0
+    assert result["fields"]["Fee"]["false_positives"] == 1
+    assert result["fields"]["Parties"]["accuracy"] == 0.0
+    assert result["overall"]["labels"] == 6
+    assert result["overall"]["accuracy"] == 0.5
+    assert result["unmatched_labels"] == 1
+    assert {(e["document_id"], e["field_name"]) for e in result["errors"]} == {(2, "Effective Date"), (2, "Termination"), (1, "Parties")}
+
+def test_vectorized_scoring_scales():
+    n = 20000
+    labels = [GoldLabel(document_id=i, field_name="Termination", value=f"{CLAUSE} clause {i}") for i in range(n)]
+    predictions = {(i, "Termination"): (f"{CLAUSE} clause {i if i % 4 else -1}", None) for i in range(n)}
+    start = time.monotonic()
+    result = evaluate(labels, predictions, {"all": list(range(n))})
+    assert result["overall"]["coverage"] == 1.0
+    assert result["overall"]["accuracy"] == 1.0 # One differing token out of ~20 still matches fuzzily
+    assert time.monotonic() - start < 30
+    assert token_similarity(["a b c d"], ["a b x y"])[0] == pytest.approx(0.5)
+
+def test_evaluation_endpoint_stores_report():
+    def extract(text, fields=None, document_id=None, **kwargs):
+        return [{"field_name": "Governing Law", "value": "Delaware"}]
+
+    with patch("app.extract_data_from_text", side_effect=extract):
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "Eval", "description": "d"}).json()["id"]
+            files = client.get("/files").json()
+            if not files:
+                pytest.skip("No files")
+            target = next((f for f in files if f.endswith(".html")), files[0])
+            did = client.post(f"/projects/{pid}/ingest", json={"filename": target}).json()["id"]
+            client.post(f"/documents/{did}/extract")
+
+            labels = [{"filename": target, "field_name": "Governing Law", "value": "State of Delaware"},
+                      {"document_id": did, "field_name": "Parties", "value": "Acme Corp"}]
+            report = client.post(f"/projects/{pid}/evaluations", json={"labels": labels, "tag": "baseline"}).json()
+            assert report["tag"] == "baseline"
+            assert report["labels"] == 2
+            assert report["coverage"] == 0.5
+            assert report["prompt_version"] and report["model"]
+            assert report["metrics"]["fields"]["Parties"]["coverage"] == 0.0
+
+            # Labels can also come from a file in the data directory
+            labels_file = "test_labels.json"
+            with open(os.path.join(DATA_DIR, labels_file), "w") as f:
+                json.dump(labels, f)
+            try:
+                second = client.post(f"/projects/{pid}/evaluations", json={"labels_file": labels_file}).json()
+            finally:
+                os.remove(os.path.join(DATA_DIR, labels_file))
+            assert second["accuracy"] == report["accuracy"]
+
+            reports = client.get(f"/projects/{pid}/evaluations").json()
+            assert [r["id"] for r in reports] == [report["id"], second["id"]]
+            assert client.post(f"/projects/{pid}/evaluations", json={"labels_file": "../backend/app.py"}).status_code == 404
+            assert client.post(f"/projects/{pid}/evaluations", json={}).status_code == 400
@@ -0,0 +1,64 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+import cache
+from cache import ContentCache
+from extraction import extract_data_from_text
+
+TEXT = "This Supply Agreement is effective January 1, 2024 and governed by the laws of Delaware."
+FIELDS = [
+    {"name": "Effective Date", "description": "The date the agreement becomes effective"},
+    {"name": "Governing Law", "description": "The law governing the agreement"},
+]
+
+class FakeGroq:
+    """Answers every field named in the prompt and records which fields each call asked for."""
+
+    def __init__(self):
+        self.requested = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        names = [f["name"] for f in FIELDS + [{"name": "Termination Clause"}] if f'"{f["name"]}"' in prompt]
+        self.requested.append(names)
+        results = [{"field_name": n, "value": f"value of {n}", "confidence": 0.9} for n in names]
+        message = SimpleNamespace(content=json.dumps({"results": results}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+@pytest.fixture
+def fake_llm(tmp_path):
+    cache.set_cache(ContentCache(root=str(tmp_path / "cache")))
+    client = FakeGroq()
+    with patch("extraction.get_groq_client", return_value=client):
+        yield client
+    cache.set_cache(None)
+
+def test_repeat_extraction_hits_cache(fake_llm):
+    first = extract_data_from_text(TEXT, FIELDS)
+    second = extract_data_from_text(TEXT, FIELDS)
+
+    assert first == second
+    assert [r["field_name"] for r in second] == ["Effective Date", "Governing Law"]
+    assert len(fake_llm.requested) == 1
+
+def test_changed_field_only_reextracts_that_field(fake_llm):
+    extract_data_from_text(TEXT, FIELDS)
+    edited = [FIELDS[0], {"name": "Governing Law", "description": "Jurisdiction whose law applies"}]
+
+    results = extract_data_from_text(TEXT, edited)
+
+    assert fake_llm.requested[-1] == ["Governing Law"]
+    assert [r["field_name"] for r in results] == ["Effective Date", "Governing Law"]
+
+def test_changed_text_or_refresh_misses_cache(fake_llm):
+    extract_data_from_text(TEXT, FIELDS)
+    extract_data_from_text(TEXT + " Amended.", FIELDS)
+    extract_data_from_text(TEXT, FIELDS, use_cache=False)
+    assert len(fake_llm.requested) == 3
+
+def test_cache_hit_needs_no_api_key(fake_llm):
+    extract_data_from_text(TEXT, FIELDS)
+    with patch("extraction.get_groq_client", return_value=None):
+        assert len(extract_data_from_text(TEXT, FIELDS)) == 2
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import pytest
+from embeddings import HashEmbeddingFunction, set_embedding_function
+from lexical_index import DocumentIndex, LexicalStore, get_lexical_store, reciprocal_rank_fusion, tokenize
+from vector_store import (process_and_store_document, query_document, query_document_fields, reset_client,
+                          delete_project_vectors, lexical_root)
+
+CONTRACT = (
+    "SUPPLY AGREEMENT between Acme Corp and Widget LLC.\n\n"
+    "Payment is due within thirty days of each invoice delivered by the Supplier to the Buyer hereunder.\n\n"
+    "Governing Law. This Agreement shall be governed by the laws of the State of Delaware.\n\n"
+    "Either party may terminate this Agreement on ninety days written notice."
+)
+
+class RefusingEmbedding(HashEmbeddingFunction):
+    """Fails any embedding call, to prove a code path needs no model."""
+
+    def __call__(self, input):
+        raise AssertionError("embedding model used")
+
+@pytest.fixture
+def store():
+    set_embedding_function(HashEmbeddingFunction())
+    path = tempfile.mkdtemp()
+    yield path
+    reset_client()
+    set_embedding_function(None)
+    shutil.rmtree(path, ignore_errors=True)
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Law of the State of Delaware") == ["law", "state", "delaware"]
+
+def test_bm25_ranks_exact_clause_first():
+    texts = ["Payment is due monthly.", "Governed by the laws of Delaware; governing law clause.", "Notices go to the address above."]
+    index = DocumentIndex.build(["a", "b", "c"], texts)
+    assert index.search("Governing Law", 3) == [1]
+    assert index.search("unrelated words", 3) == []
+
+def test_bm25_prefers_rare_terms_and_shorter_chunks():
+    texts = ["delaware law " + "filler " * 50, "delaware law", "law applies", "law again"]
+    index = DocumentIndex.build(["a", "b", "c", "d"], texts)
+    assert index.search("delaware law", 4)[:2] == [1, 0]
+
+def test_reciprocal_rank_fusion():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]]) == ["b", "a", "d", "c"]
+    assert reciprocal_rank_fusion([["a"], []]) == ["a"]
+
+def test_index_round_trips_through_disk(tmp_path):
+    LexicalStore(str(tmp_path)).put(1, ["1_0", "1_30"], ["Alpha clause.", "Beta clause."], project_id=4)
+    reloaded = LexicalStore(str(tmp_path)).get(1, project_id=4)
+    assert reloaded.ids == ["1_0", "1_30"]
+    assert reloaded.search("beta", 1) == [1]
+    assert LexicalStore(str(tmp_path)).get(1, project_id=5) is None
+
+def test_lexical_mode_needs_no_embedding_model(store):
+    process_and_store_document(1, CONTRACT, chunk_size=100, chunk_overlap=0, db_path=store, project_id=3)
+    set_embedding_function(RefusingEmbedding())
+    results = query_document_fields(1, ["Governing Law: The law governing the agreement", "Parties"], n_results=1,
+                                    db_path=store, project_id=3, mode="lexical")
+    assert results[0] == ["Governing Law. This Agreement shall be governed by the laws of the State of Delaware."]
+    assert results[1] == []
+
+def test_hybrid_mode_fuses_vector_and_lexical_results(store):
+    process_and_store_document(1, CONTRACT, chunk_size=100, chunk_overlap=0, db_path=store, project_id=3)
+    hybrid = query_document(1, "governing law Delaware", n_results=2, db_path=store, project_id=3, mode="hybrid")
+    vector = query_document(1, "governing law Delaware", n_results=2, db_path=store, project_id=3, mode="vector")
+    lexical = query_document(1, "governing law Delaware", n_results=2, db_path=store, project_id=3, mode="lexical")
+    assert hybrid[0].startswith("Governing Law")
+    assert set(hybrid) <= set(vector) | set(lexical)
+    with pytest.raises(ValueError):
+        query_document(1, "law", db_path=store, project_id=3, mode="fuzzy")
+
+def test_missing_index_is_rebuilt_from_stored_chunks(store):
+    process_and_store_document(1, CONTRACT, chunk_size=100, chunk_overlap=0, db_path=store, project_id=3)
+    shutil.rmtree(lexical_root(store))
+    get_lexical_store(lexical_root(store)).delete(1, project_id=3) # Drop the in-memory copy too
+
+    results = query_document(1, "terminate notice", n_results=1, db_path=store, project_id=3, mode="lexical")
+    assert results == ["Either party may terminate this Agreement on ninety days written notice."]
+    assert os.path.exists(os.path.join(lexical_root(store), "project_3", "1.json.z"))
+
+def test_project_delete_drops_lexical_indexes(store):
+    process_and_store_document(1, CONTRACT, db_path=store, project_id=3)
+    delete_project_vectors(3, db_path=store)
+    assert not os.path.exists(os.path.join(lexical_root(store), "project_3"))
+    assert query_document(1, "governing law", db_path=store, project_id=3, mode="lexical") == []
@@ -0,0 +1,70 @@
+import json
+import re
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+import cache
+from cache import ContentCache
+from extraction import pack_windows, extract_long_document, extract_data_from_text, CONTEXT_CHAR_LIMIT
+
+FIELDS = [
+    {"name": "Effective Date", "description": "The date the agreement becomes effective"},
+    {"name": "Governing Law", "description": "The law governing the agreement"},
+]
+
+def long_contract():
+    filler = "\n\n".join(f"Section {i}. The Supplier shall deliver the goods as ordered." for i in range(1, 800))
+    return "This Agreement is effective January 1, 2024.\n\n" + filler + "\n\nThis Agreement is governed by the laws of Delaware."
+
+class WindowGroq:
+    """Finds a field only in windows whose text mentions it; confidence is fixed per field."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        window = kwargs["messages"][-1]["content"].split("Document Text:")[1]
+        results = [
+            {"field_name": "Effective Date", "value": "January 1, 2024" if "effective January" in window else None, "confidence": 0.9},
+            {"field_name": "Governing Law", "value": "Delaware" if "Delaware" in window else None, "confidence": 0.8,
+             "citation": "governed by the laws of Delaware" if "Delaware" in window else None},
+        ]
+        message = SimpleNamespace(content=json.dumps({"results": results}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+@pytest.fixture
+def fake_llm(tmp_path):
+    cache.set_cache(ContentCache(root=str(tmp_path / "cache")))
+    client = WindowGroq()
+    with patch("extraction.get_groq_client", return_value=client):
+        yield client
+    cache.set_cache(None)
+
+def test_pack_windows_covers_text_within_budget():
+    text = long_contract()
+    windows = pack_windows(text, window_tokens=1000)
+    assert windows[0][0] == 0 and windows[-1][1] == len(text)
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    assert all(end - start <= 4000 for start, end in windows)
+    # Windows break on paragraph boundaries
+    assert all(text[end - 2:end] == "\n\n" for _, end in windows[:-1])
+
+def test_map_reduce_finds_late_clauses(fake_llm):
+    text = long_contract()
+    results = extract_long_document(text, FIELDS, window_tokens=2000)
+    by_name = {r["field_name"]: r for r in results}
+
+    assert fake_llm.calls == len(pack_windows(text, 2000)) > 1
+    assert by_name["Effective Date"]["value"] == "January 1, 2024"
+    assert by_name["Governing Law"]["value"] == "Delaware"
+    start, end = map(int, re.search(r"\[chars (\d+)-(\d+)\]", by_name["Governing Law"]["citation"]).groups())
+    assert "Delaware" in text[start:end]
+
+def test_auto_mode_uses_map_reduce_for_long_text_without_retrieval(fake_llm):
+    text = long_contract()
+    assert len(text) > CONTEXT_CHAR_LIMIT
+    results = extract_data_from_text(text, FIELDS)
+    assert {r["field_name"]: r["value"] for r in results} == {"Effective Date": "January 1, 2024", "Governing Law": "Delaware"}
+    assert fake_llm.calls > 1
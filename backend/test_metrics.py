@@ -0,0 +1,55 @@
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import metrics
+from app import app
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+def test_render_histograms_and_counters():
+    metrics.observe_stage("parse", 0.003)
+    metrics.observe_stage("parse", 2.0)
+    metrics.increment("llm_tokens_total", 120, kind="prompt")
+    text = metrics.render()
+    assert "# TYPE ltr_stage_duration_seconds histogram" in text
+    assert 'ltr_stage_duration_seconds_bucket{stage="parse",le="0.0025"} 0' in text
+    assert 'ltr_stage_duration_seconds_bucket{stage="parse",le="0.005"} 1' in text
+    assert 'ltr_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2' in text
+    assert 'ltr_stage_duration_seconds_count{stage="parse"} 2' in text
+    assert 'ltr_llm_tokens_total{kind="prompt"} 120' in text
+    assert text.endswith("\n")
+
+def test_profile_collects_only_its_own_context():
+    profile = metrics.start_profile()
+    with metrics.timed("embed"):
+        pass
+    with metrics.timed("embed"):
+        pass
+    # Threads started without the context do not report into it
+    worker = threading.Thread(target=lambda: metrics.observe_stage("chunk", 0.1))
+    worker.start()
+    worker.join()
+    assert set(profile) == {"embed"}
+    assert profile["embed"][1] == 2
+    header = metrics.server_timing(profile, 0.5)
+    assert header.startswith('embed;dur=') and header.endswith("total;dur=500.00")
+    assert 'desc="2 calls"' in header
+
+def test_metrics_endpoint_and_server_timing():
+    with TestClient(app) as client:
+        response = client.get("/projects")
+        assert "server-timing" not in response.headers
+
+        response = client.post("/projects", json={"name": "Metrics", "description": "x"}, headers={"X-Profile": "1"})
+        assert response.status_code == 200
+        assert "db_commit;dur=" in response.headers["server-timing"]
+        assert "total;dur=" in response.headers["server-timing"]
+
+        response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'ltr_http_request_duration_seconds_count{method="GET",route="/projects"} 1' in response.text
+    assert 'ltr_stage_duration_seconds_count{stage="db_commit"}' in response.text
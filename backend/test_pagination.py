@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect, text
+from app import app
+from database import engine, create_db_and_tables
+import pytest
+
+def walk_pages(client, url, limit):
+    pages = []
+    params = {"limit": limit}
+    while True:
+        response = client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        params = {"limit": limit, "after_id": cursor}
+
+def test_document_listing_is_paginated_and_omits_content():
+    with TestClient(app) as client:
+        pid = client.post("/projects", json={"name": "Paged", "description": "d"}).json()["id"]
+        files = client.get("/files").json()
+        if not files:
+            pytest.skip("No files")
+        target = next((f for f in files if f.endswith(".html")), files[0])
+        doc_ids = [client.post(f"/projects/{pid}/ingest", json={"filename": target}).json()["id"] for _ in range(5)]
+
+        pages = walk_pages(client, f"/projects/{pid}/documents", limit=2)
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [doc["id"] for page in pages for doc in page] == doc_ids
+        assert all("content" not in doc for page in pages for doc in page)
+        assert pages[0][0]["filename"] == target
+
+        # The full document (with text) is still served individually
+        assert client.get(f"/documents/{doc_ids[0]}").json()["content"]
+
+def test_page_size_is_bounded():
+    with TestClient(app) as client:
+        assert client.get("/projects", params={"limit": 0}).status_code == 422
+        assert client.get("/projects", params={"limit": 100000}).status_code == 422
+
+def test_foreign_key_and_status_indexes():
+    create_db_and_tables()
+    indexed = {(idx["column_names"][0], table) for table in ("document", "extractedrecord", "extractionschema")
+               for idx in inspect(engine).get_indexes(table)}
+    assert {("project_id", "document"), ("status", "document"), ("document_id", "extractedrecord"),
+            ("status", "extractedrecord"), ("project_id", "extractionschema")} <= indexed
+
+    # Databases created before the indexes existed get them on the next startup
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_document_project_id"))
+    create_db_and_tables()
+    assert "ix_document_project_id" in {idx["name"] for idx in inspect(engine).get_indexes("document")}
@@ -0,0 +1,89 @@
+import os
+import pytest
+from app import DATA_DIR
+from parsers import parse_pdf, parse_document, parse_html, parse_html_blocks, iter_pdf_pages, iter_document_pages, PAGE_BREAK
+from benchmark_html import run_benchmark
+
+SAMPLE_PDF = os.path.join(DATA_DIR, "Supply Agreement.pdf")
+SAMPLE_HTML = os.path.join(DATA_DIR, "EX-10.2.html")
+
+@pytest.fixture
+def sample_pdf():
+    if not os.path.exists(SAMPLE_PDF):
+        pytest.skip("Sample PDF not available")
+    return SAMPLE_PDF
+
+def test_parallel_parse_matches_sequential(sample_pdf):
+    sequential = parse_pdf(sample_pdf, parallel=False)
+    parallel = parse_pdf(sample_pdf, parallel=True)
+    assert parallel == sequential
+    assert len(sequential) > 0
+
+def test_iter_pdf_pages_streams_in_order(sample_pdf):
+    pages = list(iter_pdf_pages(sample_pdf, parallel=True))
+    assert len(pages) > 1
+    assert "".join(p + "\n" + PAGE_BREAK for p in pages) == parse_pdf(sample_pdf, parallel=False)
+
+def test_iter_document_pages_non_pdf(tmp_path):
+    path = tmp_path / "note.txt"
+    path.write_text("plain text")
+    assert list(iter_document_pages(str(path))) == ["plain text"]
+
+def test_iter_document_pages_joins_to_parsed_text(sample_pdf):
+    assert "".join(iter_document_pages(sample_pdf)) == parse_document(sample_pdf)
+
+def test_parse_pdf_invalid_file(tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_text("not a pdf")
+    with pytest.raises(ValueError):
+        parse_pdf(str(path))
+
+EXHIBIT_HTML = """<html><head><title>EX-10.2</title><style>p { margin: 0 }</style></head><body>
+<p align="center"><b>GENERAL TERMS AND
+   CONDITIONS </b></p> <p>These terms&nbsp;are entered into by <u>Tesla</u>, Inc.<br>and Seller.</p>
+<script>var ignored = "<p>not text</p>";</script>
+<table><tr><td width="5%">1.1</td><td><i>Production Planning</i>.</td></tr>
+<tr><td>&nbsp;</td><td>Forecasts <table><tr><td>nested</td><td>cell</td></tr></table> monthly.</td></tr></table>
+<ul><li>First item<li>Second item</ul>
+</body></html>"""
+
+def test_fast_html_parser(tmp_path):
+    path = tmp_path / "exhibit.html"
+    path.write_text(EXHIBIT_HTML)
+    blocks = parse_html_blocks(str(path))
+    assert [(b.kind, b.text) for b in blocks] == [
+        ("heading", "EX-10.2"),
+        ("text", "GENERAL TERMS AND CONDITIONS"),
+        ("text", "These terms are entered into by Tesla, Inc.\nand Seller."),
+        ("row", "1.1\tProduction Planning."),
+        ("row", "Forecasts nested cell monthly."),
+        ("item", "First item"),
+        ("item", "Second item"),
+    ]
+    text = parse_html(str(path), "fast")
+    assert all(text[b.start:b.end] == b.text for b in blocks)
+    assert "Production Planning.\nForecasts" in text # Rows of one table share a block of lines
+
+def test_table_caption_is_its_own_block(tmp_path):
+    path = tmp_path / "captioned.html"
+    path.write_text("<table><caption>Schedule A</caption><tr><td>Price</td><td>$10</td></tr></table>")
+    assert [(b.kind, b.text) for b in parse_html_blocks(str(path))] == [("text", "Schedule A"), ("row", "Price\t$10")]
+
+def test_fast_html_parser_on_sample():
+    if not os.path.exists(SAMPLE_HTML):
+        pytest.skip("Sample HTML not available")
+    fast = parse_html(SAMPLE_HTML, "fast")
+    soup = parse_html(SAMPLE_HTML, "soup")
+    assert "These General Terms and Conditions" in fast
+    assert fast.count("\n") < soup.count("\n") / 4
+    # Same text, laid out differently
+    assert "".join(fast.split()) == "".join(soup.split())
+    with pytest.raises(ValueError):
+        parse_html(SAMPLE_HTML, "regex")
+
+def test_html_benchmark_runs(tmp_path):
+    path = tmp_path / "exhibit.html"
+    path.write_text(EXHIBIT_HTML)
+    results = run_benchmark([str(path)], scale=2, repeats=1)
+    assert [row["file"] for row in results] == ["exhibit.html", "exhibit.html x2"]
+    assert results[1]["fast"]["chunks"] >= 1 and results[1]["soup"]["chars"] > 0
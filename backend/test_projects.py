@@ -0,0 +1,65 @@
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app import app
+from database import engine, async_engine
+from models import Document, ExtractedRecord
+from records import replace_records
+from vector_store import (process_and_store_document, query_document, get_chroma_client, get_collection, collection_name,
+                          delete_project_vectors, migrate_legacy_collection)
+
+def test_per_project_collections(hash_store):
+    process_and_store_document(1, "Alpha supply agreement governed by Delaware law.", db_path=hash_store, project_id=10)
+    process_and_store_document(2, "Beta lease governed by Texas law.", db_path=hash_store, project_id=20)
+
+    client = get_chroma_client(hash_store)
+    assert {"project_10", "project_20"} <= {c.name for c in client.list_collections()}
+    assert query_document(1, "governing law", db_path=hash_store, project_id=10) == ["Alpha supply agreement governed by Delaware law."]
+    # Project 20's collection does not contain document 1
+    assert query_document(1, "governing law", db_path=hash_store, project_id=20) == []
+
+    delete_project_vectors(10, db_path=hash_store)
+    assert "project_10" not in {c.name for c in client.list_collections()}
+
+def test_sharded_collections(hash_store):
+    assert collection_name(7, shards=4) == "shard_3"
+    assert collection_name(None, shards=4) == "documents"
+    with patch("vector_store.VECTOR_SHARDS", 2):
+        process_and_store_document(1, "Project one text.", db_path=hash_store, project_id=1)
+        process_and_store_document(3, "Project three text.", db_path=hash_store, project_id=3)
+        shard = get_collection(get_chroma_client(hash_store), 1)
+        assert shard.name == "shard_1"
+        assert shard.count() == 2
+
+        delete_project_vectors(1, db_path=hash_store)
+        assert shard.get(include=["metadatas"])["metadatas"] == [{"document_id": "3", "project_id": "3", "start": 0, "end": 19}]
+
+def test_migrate_legacy_collection(hash_store):
+    process_and_store_document(1, "Legacy chunk for project five.", db_path=hash_store)
+    process_and_store_document(2, "Legacy chunk for project six.", db_path=hash_store)
+    process_and_store_document(3, "Orphaned chunk.", db_path=hash_store)
+
+    result = migrate_legacy_collection({1: 5, 2: 6}, batch_size=1, db_path=hash_store, drop_legacy=True)
+
+    assert result == {"migrated": 2, "skipped": 1}
+    assert query_document(2, "project six", db_path=hash_store, project_id=6) == ["Legacy chunk for project six."]
+    # Not dropped: the orphaned chunk could not be migrated
+    assert "documents" in {c.name for c in get_chroma_client(hash_store).list_collections()}
+
+def test_delete_project_is_a_fixed_number_of_statements(count_statements):
+    with TestClient(app) as client:
+        pid = client.post("/projects", json={"name": "Doomed", "description": "d"}).json()["id"]
+        with Session(engine) as session:
+            docs = [Document(project_id=pid, filename=f"{i}.txt", content="x", file_path="", status="extracted") for i in range(20)]
+            session.add_all(docs)
+            session.commit()
+            replace_records(session, {doc.id: [{"field_name": f"Field {i}", "value": "v"} for i in range(5)] for doc in docs})
+            session.commit()
+            doc_ids = [doc.id for doc in docs]
+
+        # 20 documents and 100 records, but a handful of statements (previously one per row)
+        assert count_statements(async_engine.sync_engine, lambda: client.delete(f"/projects/{pid}")) < 15
+        assert client.get(f"/projects/{pid}").status_code == 404
+        with Session(engine) as session:
+            assert session.exec(select(Document).where(Document.id.in_(doc_ids))).all() == []
+            assert session.exec(select(ExtractedRecord).where(ExtractedRecord.document_id.in_(doc_ids))).all() == []
@@ -0,0 +1,55 @@
+import threading
+import time
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+from models import Project, Document, ExtractedRecord
+from records import RecordWriter, replace_records
+
+@pytest.fixture
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Project(id=1, name="p"))
+        session.add_all([Document(id=i, project_id=1, filename=f"{i}.txt", content="", file_path="") for i in range(1, 4)])
+        session.commit()
+    return engine
+
+def results(n, tag="v"):
+    return [{"field_name": f"Field {i}", "value": f"{tag}{i}", "confidence": 0.9} for i in range(n)]
+
+def test_replace_records_statement_count_independent_of_fields(memory_engine, count_statements):
+    def write(n):
+        with Session(memory_engine) as session:
+            replace_records(session, {1: results(n)})
+            session.commit()
+
+    assert count_statements(memory_engine, lambda: write(3)) == count_statements(memory_engine, lambda: write(40))
+
+    with Session(memory_engine) as session:
+        records = session.exec(select(ExtractedRecord).order_by(ExtractedRecord.id)).all()
+        assert [r.field_name for r in records] == [f"Field {i}" for i in range(40)] # Old rows replaced, order kept
+        assert session.get(Document, 1).status == "extracted"
+
+def test_record_writer_groups_concurrent_writes(memory_engine):
+    writer = RecordWriter(memory_engine)
+    saved = {}
+
+    def work(document_id):
+        saved[document_id] = writer.write(document_id, results(2, tag=f"d{document_id}-"))
+
+    # Hold the write lock so all three workers queue up behind it, as they would behind a slow commit
+    with writer._write_lock:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(1, 4)]
+        for t in threads:
+            t.start()
+        while len(writer._pending) < 3:
+            time.sleep(0.01)
+    for t in threads:
+        t.join()
+
+    assert writer.transactions == 1
+    for document_id in range(1, 4):
+        assert [r.value for r in saved[document_id]] == [f"d{document_id}-0", f"d{document_id}-1"]
+        assert all(r.id is not None for r in saved[document_id])
@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from groq import BadRequestError, RateLimitError
+from sqlmodel import Session
+import cache
+import metrics
+from app import app
+from cache import ContentCache
+from database import engine
+from models import Document
+from resilience import SingleFlight, CircuitBreaker, CircuitOpenError, call_with_retry
+from extraction import _complete_extraction, is_transient_error, retry_after_seconds
+
+def status_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=httpx.Request("POST", "http://mock/openai/v1/chat/completions"))
+    return cls(f"status {status}", response=response, body=None)
+
+def wait_for_followers(call, count):
+    # Followers count themselves before they block on the leader's result
+    deadline = time.monotonic() + 5
+    while f'ltr_coalesced_calls_total{{call="{call}"}} {count}' not in metrics.render() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_single_flight_shares_one_call():
+    metrics.reset()
+    flights = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("k", work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", work))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    wait_for_followers("test", 3)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flights.in_flight() == 0
+    # Finished calls are not reused
+    assert flights.do("k", lambda: "again") == "again"
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight("test")
+    with pytest.raises(KeyError):
+        flights.do("k", lambda: {}["missing"])
+    assert flights.in_flight() == 0
+
+def test_retry_backs_off_and_honors_retry_after():
+    attempts, sleeps = [], []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise status_error(RateLimitError, 429, {"retry-after": "2"})
+        return "ok"
+
+    result = call_with_retry(flaky, is_transient_error, retry_after_seconds, max_retries=3, base_delay=0.1, max_delay=10, sleep=sleeps.append)
+    assert result == "ok"
+    assert sleeps == [2.0, 2.0]
+
+def test_retry_gives_up():
+    sleeps = []
+    with pytest.raises(RateLimitError):
+        call_with_retry(lambda: (_ for _ in ()).throw(status_error(RateLimitError, 429)), is_transient_error,
+                        max_retries=2, base_delay=0.1, max_delay=10, sleep=sleeps.append)
+    assert len(sleeps) == 2 and all(0 <= s <= 0.4 for s in sleeps)
+
+    # A Retry-After beyond the cap fails at once; so does an error that is not transient
+    for error in (status_error(RateLimitError, 429, {"retry-after": "120"}), status_error(BadRequestError, 400)):
+        sleeps.clear()
+        with pytest.raises(type(error)):
+            call_with_retry(lambda: (_ for _ in ()).throw(error), is_transient_error, retry_after_seconds, max_delay=60, sleep=sleeps.append)
+        assert sleeps == []
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.before_call() # The trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call() # Only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_retry_fails_fast_once_the_circuit_opens():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        raise status_error(RateLimitError, 503)
+
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(failing, is_transient_error, max_retries=5, base_delay=0.01, breaker=breaker, sleep=lambda s: None)
+    assert len(attempts) == 2
+
+class BlockingGroq:
+    """Answers every completion after `release` is set; fails the first `failures` attempts with a 429."""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self.release = threading.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise status_error(RateLimitError, 429, {"retry-after": "0"})
+        self.release.wait(5)
+        content = json.dumps({"results": [{"field_name": "Governing Law", "value": "Delaware"}]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+def test_identical_prompts_share_a_completion():
+    metrics.reset()
+    groq = BlockingGroq()
+    results = []
+
+    def extract():
+        results.append(_complete_extraction("same prompt", None))
+
+    with patch("extraction.get_groq_client", return_value=groq):
+        threads = [threading.Thread(target=extract) for _ in range(4)]
+        for t in threads:
+            t.start()
+        wait_for_followers("llm_completion", 3)
+        groq.release.set()
+        for t in threads:
+            t.join(5)
+    assert groq.calls == 1
+    assert len(results) == 4 and all(r == results[0] for r in results)
+    results[0][0]["value"] = "changed"
+    assert results[1][0]["value"] == "Delaware"
+
+def test_completion_retries_rate_limits():
+    groq = BlockingGroq(failures=2)
+    groq.release.set()
+    with patch("extraction.get_groq_client", return_value=groq), patch("extraction.GROQ_RETRY_BASE_DELAY", 0.01):
+        assert _complete_extraction("retried prompt", None)[0]["value"] == "Delaware"
+    assert groq.calls == 3
+
+@pytest.fixture
+def temp_cache(tmp_path):
+    cache.set_cache(ContentCache(root=str(tmp_path / "cache")))
+    yield
+    cache.set_cache(None)
+
+def test_extract_endpoint_returns_503_while_the_circuit_is_open(temp_cache):
+    breaker = CircuitBreaker("groq", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    with TestClient(app) as client:
+        project_id = client.post("/projects", json={"name": "Circuit", "description": "x"}).json()["id"]
+        with Session(engine) as session:
+            doc = Document(project_id=project_id, filename="c.txt", file_path="", status="ingested", content="Governed by Delaware law.")
+            session.add(doc)
+            session.commit()
+            document_id = doc.id
+
+        groq = BlockingGroq()
+        with patch("extraction._groq_breaker", breaker), patch("extraction.get_groq_client", return_value=groq):
+            assert client.get("/health").json()["llm_circuit"] == "open"
+            response = client.post(f"/documents/{document_id}/extract")
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) > 0
+    assert groq.calls == 0
+
+def test_batch_job_joins_a_running_document_extraction(wait_for_job):
+    metrics.reset()
+    started, release = threading.Event(), threading.Event()
+
+    def extract(text, fields=None, document_id=None, **kwargs):
+        started.set()
+        release.wait(5)
+        return [{"field_name": "Governing Law", "value": "Delaware"}]
+
+    with patch("app.extract_data_from_text", side_effect=extract) as mock_extract:
+        with TestClient(app) as client:
+            project_id = client.post("/projects", json={"name": "Flight", "description": "x"}).json()["id"]
+            with Session(engine) as session:
+                doc = Document(project_id=project_id, filename="f.txt", file_path="", status="ingested", content="Governed by Delaware law.")
+                session.add(doc)
+                session.commit()
+                document_id = doc.id
+
+            responses = []
+            single = threading.Thread(target=lambda: responses.append(client.post(f"/documents/{document_id}/extract")))
+            single.start()
+            started.wait(5)
+            job_id = client.post(f"/projects/{project_id}/extract").json()["id"]
+            wait_for_followers("document_extraction", 1)
+            release.set()
+            single.join(5)
+            job = wait_for_job(client, job_id)
+    assert responses[0].status_code == 200
+    assert job["items"][str(document_id)]["result"] == {"records": 1}
+    assert mock_extract.call_count == 1
@@ -0,0 +1,43 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import cache
+from cache import ContentCache
+from extraction import merge_field_chunks, extract_data_from_text
+
+FIELDS = [
+    {"name": "Governing Law", "description": "The law governing the agreement"},
+    {"name": "Termination Clause", "description": "Conditions under which the agreement can be terminated"},
+]
+
+def test_merge_field_chunks_interleaves_and_dedupes():
+    per_field = [["law", "shared", "law-2"], ["shared", "term", "term-2"]]
+    assert merge_field_chunks(per_field) == ["law", "shared", "term", "law-2", "term-2"]
+    assert merge_field_chunks(per_field, limit=3) == ["law", "shared", "term"]
+    assert merge_field_chunks([]) == []
+
+def test_extraction_issues_one_batched_query(tmp_path):
+    cache.set_cache(ContentCache(root=str(tmp_path / "cache")))
+    prompts = []
+
+    def create(**kwargs):
+        prompts.append(kwargs["messages"][-1]["content"])
+        message = SimpleNamespace(content=json.dumps({"results": [{"field_name": f["name"], "value": "x"} for f in FIELDS]}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    per_field = [["Governed by Delaware law."], ["Either party may terminate on 30 days notice."]]
+    try:
+        with patch("extraction.get_groq_client", return_value=client), \
+             patch("extraction.query_document_fields", return_value=per_field) as mock_query:
+            extract_data_from_text("full text that should not be sent", FIELDS, document_id=7)
+    finally:
+        cache.set_cache(None)
+
+    mock_query.assert_called_once()
+    document_id, queries = mock_query.call_args.args
+    assert document_id == 7
+    assert queries == [f"{f['name']}: {f['description']}" for f in FIELDS]
+    assert "Governed by Delaware law." in prompts[0]
+    assert "Either party may terminate" in prompts[0]
+    assert "full text that should not be sent" not in prompts[0]
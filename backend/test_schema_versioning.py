@@ -0,0 +1,95 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from unittest.mock import patch
+import pytest
+from app import app
+from database import engine
+from models import ExtractedRecord
+
+def fake_extract(text, fields=None, document_id=None, **kwargs):
+    return [{"field_name": f["name"], "value": f"{f['name']} v{f['description'][-1]}", "confidence": 0.8} for f in fields]
+
+def records_by_field(client, did):
+    return {r["field_name"]: r for r in client.get(f"/documents/{did}/records").json()}
+
+def test_schema_update_reextracts_only_delta(wait_for_job):
+    with patch("app.extract_data_from_text", side_effect=fake_extract) as mock_extract:
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "Schema", "description": "d"}).json()["id"]
+            files = client.get("/files").json()
+            if not files:
+                pytest.skip("No files")
+            did = client.post(f"/projects/{pid}/ingest", json={"filename": files[0]}).json()["id"]
+
+            schema = [
+                {"field_name": "Parties", "field_description": "Who signs v1"},
+                {"field_name": "Governing Law", "field_description": "Applicable law v1"},
+                {"field_name": "Term", "field_description": "Duration v1"},
+            ]
+            result = client.put(f"/projects/{pid}/schema", json={"fields": schema}).json()
+            assert result["schema_version"] == 1
+            assert result["job"] is None # Nothing extracted yet
+
+            client.post(f"/documents/{did}/extract")
+            assert set(records_by_field(client, did)) == {"Parties", "Governing Law", "Term"}
+
+            # A reviewer approves Governing Law
+            with Session(engine) as session:
+                rec = session.exec(select(ExtractedRecord).where(
+                    ExtractedRecord.document_id == did, ExtractedRecord.field_name == "Governing Law")).one()
+                rec.status = "approved"
+                session.add(rec)
+                session.commit()
+
+            schema = [
+                {"field_name": "Parties", "field_description": "Who signs v2"},
+                {"field_name": "Governing Law", "field_description": "Applicable law v2"},
+                {"field_name": "Renewal", "field_description": "Renewal terms v1"},
+            ]
+            mock_extract.reset_mock()
+            result = client.put(f"/projects/{pid}/schema", json={"fields": schema}).json()
+            assert result["schema_version"] == 2
+            assert result["added"] == ["Renewal"]
+            assert result["changed"] == ["Parties", "Governing Law"]
+            assert result["removed"] == ["Term"]
+            wait_for_job(client, result["job"]["id"])
+
+            # Only the delta went to the LLM
+            requested = [f["name"] for f in mock_extract.call_args.kwargs["fields"]]
+            assert requested == ["Parties", "Governing Law", "Renewal"]
+
+            records = records_by_field(client, did)
+            assert set(records) == {"Parties", "Governing Law", "Renewal"}
+            assert records["Parties"]["value"] == "Parties v2"
+            assert records["Governing Law"]["value"] == "Governing Law v1" # approved row kept
+            assert records["Governing Law"]["status"] == "approved"
+
+            # Re-submitting the same template is a no-op
+            result = client.put(f"/projects/{pid}/schema", json={"fields": schema}).json()
+            assert result["schema_version"] == 2
+            assert result["job"] is None
+
+def test_changed_field_missing_from_response_drops_old_record(wait_for_job):
+    def drop_term(text, fields=None, **kwargs):
+        return [res for res in fake_extract(text, fields) if res["field_name"] != "Term"]
+
+    with patch("app.extract_data_from_text", side_effect=fake_extract):
+        with TestClient(app) as client:
+            pid = client.post("/projects", json={"name": "SchemaMissing", "description": "d"}).json()["id"]
+            files = client.get("/files").json()
+            if not files:
+                pytest.skip("No files")
+            did = client.post(f"/projects/{pid}/ingest", json={"filename": files[0]}).json()["id"]
+            schema = [{"field_name": "Parties", "field_description": "Who signs v1"}, {"field_name": "Term", "field_description": "Duration v1"}]
+            client.put(f"/projects/{pid}/schema", json={"fields": schema})
+            client.post(f"/documents/{did}/extract")
+            assert records_by_field(client, did)["Term"]["value"] == "Term v1"
+
+            schema = [{"field_name": "Parties", "field_description": "Who signs v2"}, {"field_name": "Term", "field_description": "Duration v2"}]
+            with patch("app.extract_data_from_text", side_effect=drop_term):
+                result = client.put(f"/projects/{pid}/schema", json={"fields": schema}).json()
+                wait_for_job(client, result["job"]["id"])
+
+            records = records_by_field(client, did)
+            assert records["Parties"]["value"] == "Parties v2"
+            assert "Term" not in records # The v1 value no longer answers the edited field
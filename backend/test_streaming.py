@@ -0,0 +1,140 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from groq import Groq
+from sqlmodel import Session
+import cache
+from app import app
+from cache import ContentCache
+from database import engine
+from json_stream import ResultsStreamParser
+from models import Document, ExtractedRecord
+from mock_groq import MockGroqServer
+from extraction import DEFAULT_FIELDS, generate_extraction_prompt, stream_extraction
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+COMPLETION = json.dumps({"results": [
+    {"field_name": "Contract Title", "value": "Supply {Agreement}", "confidence": 0.9, "citation": "\"Supply\" [p. 1]"},
+    {"field_name": "Governing Law", "value": "Delaware", "confidence": 0.8, "citation": None},
+]})
+
+def feed_in_pieces(text, size):
+    parser = ResultsStreamParser()
+    results = []
+    for i in range(0, len(text), size):
+        results.extend(parser.feed(text[i:i + size]))
+    return parser, results
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_parser_emits_each_result_once_complete(size):
+    parser, results = feed_in_pieces(COMPLETION, size)
+    assert results == json.loads(COMPLETION)["results"]
+    assert parser.done
+    assert parser.remaining() == []
+
+def test_parser_emits_before_the_stream_ends():
+    parser = ResultsStreamParser()
+    first_end = COMPLETION.index("}, {") + 1
+    assert [r["field_name"] for r in parser.feed(COMPLETION[:first_end])] == ["Contract Title"]
+    assert parser.feed(COMPLETION[first_end:first_end + 5]) == []
+
+def test_parser_skips_prose_and_falls_back_to_whole_parse():
+    _, results = feed_in_pieces("Here is the JSON:\n```json\n" + COMPLETION + "\n```", 3)
+    assert len(results) == 2
+    parser, results = feed_in_pieces('{"other": 1}', 4)
+    assert results == [] and parser.remaining() == []
+    with pytest.raises(ValueError):
+        feed_in_pieces("not json", 4)[0].remaining()
+
+class StreamingGroq:
+    """Streams COMPLETION in small deltas; records the request kwargs."""
+
+    def __init__(self, completion=COMPLETION):
+        self.completion = completion
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        assert kwargs.get("stream") is True
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.completion[i:i + 5]))])
+            for i in range(0, len(self.completion), 5)
+        )
+
+@pytest.fixture
+def temp_cache(tmp_path):
+    cache.set_cache(ContentCache(root=str(tmp_path / "cache")))
+    yield
+    cache.set_cache(None)
+
+def test_stream_extraction_yields_cached_fields_first(temp_cache):
+    fields = DEFAULT_FIELDS[:2] + [{"name": "Governing Law", "description": "The law governing the agreement"}]
+    with patch("extraction.get_groq_client", return_value=StreamingGroq()):
+        first = list(stream_extraction("Short contract text.", fields))
+    assert [r["field_name"] for r in first] == ["Contract Title", "Governing Law"]
+
+    groq = StreamingGroq(json.dumps({"results": [{"field_name": "Effective Date", "value": "2024-01-01"}]}))
+    with patch("extraction.get_groq_client", return_value=groq):
+        second = list(stream_extraction("Short contract text.", fields))
+    assert [r["field_name"] for r in second] == ["Contract Title", "Governing Law", "Effective Date"]
+    assert '"Effective Date"' in groq.calls[0]["messages"][-1]["content"]
+    assert '"Contract Title"' not in groq.calls[0]["messages"][-1]["content"]
+
+def test_stream_endpoint_persists_and_emits_records(client, temp_cache):
+    project_id = client.post("/projects", json={"name": "Streaming", "description": "x"}).json()["id"]
+    with Session(engine) as session:
+        doc = Document(project_id=project_id, filename="s.txt", file_path="", status="ingested", content="Supply Agreement governed by Delaware law.")
+        session.add(doc)
+        session.commit()
+        session.add(ExtractedRecord(document_id=doc.id, field_name="Dropped Field", value="old"))
+        session.commit()
+        document_id = doc.id
+
+    with patch("extraction.get_groq_client", return_value=StreamingGroq()):
+        response = client.post(f"/documents/{document_id}/extract/stream")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["event"] for e in events] == ["record", "record", "done"]
+    assert events[0]["record"]["field_name"] == "Contract Title"
+    assert events[0]["record"]["value"] == "Supply {Agreement}"
+    assert events[-1]["records"] == 2
+    assert events[-1]["first_record_ms"] <= events[-1]["total_ms"]
+
+    records = client.get(f"/documents/{document_id}/records").json()
+    assert sorted(r["field_name"] for r in records) == ["Contract Title", "Governing Law"]
+    assert client.get(f"/documents/{document_id}").json()["status"] == "extracted"
+
+    with patch("extraction.get_groq_client", return_value=StreamingGroq()):
+        response = client.post(f"/documents/{document_id}/extract/stream", headers={"Accept": "text/event-stream"})
+    assert response.text.startswith("event: record\ndata: ")
+    assert "event: done" in response.text
+
+def test_stream_endpoint_reports_errors(client, temp_cache):
+    project_id = client.post("/projects", json={"name": "Streaming errors", "description": "x"}).json()["id"]
+    with Session(engine) as session:
+        doc = Document(project_id=project_id, filename="e.txt", file_path="", status="ingested", content="Text.")
+        session.add(doc)
+        session.commit()
+        document_id = doc.id
+
+    assert client.post("/documents/999999/extract/stream").status_code == 404
+    with patch("extraction.get_groq_client", return_value=None):
+        events = [json.loads(line) for line in client.post(f"/documents/{document_id}/extract/stream").text.splitlines()]
+    assert events == [{"event": "error", "detail": "GROQ_API_KEY not set in environment variables"}]
+
+def test_mock_server_streams_through_the_groq_sdk():
+    prompt = generate_extraction_prompt("Governing Law: Delaware.", DEFAULT_FIELDS)
+    with MockGroqServer(latency=0.05) as server:
+        stream = Groq(api_key="test", base_url=server.url).chat.completions.create(
+            model="mock", messages=[{"role": "user", "content": prompt}], stream=True
+        )
+        parser = ResultsStreamParser()
+        results = [res for chunk in stream if chunk.choices and chunk.choices[0].delta.content for res in parser.feed(chunk.choices[0].delta.content)]
+    assert [r["field_name"] for r in results] == [f["name"] for f in DEFAULT_FIELDS]
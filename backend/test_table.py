@@ -0,0 +1,58 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import pytest
+import table
+from app import app
+
+def fake_extract(tag):
+    def extract(text, fields=None, document_id=None, **kwargs):
+        return [{"field_name": f["name"], "value": f"{f['name']} {tag}{document_id}", "confidence": 0.9} for f in fields]
+    return extract
+
+def test_project_table_pivot_and_etag():
+    with TestClient(app) as client:
+        pid = client.post("/projects", json={"name": "Table", "description": "d"}).json()["id"]
+        files = client.get("/files").json()
+        if not files:
+            pytest.skip("No files")
+        target = next((f for f in files if f.endswith(".html")), files[0])
+        client.put(f"/projects/{pid}/schema", json={"fields": [
+            {"field_name": "Parties", "field_description": "Who signs"},
+            {"field_name": "Term", "field_description": "Duration"},
+        ]})
+        d1, d2 = [client.post(f"/projects/{pid}/ingest", json={"filename": target}).json()["id"] for _ in range(2)]
+
+        with patch("app.extract_data_from_text", side_effect=fake_extract("v1-")):
+            client.post(f"/documents/{d1}/extract")
+
+        response = client.get(f"/projects/{pid}/table")
+        assert response.status_code == 200
+        body = response.json()
+        assert [d["id"] for d in body["documents"]] == [d1, d2]
+        assert [row["field_name"] for row in body["rows"]] == ["Parties", "Term"]
+        assert body["rows"][0]["cells"][0]["value"] == f"Parties v1-{d1}"
+        assert body["rows"][0]["cells"][1] is None # d2 not extracted yet
+
+        tag = response.headers["ETag"]
+        assert client.get(f"/projects/{pid}/table", headers={"If-None-Match": tag}).status_code == 304
+
+        # Extracting d2 changes the table; d1's materialized cells are reused, not re-read
+        d1_cells = table._tables[pid].cells[d1]
+        with patch("app.extract_data_from_text", side_effect=fake_extract("v2-")):
+            client.post(f"/documents/{d2}/extract")
+        response = client.get(f"/projects/{pid}/table", headers={"If-None-Match": tag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != tag
+        assert [cell["value"] for cell in response.json()["rows"][1]["cells"]] == [f"Term v1-{d1}", f"Term v2-{d2}"]
+        assert table._tables[pid].cells[d1] is d1_cells
+
+        # A new document adds a column even though no records changed
+        tag = response.headers["ETag"]
+        d3 = client.post(f"/projects/{pid}/ingest", json={"filename": target}).json()["id"]
+        response = client.get(f"/projects/{pid}/table", headers={"If-None-Match": tag})
+        assert response.status_code == 200
+        assert [d["id"] for d in response.json()["documents"]] == [d1, d2, d3]
+
+def test_project_table_missing_project():
+    with TestClient(app) as client:
+        assert client.get("/projects/999999/table").status_code == 404
@@ -2,12 +2,16 @@ import pytest
 import os
 import shutil
 import tempfile
-from vector_store import process_and_store_document, query_document, reset_client
+from unittest.mock import patch
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from vector_store import process_and_store_document, query_document, reset_client, bulk_store_documents, get_chroma_client, get_collection
 
 @pytest.fixture
 def test_db_path():
     # Create a temporary directory
     temp_dir = tempfile.mkdtemp()
+    reset_client()
     yield temp_dir
     # Teardown
     reset_client()
@@ -50,3 +54,58 @@ def test_query_filtering(test_db_path):
     # Query for "bananas" restricted to doc 2
     results_2 = query_document(doc_id_2, "bananas", db_path=test_db_path)
     assert any("bananas" in r for r in results_2)
+
+class CountingEmbedding(EmbeddingFunction[Documents]):
+    """Offline stand-in for the default embedder that records batch sizes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.batches.append(len(input))
+        return [np.array([len(t), sum(map(ord, t)) % 97, 1.0], dtype=np.float32) for t in input]
+
+    @staticmethod
+    def name() -> str:
+        return "counting"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return CountingEmbedding()
+
+@pytest.fixture
+def counting_embedder():
+    embedder = CountingEmbedding()
+    with patch("vector_store.get_embedding_function", return_value=embedder):
+        yield embedder
+
+def stored_ids(document_id, db_path):
+    return get_collection(get_chroma_client(db_path)).get(where={"document_id": str(document_id)}, include=[])["ids"]
+
+def test_bulk_store_batches_across_documents(test_db_path, counting_embedder):
+    docs = [(i, f"Clause {i}.\n\n" + "The Supplier shall deliver the Goods. " * 20, None) for i in range(1, 6)]
+    counts = bulk_store_documents(docs, chunk_size=200, chunk_overlap=0, batch_size=8, db_path=test_db_path)
+
+    assert set(counts) == {1, 2, 3, 4, 5}
+    total = sum(counts.values())
+    assert total > 8
+    assert all(size <= 8 for size in counting_embedder.batches)
+    assert sum(counting_embedder.batches) == total
+    assert len(stored_ids(3, test_db_path)) == counts[3]
+
+def test_reingest_replaces_chunks(test_db_path, counting_embedder):
+    long_text = "First paragraph about delivery.\n\n" * 30
+    process_and_store_document(9, long_text, chunk_size=100, chunk_overlap=0, db_path=test_db_path)
+    first = stored_ids(9, test_db_path)
+
+    # Re-running is idempotent
+    process_and_store_document(9, long_text, chunk_size=100, chunk_overlap=0, db_path=test_db_path)
+    assert sorted(stored_ids(9, test_db_path)) == sorted(first)
+
+    # A shorter revision drops the stale chunks
+    count = process_and_store_document(9, "Revised agreement text.", chunk_size=100, chunk_overlap=0, db_path=test_db_path)
+    assert count == 1
+    assert len(stored_ids(9, test_db_path)) == 1
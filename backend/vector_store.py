@@ -1,85 +1,313 @@
 import chromadb
 from chromadb.config import Settings
 import os
+import threading
 import uuid
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import cache
+import metrics
+from chunking import split_text, Chunk, CHUNKER_VERSION
+from embeddings import get_embedding_function, chroma_embedding_function, embedding_signature, EMBEDDING_BATCH_SIZE
+from lexical_index import DocumentIndex, get_lexical_store, reciprocal_rank_fusion
 
 # Persist data in a 'chroma_db' folder inside 'data'
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-DEFAULT_CHROMA_DB_DIR = os.path.join(DATA_DIR, "chroma_db")
+DEFAULT_CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", os.path.join(DATA_DIR, "chroma_db"))
 
-_client = None
+# Vector storage layout. Chunks live in one collection per project, so a search only walks that
+# project's HNSW index and dropping a project drops its collection. With VECTOR_SHARDS=N > 0,
+# projects are instead spread over N shared "shard_<k>" collections (for many tiny projects).
+# Callers that pass no project_id use the original single "documents" collection.
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "0"))
+LEGACY_COLLECTION = "documents"
+
+# How queries rank chunks (lexical_index.py keeps a BM25 index of every document's chunks):
+#   hybrid  - vector and BM25 results merged by reciprocal-rank fusion
+#   vector  - embedding similarity only
+#   lexical - BM25 only; no query embedding, so no embedding model is needed to retrieve
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+_clients = {} # Absolute store path -> client
+_clients_lock = threading.Lock()
 
 def get_chroma_client(path: str = DEFAULT_CHROMA_DB_DIR):
-    global _client
-    if _client is None:
-        _client = chromadb.PersistentClient(path=path)
-    return _client
+    path = os.path.abspath(path)
+    with _clients_lock:
+        if path not in _clients:
+            _clients[path] = chromadb.PersistentClient(path=path)
+        return _clients[path]
 
 def reset_client():
-    global _client
-    _client = None
+    with _clients_lock:
+        _clients.clear()
+
+def collection_name(project_id: Optional[int] = None, shards: Optional[int] = None) -> str:
+    shards = VECTOR_SHARDS if shards is None else shards
+    if project_id is None:
+        return LEGACY_COLLECTION
+    if shards > 0:
+        return f"shard_{project_id % shards}"
+    return f"project_{project_id}"
+
+def get_collection(client, project_id: Optional[int] = None):
+    return client.get_or_create_collection(name=collection_name(project_id), embedding_function=chroma_embedding_function(get_embedding_function()))
+
+def chunk_metadata(document_id: int, chunk: Chunk, project_id: Optional[int] = None) -> Dict:
+    metadata = {"document_id": str(document_id), "start": chunk.start, "end": chunk.end}
+    if project_id is not None:
+        metadata["project_id"] = str(project_id)
+    if chunk.page is not None: # Chroma metadata values cannot be None
+        metadata["page"] = chunk.page
+    return metadata
+
+def chunk_id(document_id: int, chunk: Chunk) -> str:
+    # Deterministic, so re-ingesting a document overwrites its vectors instead of duplicating them
+    return f"{document_id}_{chunk.start}"
+
+def lexical_root(db_path: str = None) -> str:
+    """BM25 indexes live next to the Chroma files they mirror."""
+    return os.path.join(db_path if db_path else DEFAULT_CHROMA_DB_DIR, "lexical")
 
-def process_and_store_document(document_id: int, text: str, chunk_size: int = 1000, chunk_overlap: int = 200, db_path: str = None):
+def _delete_stale_chunks(collection, document_id: int, keep_ids: set):
+    existing = collection.get(where={"document_id": str(document_id)}, include=[])["ids"]
+    stale = [i for i in existing if i not in keep_ids]
+    if stale:
+        collection.delete(ids=stale)
+
+def bulk_store_documents(documents: Iterable[Tuple[int, str, Optional[str]]], chunk_size: int = 1000, chunk_overlap: int = 200,
+                         batch_size: int = EMBEDDING_BATCH_SIZE, db_path: str = None,
+                         on_document_stored: Optional[Callable[[int, int], None]] = None, project_id: Optional[int] = None) -> Dict[int, int]:
+    """
+    Chunks, embeds and upserts many documents, embedding chunks from consecutive documents together
+    in batches of `batch_size`. Safe to re-run: chunk IDs are deterministic, vectors are upserted, and
+    a document's stale chunks are deleted only after its new chunks are written, so it is never left
+    without vectors.
+
+    Args:
+        documents: (document_id, text, cache_key) tuples; may be a generator so texts are loaded lazily.
+            cache_key is the source file hash (or None) used to reuse cached embeddings.
+        on_document_stored: Called with (document_id, chunk_count) as each document completes.
+        project_id: Project the documents belong to; selects their collection.
+
+    Returns:
+        Chunk count per document ID.
+    """
+    client = get_chroma_client(path=db_path if db_path else DEFAULT_CHROMA_DB_DIR)
+    collection = get_collection(client, project_id)
+    lexical = get_lexical_store(lexical_root(db_path))
+    embed = get_embedding_function()
+    counts = {}
+    pending = [] # (document_id, index, chunk) awaiting embedding, across documents
+    in_flight = {} # document_id -> [chunks, embeddings, cache key, chunks still pending]
+
+    def upsert(document_id: int, chunks: List[Chunk], embeddings):
+        with metrics.timed("chroma_upsert"):
+            collection.upsert(
+                ids=[chunk_id(document_id, c) for c in chunks],
+                documents=[c.text for c in chunks],
+                metadatas=[chunk_metadata(document_id, c, project_id) for c in chunks],
+                embeddings=embeddings
+            )
+
+    def complete(document_id: int, chunks: List[Chunk]):
+        _delete_stale_chunks(collection, document_id, {chunk_id(document_id, c) for c in chunks})
+        lexical.put(document_id, [chunk_id(document_id, c) for c in chunks], [c.text for c in chunks], project_id)
+        counts[document_id] = len(chunks)
+        metrics.increment("chunks_stored_total", len(chunks))
+        print(f"Stored {len(chunks)} chunks for document {document_id}")
+        if on_document_stored:
+            on_document_stored(document_id, len(chunks))
+
+    def flush(entries):
+        with metrics.timed("embed"):
+            vectors = embed([chunk.text for _, _, chunk in entries])
+        by_document = {}
+        for (document_id, index, chunk), vector in zip(entries, vectors):
+            by_document.setdefault(document_id, []).append((chunk, vector))
+            state = in_flight[document_id]
+            state[1][index] = vector
+            state[3] -= 1
+        for document_id, items in by_document.items():
+            upsert(document_id, [c for c, _ in items], [v for _, v in items])
+            chunks, embeddings, key, remaining = in_flight[document_id]
+            if remaining == 0:
+                if key:
+                    cache.put_embeddings(key, embeddings)
+                del in_flight[document_id]
+                complete(document_id, chunks)
+
+    for document_id, text, cache_key in documents:
+        with metrics.timed("chunk"):
+            chunks = split_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        key = None
+        if cache_key:
+            key = f"{cache_key}-{cache.PARSER_VERSION}-{CHUNKER_VERSION}-{chunk_size}-{chunk_overlap}-{embedding_signature(embed)}"
+            cached = cache.get_embeddings(key)
+            if cached is not None and len(cached) == len(chunks):
+                for start in range(0, len(chunks), batch_size):
+                    upsert(document_id, chunks[start:start + batch_size], cached[start:start + batch_size])
+                complete(document_id, chunks)
+                continue
+        if not chunks:
+            complete(document_id, chunks)
+            continue
+
+        in_flight[document_id] = [chunks, [None] * len(chunks), key, len(chunks)]
+        pending.extend((document_id, i, chunk) for i, chunk in enumerate(chunks))
+        while len(pending) >= batch_size:
+            flush(pending[:batch_size])
+            del pending[:batch_size]
+    if pending:
+        flush(pending)
+    return counts
+
+def process_and_store_document(document_id: int, text: str, chunk_size: int = 1000, chunk_overlap: int = 200, db_path: str = None, cache_key: Optional[str] = None, project_id: Optional[int] = None):
     """
     Splits the document text into chunks and stores them in the vector database.
-    
+    Re-running it for the same document replaces that document's chunks.
+
     Args:
         document_id: The ID of the document (from SQL database).
         text: The full text content of the document.
-        chunk_size: The number of characters per chunk.
-        chunk_overlap: The number of characters extraction overlap between chunks.
+        chunk_size: The maximum number of characters per chunk.
+        chunk_overlap: The maximum number of characters shared by consecutive chunks.
         db_path: Optional path to ChromaDB (for testing).
+        cache_key: Content hash of the source file; when given, chunk embeddings are reused across ingests.
+        project_id: Project the document belongs to; selects its collection.
     """
+    return bulk_store_documents([(document_id, text, cache_key)], chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                db_path=db_path, project_id=project_id).get(document_id, 0)
+
+def delete_document_vectors(document_id: int, db_path: str = None, project_id: Optional[int] = None):
     client = get_chroma_client(path=db_path if db_path else DEFAULT_CHROMA_DB_DIR)
-    collection = client.get_or_create_collection(name="documents")
-    
-    # Simple character-based chunking
-    # In a real app, use a proper text splitter (RecursiveCharacterTextSplitter from langchain is good)
-    chunks = []
-    metadatas = []
-    ids = []
-    
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk_text = text[start:end]
-        
-        # Adjust end to not cut words in half (simple heuristic: find last space)
-        if end < len(text) and " " in chunk_text:
-             last_space = chunk_text.rfind(" ")
-             if last_space > 0:
-                 end = start + last_space
-                 chunk_text = text[start:end]
-        
-        chunks.append(chunk_text)
-        metadatas.append({"document_id": str(document_id)})
-        ids.append(f"{document_id}_{start}") # Unique ID for the chunk
-        
-        start += chunk_size - chunk_overlap
-        
-    if chunks:
-        collection.add(
-            documents=chunks,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(f"Stored {len(chunks)} chunks for document {document_id}")
+    get_collection(client, project_id).delete(where={"document_id": str(document_id)})
+    get_lexical_store(lexical_root(db_path)).delete(document_id, project_id)
 
-def query_document(document_id: int, query_text: str, n_results: int = 5, db_path: str = None) -> List[str]:
+def delete_project_vectors(project_id: int, db_path: str = None):
+    """Drops a project's vectors: its whole collection, or its entries in a shared shard."""
+    get_lexical_store(lexical_root(db_path)).delete_project(project_id)
+    client = get_chroma_client(path=db_path if db_path else DEFAULT_CHROMA_DB_DIR)
+    if VECTOR_SHARDS > 0:
+        get_collection(client, project_id).delete(where={"project_id": str(project_id)})
+        return
+    try:
+        client.delete_collection(collection_name(project_id))
+    except Exception as e:
+        # Nothing was ever stored for this project
+        print(f"No vector collection to delete for project {project_id}: {e}")
+
+def _lexical_index(document_id: int, db_path: str = None, project_id: Optional[int] = None) -> DocumentIndex:
+    """
+    The document's BM25 index. Documents ingested before lexical indexing get one built from the
+    chunk texts Chroma already holds (no embedding involved), which is then kept.
+    """
+    lexical = get_lexical_store(lexical_root(db_path))
+    index = lexical.get(document_id, project_id)
+    if index is not None:
+        return index
+    client = get_chroma_client(path=db_path if db_path else DEFAULT_CHROMA_DB_DIR)
+    stored = get_collection(client, project_id).get(where={"document_id": str(document_id)}, include=["documents", "metadatas"])
+    chunks = sorted(zip(stored["metadatas"], stored["ids"], stored["documents"]), key=lambda c: c[0].get("start", 0))
+    if not chunks:
+        return DocumentIndex.build([], [])
+    return lexical.put(document_id, [c[1] for c in chunks], [c[2] for c in chunks], project_id)
+
+def query_document(document_id: int, query_text: str, n_results: int = 5, db_path: str = None, project_id: Optional[int] = None,
+                   mode: Optional[str] = None) -> List[str]:
     """
     Retrieves the most relevant chunks for a given query restricted to a specific document.
     """
+    return query_document_fields(document_id, [query_text], n_results=n_results, db_path=db_path, project_id=project_id, mode=mode)[0]
+
+def query_document_fields(document_id: int, query_texts: List[str], n_results: int = 5, db_path: str = None, project_id: Optional[int] = None,
+                          mode: Optional[str] = None) -> List[List[str]]:
+    """
+    Runs several queries against one document, with all vector searches in a single batched Chroma call.
+    Returns one ranked list of chunks per query, in the order of `query_texts`.
+
+    Args:
+        mode: hybrid, vector or lexical (see RETRIEVAL_MODES); defaults to RETRIEVAL_MODE.
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    if not query_texts:
+        return []
+
+    if mode == "lexical":
+        index = _lexical_index(document_id, db_path, project_id)
+        with metrics.timed("lexical_query"):
+            return [[index.texts[i] for i in index.search(query, n_results)] for query in query_texts]
+
+    client = get_chroma_client(path=db_path if db_path else DEFAULT_CHROMA_DB_DIR)
+    collection = get_collection(client, project_id)
+    # Embedded here rather than by Chroma so repeated field queries hit the query cache
+    with metrics.timed("embed"):
+        query_embeddings = get_embedding_function().embed_query(query_texts)
+    with metrics.timed("chroma_query"):
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where={"document_id": str(document_id)},
+            include=["documents"]
+        )
+    if not results['documents']:
+        return [[] for _ in query_texts]
+    if mode == "vector":
+        return results['documents']
+
+    index = _lexical_index(document_id, db_path, project_id)
+    fused = []
+    with metrics.timed("lexical_query"):
+        for query, vector_ids, vector_texts in zip(query_texts, results['ids'], results['documents']):
+            texts = dict(zip(vector_ids, vector_texts))
+            lexical_ids = []
+            for i in index.search(query, n_results):
+                lexical_ids.append(index.ids[i])
+                texts.setdefault(index.ids[i], index.texts[i])
+            fused.append([texts[i] for i in reciprocal_rank_fusion([vector_ids, lexical_ids])[:n_results]])
+    return fused
+
+def migrate_legacy_collection(document_projects: Dict[int, int], batch_size: int = 500, db_path: str = None, drop_legacy: bool = False) -> Dict[str, int]:
+    """
+    Copies chunks from the single legacy "documents" collection into per-project (or shard) collections,
+    reusing the stored embeddings. Chunks whose document is not in `document_projects` are left behind.
+
+    Args:
+        document_projects: document_id -> project_id, from the SQL database.
+        drop_legacy: Delete the legacy collection afterwards (only if every chunk was migrated).
+    """
     client = get_chroma_client(path=db_path if db_path else DEFAULT_CHROMA_DB_DIR)
-    collection = client.get_or_create_collection(name="documents")
-    
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=n_results,
-        where={"document_id": str(document_id)} # Filter by document ID
-    )
-    
-    # results['documents'] is a list of lists (one list per query)
-    if results['documents']:
-        return results['documents'][0]
-    return []
+    if LEGACY_COLLECTION not in [c.name for c in client.list_collections()]:
+        return {"migrated": 0, "skipped": 0}
+    legacy = client.get_collection(LEGACY_COLLECTION, embedding_function=chroma_embedding_function(get_embedding_function()))
+
+    migrated = skipped = 0
+    offset = 0
+    while True:
+        batch = legacy.get(limit=batch_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+        if not batch["ids"]:
+            break
+        offset += len(batch["ids"])
+
+        by_project = {}
+        for i, chunk_id_ in enumerate(batch["ids"]):
+            metadata = dict(batch["metadatas"][i])
+            project_id = document_projects.get(int(metadata["document_id"]))
+            if project_id is None:
+                skipped += 1
+                continue
+            metadata["project_id"] = str(project_id)
+            rows = by_project.setdefault(project_id, ([], [], [], []))
+            rows[0].append(chunk_id_)
+            rows[1].append(batch["documents"][i])
+            rows[2].append(metadata)
+            rows[3].append(batch["embeddings"][i])
+        for project_id, (ids, documents, metadatas, embeddings) in by_project.items():
+            get_collection(client, project_id).upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            migrated += len(ids)
+
+    if drop_legacy and skipped == 0:
+        client.delete_collection(LEGACY_COLLECTION)
+    return {"migrated": migrated, "skipped": skipped}
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Project, Document, ExtractedRecord } from './types';
+import { Project, Document, DocumentSummary, ExtractedRecord, ExtractionEvent, ProjectTable, FieldDiff } from './types';
 
 const API_URL = 'http://localhost:8000';
 
@@ -7,9 +7,20 @@ export const api = axios.create({
   baseURL: API_URL,
 });
 
+// List endpoints are paginated: follow X-Next-Cursor until the last page
+const getAllPages = async <T>(url: string) => {
+  const items: T[] = [];
+  let afterId: string | undefined;
+  do {
+    const response = await api.get<T[]>(url, { params: { limit: 1000, after_id: afterId } });
+    items.push(...response.data);
+    afterId = response.headers['x-next-cursor'];
+  } while (afterId);
+  return items;
+};
+
 export const getProjects = async () => {
-  const response = await api.get<Project[]>('/projects');
-  return response.data;
+  return getAllPages<Project>('/projects');
 };
 
 export const createProject = async (name: string, description: string) => {
@@ -33,8 +44,7 @@ export const ingestDocument = async (projectId: number, filename: string) => {
 };
 
 export const getDocuments = async (projectId: number) => {
-  const response = await api.get<Document[]>(`/projects/${projectId}/documents`);
-  return response.data;
+  return getAllPages<DocumentSummary>(`/projects/${projectId}/documents`);
 };
 
 export const getDocument = async (docId: number) => {
@@ -47,7 +57,35 @@ export const extractDocument = async (docId: number) => {
   return response.data;
 };
 
+// Streams extraction as NDJSON: onEvent sees each record as soon as it is saved, then "done" or "error"
+export const streamExtraction = async (docId: number, onEvent: (event: ExtractionEvent) => void, refresh = false) => {
+  const response = await fetch(`${API_URL}/documents/${docId}/extract/stream?refresh=${refresh}`, { method: 'POST' });
+  if (!response.ok || !response.body) {
+    throw new Error(`Extraction failed: ${response.status}`);
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value, { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() ?? '';
+    lines.filter((line) => line.trim()).forEach((line) => onEvent(JSON.parse(line)));
+    if (done) break;
+  }
+};
+
 export const getRecords = async (docId: number) => {
-  const response = await api.get<ExtractedRecord[]>(`/documents/${docId}/records`);
+  return getAllPages<ExtractedRecord>(`/documents/${docId}/records`);
+};
+
+export const getProjectTable = async (projectId: number) => {
+  const response = await api.get<ProjectTable>(`/projects/${projectId}/table`);
+  return response.data;
+};
+
+export const getProjectDiff = async (projectId: number, field?: string) => {
+  const response = await api.get<FieldDiff[]>(`/projects/${projectId}/diff`, { params: { field } });
   return response.data;
 };
@@ -2,6 +2,7 @@ export interface Project {
   id: number;
   name: string;
   description: string;
+  schema_version: number;
   created_at: string;
 }
 
@@ -11,10 +12,16 @@ export interface Document {
   filename: string;
   content: string;
   file_path: string;
-  status: 'uploaded' | 'ingested' | 'extracted' | 'error';
+  content_length: number | null;
+  page_count: number | null;
+  status: 'uploaded' | 'queued' | 'parsing' | 'embedding' | 'ingested' | 'extracted' | 'error';
+  error: string | null;
   created_at: string;
 }
 
+// Document listings omit the parsed text
+export type DocumentSummary = Omit<Document, 'content'>;
+
 export interface ExtractedRecord {
   id: number;
   document_id: number;
@@ -25,3 +32,42 @@ export interface ExtractedRecord {
   normalization: string | null;
   status: 'pending' | 'approved' | 'rejected' | 'manual_updated';
 }
+
+// Lines of POST /documents/{id}/extract/stream
+export type ExtractionEvent =
+  | { event: 'record'; record: ExtractedRecord }
+  | { event: 'done'; records: number; first_record_ms: number | null; total_ms: number }
+  | { event: 'error'; detail: string };
+
+export interface TableCell {
+  record_id: number;
+  value: string | null;
+  confidence: number | null;
+  citation: string | null;
+  normalization: string | null;
+  status: ExtractedRecord['status'];
+}
+
+// Field x document comparison matrix; each row's cells line up with `documents`
+export interface ProjectTable {
+  project_id: number;
+  documents: { id: number; filename: string }[];
+  rows: { field_name: string; cells: (TableCell | null)[] }[];
+}
+
+export interface ValueGroup {
+  key: string;
+  value: string;
+  document_ids: number[];
+  record_ids: number[];
+  consensus: boolean;
+  outlier: boolean;
+  diff: { op: 'equal' | 'insert' | 'delete' | 'replace'; base: string; other: string }[] | null;
+}
+
+export interface FieldDiff {
+  field_name: string;
+  clause: boolean;
+  missing_document_ids: number[];
+  groups: ValueGroup[];
+}